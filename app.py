@@ -7,70 +7,206 @@ Original file is located at
     https://colab.research.google.com/drive/1ccMeB2TUuFN8dchwAxHnAdQtZPYJZpXz
 """
 
-!pip -q install streamlit pyngrok pandas spacy networkx pyvis sentence-transformers
-!python -m spacy download en_core_web_sm
-
-!pip install pyvis==0.2.1
-
 # Commented out IPython magic to ensure Python compatibility.
 # %%writefile app.py
 # # (This will contain all milestones: Authentication, Dataset, NLP Extraction, Graph, Feedback)
 # # I’ll paste the full integrated code here in the next message to keep it neat and runnable.
 #
 
-!ls -lh app.py
-
 # Commented out IPython magic to ensure Python compatibility.
 #  %%writefile app.py
+from knowmap.timing import RerunTimer
+timer = RerunTimer()
+
 import streamlit as st
-import pandas as pd
-import spacy
 import json
 import os
-from io import StringIO
+from knowmap.triple_store import TripleStore
 
 st.set_page_config(page_title="KnowMap | Cross-Domain Knowledge Mapping", layout="wide")
 
+# hot-path spans (knowmap.timing.span) also go to this session's histograms
+from knowmap import timing
+if "perf_registry" not in st.session_state:
+    st.session_state["perf_registry"] = timing.Registry()
+timing.bind_session(st.session_state["perf_registry"])
+
 # -------------------------------
 # USER DATABASE
 # -------------------------------
-USER_DB = "users.json"
-if not os.path.exists(USER_DB):
-    with open(USER_DB, "w") as f:
-        json.dump({}, f)
-
-def load_users():
-    with open(USER_DB, "r") as f:
-        return json.load(f)
-
-def save_users(data):
-    with open(USER_DB, "w") as f:
-        json.dump(data, f)
+@st.cache_resource
+def get_user_repo():
+    """Shared SQLite user store; imports the legacy users.json once."""
+    from knowmap.users import UserRepository
+    repo = UserRepository("users.db")
+    repo.migrate_from_json("users.json")
+    return repo
 
 # -------------------------------
 # ROBUST CSV LOADER
 # -------------------------------
-def load_dataframe(uploaded_file):
-    """Auto-detect delimiter, handle missing headers, and name columns properly."""
-    uploaded_file.seek(0)
+def load_dataframe(uploaded_file, max_rows=None, fmt=None):
+    """Auto-detect delimiter, handle missing headers, and name columns properly (``fmt`` skips the sniff)."""
+    from knowmap.ingest import load_dataframe as load_chunked
+    return load_chunked(uploaded_file, max_rows=max_rows, fmt=fmt)
+
+def get_graph():
+    """Session graph for the current triples; rebuilt only when the triple set is replaced."""
+    from knowmap.graph import KnowledgeGraph
+    triples = st.session_state.setdefault("triples", TripleStore())
+    kg = st.session_state.get("kg")
+    if kg is None or not kg.is_current(triples):
+        kg = KnowledgeGraph(triples)
+        st.session_state["kg"] = kg
+    return kg
+
+def get_graph_engine():
+    """CSR query engine (k-hop, paths, relation filters) for the current triples."""
+    from knowmap.graph_engine import CSRGraph
+    triples = st.session_state.setdefault("triples", TripleStore())
+    engine = st.session_state.get("graph_engine")
+    if engine is None or engine.store is not triples or engine.version != triples.version:
+        engine = CSRGraph(triples)
+        st.session_state["graph_engine"] = engine
+    return engine
+
+@st.cache_resource
+def get_logs():
+    """Shared append-only logs: (admin activity, feedback)."""
+    from knowmap.logs import SegmentLog
+    admin_log = SegmentLog("logs", "admin", max_segments=200)
+    feedback_log = SegmentLog("logs", "feedback")
+    # one-shot migration of the legacy single-file logs
+    if not admin_log.segments() and os.path.exists("admin_log.json"):
+        try:
+            with open("admin_log.json", "r") as f:
+                admin_log.import_entries(reversed(json.load(f)))  # stored newest first
+        except Exception:
+            pass
+    if not feedback_log.segments() and os.path.exists("feedback.json"):
+        with open("feedback.json", "r") as f:
+            feedback_log.import_entries(json.loads(line) for line in f if line.strip())
+    return admin_log, feedback_log
+
+@st.cache_resource
+def load_st_model():
+    from sentence_transformers import SentenceTransformer
+    with timing.span("model.load"):
+        return SentenceTransformer("all-MiniLM-L6-v2")
+
+@st.cache_resource
+def load_embedding_store(name):
+    from knowmap.datasets import dataset_dir
+    from knowmap.embedding_store import EmbeddingStore
+    return EmbeddingStore(dataset_dir(os.path.join("kg_embeddings", "all-MiniLM-L6-v2"), name))
+
+def latest_artifact_version(root="artifacts"):
     try:
-        df = pd.read_csv(uploaded_file, sep=None, engine="python", header=0)
-    except Exception:
-        uploaded_file.seek(0)
-        df = pd.read_csv(uploaded_file, sep=None, engine="python", header=None)
-
-    lower_cols = [str(c).lower() for c in df.columns]
-    if not {"entity_1", "relation", "entity_2"}.issubset(set(lower_cols)):
-        if df.shape[1] >= 9:
-            df.columns = [
-                "id","entity_1","relation","entity_2",
-                "domain","country","start_year","end_year","notes"
-            ]
-        elif df.shape[1] >= 3:
-            df.columns = ["entity_1","relation","entity_2"] + [
-                f"col{i}" for i in range(df.shape[1]-3)
-            ]
-    return df
+        with open(os.path.join(root, "LATEST"), "r") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource(max_entries=2)
+def load_artifacts(version):
+    """Prebuilt triples/embeddings/index/layout from ``python -m knowmap.pipeline``."""
+    from knowmap.pipeline import Artifacts
+    return Artifacts(os.path.join("artifacts", version))
+
+# serve the latest offline build unless this session already has its own triples
+artifact_version = latest_artifact_version()
+artifacts = load_artifacts(artifact_version) if artifact_version else None
+if artifacts is not None and "triples" not in st.session_state:
+    st.session_state["triples"] = artifacts.store
+    st.session_state["entity_domains"] = artifacts.domains
+
+# -------------------------------
+# BACKGROUND JOBS
+# -------------------------------
+@st.cache_resource
+def get_jobs():
+    """Job queue shared by all sessions for extraction, embedding and export work."""
+    from knowmap.jobs import JobQueue
+    return JobQueue(threads=2)
+
+def submit_job(label, func, key, store=None):
+    """Run ``func(ctx)`` in the background; an identical in-flight or finished job is reused.
+
+    A failed or cancelled job for ``key`` is kept on screen until the user
+    retries it, rather than being resubmitted on every rerun. With ``store``
+    the job runs as ``func(ctx, snapshot)`` on a frozen copy taken only when
+    the job is actually submitted, so the session can keep editing its store.
+    """
+    jobs = get_jobs()
+    job = jobs.find(key)
+    if job is not None:
+        if job.status not in ("failed", "cancelled"):
+            return job
+        if not st.button("🔁 Retry", key=f"retry_job_{job.id}"):
+            return job
+    args = () if store is None else (store.snapshot(),)
+    return jobs.submit(label, func, *args, key=key, registry=st.session_state["perf_registry"])
+
+def show_job(job):
+    """Progress and a cancel button while ``job`` runs; True once it has succeeded.
+
+    While a job is shown running, the script re-runs every ``POLL_S`` seconds
+    (see the end of this file) instead of blocking on it.
+    """
+    if job.ok:
+        return True
+    if job.status == "failed":
+        st.error(f"{job.name} failed: {job.error}")
+    elif job.status == "cancelled":
+        st.warning(f"{job.name} was cancelled.")
+    else:
+        jc1, jc2 = st.columns([5, 1])
+        jc1.progress(job.progress, text=f"{job.name}: {job.message or job.status} · {job.elapsed:.0f}s")
+        if jc2.button("Cancel", key=f"cancel_job_{job.id}"):
+            get_jobs().cancel(job.id)
+        st.session_state["poll_jobs"] = True
+    return False
+
+# -------------------------------
+# DATASETS (named namespaces)
+# -------------------------------
+def get_datasets():
+    """This session's named datasets; ``triples`` is always the active dataset's store."""
+    from knowmap.datasets import DEFAULT_NAME, DatasetCatalog
+    catalog = st.session_state.get("datasets")
+    if catalog is None:
+        catalog = st.session_state["datasets"] = DatasetCatalog()
+        st.session_state["dataset"] = "prebuilt" if artifacts is not None else DEFAULT_NAME
+    active = st.session_state["dataset"]
+    triples = st.session_state.get("triples")
+    # edits, imports and extraction replace ``triples``; keep the active dataset pointing at it
+    if triples is not None and (active in catalog or len(triples)):
+        if active not in catalog or catalog[active].store is not triples:
+            catalog.add(active, triples, st.session_state.get("entity_domains"))
+    return catalog
+
+def add_dataset(name, store, domains=None):
+    """Add or refresh ``name``; refreshing the active dataset also replaces the session's triples."""
+    ds = get_datasets().add(name, store, domains)
+    if ds.name == st.session_state["dataset"]:
+        use_dataset(ds.name)
+    return ds
+
+def use_dataset(name):
+    """Make ``name`` the dataset the graph, NLP and admin views work on."""
+    ds = get_datasets()[name]
+    st.session_state["dataset"] = name
+    st.session_state["triples"] = ds.store
+    st.session_state["entity_domains"] = ds.domains
+
+datasets = get_datasets()
+if len(datasets) > 1:
+    with st.sidebar:
+        dataset_names = datasets.names()
+        chosen = st.selectbox("Active dataset", dataset_names,
+                              index=dataset_names.index(st.session_state["dataset"]))
+        if chosen != st.session_state["dataset"]:
+            use_dataset(chosen)
 
 # -------------------------------
 # HEADER
@@ -81,7 +217,8 @@ st.markdown(
 )
 st.markdown("---")
 
-tabs = st.tabs([
+# only the selected view runs (st.tabs would execute every tab body on each rerun)
+VIEWS = [
     "🏠 Welcome",
     "🔐 Authentication",
     "📂 Dataset Management",
@@ -89,16 +226,27 @@ tabs = st.tabs([
     "🌐 Semantic Search",
     "📊 Admin Dashboard",
     "💬 Feedback",
-])
+]
+view = st.radio("View", VIEWS, horizontal=True, key="view", label_visibility="collapsed")
+timer.mark("setup")
 
-c
+# -------------------------------
+# TAB 1: WELCOME
+# -------------------------------
+def render_welcome():
+    st.header("🏠 Welcome to KnowMap")
+    st.write("Upload a dataset or extract triples from text, explore the knowledge graph with "
+             "semantic search, and manage it from the admin dashboard. Log in to get started.")
+    if artifacts is not None:
+        st.caption(f"Serving prebuilt dataset {artifacts.version} "
+                   f"({artifacts.manifest['triples']:,} triples).")
 
 # -------------------------------
 # TAB 2: AUTHENTICATION
 # -------------------------------
-with tabs[1]:
+def render_auth():
     st.header("🔐 User Authentication (Milestone 1)")
-    users = load_users()
+    user_repo = get_user_repo()
 
     col1, col2 = st.columns(2)
     with col1:
@@ -106,10 +254,11 @@ with tabs[1]:
         email = st.text_input("Email", key="login_email")
         pw = st.text_input("Password", type="password", key="login_pw")
         if st.button("Login"):
-            if email in users and users[email]["password"] == pw:
+            status = user_repo.authenticate(email, pw)
+            if status == "ok":
                 st.session_state["logged_in"] = email
                 st.success(f"Welcome back, {email}!")
-            elif email in users:
+            elif status == "wrong_password":
                 st.error("❌ Wrong password.")
             else:
                 st.warning("⚠️ User not registered.")
@@ -119,13 +268,11 @@ with tabs[1]:
         new_email = st.text_input("New Email", key="reg_email")
         new_pw = st.text_input("New Password", type="password", key="reg_pw")
         if st.button("Register"):
-            if new_email in users:
-                st.warning("⚠️ Email already exists.")
-            elif not new_email or not new_pw:
+            if not new_email or not new_pw:
                 st.error("❌ Enter valid email and password.")
+            elif not user_repo.register(new_email, new_pw):
+                st.warning("⚠️ Email already exists.")
             else:
-                users[new_email] = {"password": new_pw}
-                save_users(users)
                 st.success("🎉 Registration successful!")
 
     if "logged_in" in st.session_state:
@@ -134,7 +281,7 @@ with tabs[1]:
 # -------------------------------
 # TAB 3: DATASET MANAGEMENT
 # -------------------------------
-with tabs[2]:
+def render_dataset():
     st.header("📂 Dataset Management (Milestone 2)")
     if "logged_in" not in st.session_state:
         st.warning("Please login first to access dataset tools.")
@@ -143,21 +290,51 @@ with tabs[2]:
 
         if upload_type == "CSV Upload":
             uploaded_file = st.file_uploader("Upload CSV/TSV File", type=["csv","tsv","txt"])
-            if uploaded_file:
-                df = load_dataframe(uploaded_file)
+            dataset_name = st.text_input(
+                "Dataset name", value=os.path.splitext(uploaded_file.name)[0] if uploaded_file else "",
+                help="Each upload becomes its own dataset with its own search index; "
+                     "uploading under an existing name refreshes only that dataset.")
+            if uploaded_file and dataset_name.strip():
+                from knowmap.ingest import iter_triple_chunks, sniff_format, triple_columns
+
+                # sniff once; preview only the head, stream the rest in chunks
+                fmt = sniff_format(uploaded_file)
+                df = load_dataframe(uploaded_file, max_rows=1000, fmt=fmt)
                 st.session_state["uploaded_df"] = df
                 st.success("✅ File uploaded successfully!")
                 st.dataframe(df.head(10))
 
-                # Extract and store triples automatically
-                cols = {c.lower(): c for c in df.columns}
-                s_col = cols.get("entity_1") or cols.get("subject")
-                p_col = cols.get("relation") or cols.get("predicate") or cols.get("rel")
-                o_col = cols.get("entity_2") or cols.get("object")
-                if s_col and p_col and o_col:
-                    triples = list(zip(df[s_col].astype(str), df[p_col].astype(str), df[o_col].astype(str)))
-                    st.session_state["triples"] = triples
-                    st.info(f"✅ Found {len(triples)} triples — automatically saved for NLP & Graph tabs.")
+                @st.cache_resource(max_entries=8)
+                def ingest_triples(digest, _file, _fmt):
+                    """One frozen store (plus entity domains and skipped rows) per file content, shared read-only by all sessions."""
+                    from knowmap.crossdomain import EntityDomains
+                    bar = st.progress(0.0, text="Reading triples…")
+                    report = lambda frac, rows: bar.progress(frac, text=f"Read {rows:,} triples")
+                    store, domains, skipped = TripleStore(), EntityDomains(), []
+                    for chunk in iter_triple_chunks(_file, fmt=_fmt, progress=report, domains=domains,
+                                                    skipped=skipped):
+                        store.extend(chunk)
+                    bar.empty()
+                    return store.freeze(), domains, skipped
+
+                # Extract and store triples automatically (once per upload, not per rerun)
+                if triple_columns(fmt.columns)[0]:
+                    upload_key = (dataset_name.strip(), uploaded_file.name, uploaded_file.size,
+                                  getattr(uploaded_file, "file_id", None))
+                    if st.session_state.get("ingested_upload") != upload_key:
+                        import hashlib
+                        digest = hashlib.sha1(uploaded_file.getbuffer()).hexdigest()
+                        triples, domains, skipped = ingest_triples(digest, uploaded_file, fmt)
+                        use_dataset(add_dataset(dataset_name, triples, domains).name)
+                        st.session_state["ingested_upload"] = upload_key
+                        st.session_state["ingest_skipped"] = skipped
+                    triples = st.session_state["triples"]
+                    st.info(f"✅ Found {len(triples)} triples — saved as dataset '{st.session_state['dataset']}' "
+                            f"and made active for the NLP & Graph tabs.")
+                    skipped = st.session_state.get("ingest_skipped") or []
+                    if skipped:
+                        shown = ", ".join(str(n) for n in skipped[:10]) + (", …" if len(skipped) > 10 else "")
+                        st.warning(f"Skipped {len(skipped):,} malformed row(s) with too many fields (lines {shown}).")
                 else:
                     st.warning("No triple columns detected. Use the NLP Extraction tab to generate triples.")
         else:
@@ -166,65 +343,107 @@ with tabs[2]:
                 st.session_state["text_data"] = text_input
                 st.success("✅ Text data stored in memory!")
 
+        st.markdown("---")
+        st.subheader("Datasets")
+        import pandas as pd
+        catalog = get_datasets()
+        st.caption(f"{len(catalog)} dataset(s) · {catalog.total_triples:,} triples in total · "
+                   f"active: {st.session_state['dataset']}")
+        if len(catalog):
+            st.dataframe(pd.DataFrame([ds.as_dict() for ds in catalog]), use_container_width=True)
+            dc1, dc2, dc3 = st.columns([2, 1, 1])
+            picked = dc1.selectbox("Dataset", catalog.names(), key="dataset_pick")
+            if dc2.button("Make active", disabled=picked == st.session_state["dataset"]):
+                use_dataset(picked)
+                st.experimental_rerun()
+            if dc3.button("Drop dataset"):
+                catalog.drop(picked)
+                st.session_state.get("bm25", {}).pop(picked, None)
+                if picked == st.session_state["dataset"]:
+                    if len(catalog):
+                        use_dataset(catalog.names()[0])
+                    else:
+                        from knowmap.datasets import DEFAULT_NAME
+                        st.session_state["dataset"] = DEFAULT_NAME
+                        st.session_state["triples"] = TripleStore()
+                        st.session_state.pop("entity_domains", None)
+                st.experimental_rerun()
+
 # -------------------------------
 # TAB 4: NLP EXTRACTION
 # -------------------------------
-with tabs[3]:
+def render_nlp():
     st.header("🧠 NLP Extraction — Entity & Relation (Milestone 2)")
 
     if "logged_in" not in st.session_state:
         st.warning("⚠️ Please login first.")
     else:
-        def extract_triples_from_text(text: str):
-            """Extract minimal triples (S, P, O) even for single-sentence text."""
-            try:
-                nlp_local = spacy.load("en_core_web_sm")
-            except Exception:
-                st.error("spaCy model not found. Run: !python -m spacy download en_core_web_sm")
-                return []
-            doc = nlp_local(text)
-            triples = []
-            for sent in doc.sents:
-                root = next((t for t in sent if t.dep_ == "ROOT"), None)
-                if not root:
-                    continue
-                subj = next((w for w in root.lefts if "subj" in w.dep_), None)
-                obj = next((w for w in root.rights if "obj" in w.dep_ or w.dep_ == "pobj"), None)
-                if subj and obj:
-                    triples.append((subj.text, root.lemma_, obj.text))
-            if not triples and len(doc.ents) >= 2:
-                triples = [(doc.ents[0].text, "related_to", doc.ents[1].text)]
-            if not triples and len(doc) >= 3:
-                tokens = [t.text for t in doc if not t.is_space]
-                triples = [(tokens[0], tokens[1], tokens[2])]
-            return triples
+        def start_extraction(texts, batch_size=64, n_process=1):
+            """Extract in the background; the job id is kept so reruns can follow it."""
+            import hashlib
+            from knowmap.extraction import extract_store, load_nlp
+            digest = hashlib.sha1("\x00".join(texts).encode("utf-8")).hexdigest()
+
+            def extract(ctx):
+                try:
+                    nlp_local = load_nlp()
+                except OSError:
+                    raise RuntimeError("spaCy model not found. Run: !python -m spacy download en_core_web_sm")
+                ctx.progress(0.0, f"Parsing {len(texts):,} documents")
+                return extract_store(texts, batch_size, n_process, nlp=nlp_local, progress=ctx.progress)
+
+            job = submit_job("NLP extraction", extract, ("extract", digest, batch_size, n_process))
+            st.session_state["nlp_job"] = job.id
+
+        # a finished extraction job becomes the session's triples
+        nlp_job = get_jobs().get(st.session_state.get("nlp_job"))
+        if nlp_job is not None and show_job(nlp_job):
+            store, stats = nlp_job.result
+            add_dataset(st.session_state["dataset"], store)  # extracted triples carry no entity domains
+            st.session_state.pop("nlp_job")
+            st.success(f"✅ Extracted {len(store)} triples from {stats.docs} documents "
+                       f"({stats.docs_per_sec:.1f} docs/sec) and saved for Knowledge Graph visualization.")
 
         triples_out = st.session_state.get("triples", None)
 
         if triples_out:
             st.success("✅ Automatically extracted triples from uploaded CSV!")
-            st.dataframe(pd.DataFrame(triples_out, columns=["Subject","Relation","Object"]))
+            st.dataframe(triples_out.to_frame().head(1000))
         else:
+            running = nlp_job is not None and not nlp_job.done
             st.info("No triples found in dataset. You can enter text below to extract manually:")
             text_input = st.text_area("Enter text for extraction", height=150)
-            if st.button("🚀 Run NLP Extraction"):
+            if st.button("🚀 Run NLP Extraction", disabled=running):
                 if not text_input.strip():
                     st.error("Please enter some text.")
                 else:
-                    triples_out = extract_triples_from_text(text_input)
-                    st.session_state["triples"] = triples_out
-                    st.dataframe(pd.DataFrame(triples_out, columns=["Subject","Relation","Object"]))
-                    st.success("✅ Extraction completed and saved for Knowledge Graph visualization.")
+                    from knowmap.extraction import split_documents
+                    start_extraction(list(split_documents(text_input)))
+                    st.experimental_rerun()
+
+            st.markdown("---")
+            st.subheader("Batch extraction from documents")
+            docs = st.file_uploader("Upload text documents (one file = many paragraphs)",
+                                    type=["txt"], accept_multiple_files=True, key="nlp_docs")
+            bc1, bc2 = st.columns(2)
+            batch_size = bc1.number_input("Batch size", 1, 1024, 64)
+            n_process = bc2.number_input("Processes", 1, max(1, os.cpu_count() or 1), 1)
+            if docs and st.button("🚀 Run Batch Extraction", disabled=running):
+                from knowmap.extraction import iter_documents
+                texts = []
+                for d in docs:
+                    d.seek(0)
+                    texts.extend(iter_documents(d))
+                start_extraction(texts, int(batch_size), int(n_process))
+                st.experimental_rerun()
 
 # -------------------------------
 # TAB 5: SEMANTIC SEARCH + GRAPH (CLEAN & FIXED)
 # -------------------------------
-with tabs[4]:
+def render_search():
     st.header("🌐 Knowledge Graph Visualization & Semantic Search (Milestone 3)")
 
-    import tempfile
-    import networkx as nx
-    from pyvis.network import Network
+    import pandas as pd
 
     triples = st.session_state.get("triples", [])
     if not triples:
@@ -233,118 +452,236 @@ with tabs[4]:
         # --- Settings ---
         show_labels = st.checkbox("Show relation labels", value=False)
         top_k = st.number_input("Top-K matches", 1, 20, 5)
-
-        # --- Build Graph ---
-        G = nx.Graph()
-        for s, p, o in triples:
-            G.add_node(s)
-            G.add_node(o)
-            G.add_edge(s, o, relation=p)
+        search_mode = st.radio("Search mode", ["Hybrid", "Semantic", "Lexical (BM25)"], horizontal=True,
+                               help="Hybrid: BM25 candidates re-ranked by embeddings. "
+                                    "Lexical needs no model and is used automatically if it fails to load.")
+        with st.expander("Search settings"):
+            precision = st.selectbox("Index precision", ["float32", "float16", "int8"],
+                                     help="float16/int8 keep 2x/4x less index memory; the top 50 "
+                                          "candidates are re-ranked against the float32 vectors on disk.")
+            hc1, hc2, hc3 = st.columns(3)
+            n_candidates = int(hc1.number_input("BM25 candidates", 10, 5000, 200, step=50))
+            fusion = hc2.selectbox("Fusion", ["linear", "rrf"],
+                                   help="linear: alpha * dense + (1 - alpha) * BM25 (min-max normalised); "
+                                        "rrf: reciprocal rank fusion")
+            alpha = hc3.slider("alpha (dense weight)", 0.0, 1.0, 0.5, 0.05, disabled=fusion != "linear")
+
+        # --- Graph (cached per triple-set version) ---
+        kg = get_graph()
+        G = kg.G
 
         # --- Summary ---
         c1, c2, c3 = st.columns(3)
-        c1.metric("Nodes", G.number_of_nodes())
-        c2.metric("Edges", G.number_of_edges())
-        avg_deg = round(sum(dict(G.degree()).values()) / max(1, G.number_of_nodes()), 2)
-        c3.metric("Avg degree", avg_deg)
+        c1.metric("Nodes", kg.n_nodes)
+        c2.metric("Edges", kg.n_edges)
+        c3.metric("Avg degree", kg.avg_degree)
         st.markdown("---")
 
-        # --- Semantic Search (cached) ---
-        @st.cache_resource
-        def load_st_model():
-            from sentence_transformers import SentenceTransformer
-            return SentenceTransformer("all-MiniLM-L6-v2")
-
-        @st.cache_data
-        def embed_sentences(sentences):
-            import numpy as np
+        # --- Semantic Search (one shard per dataset, cached) ---
+        catalog = get_datasets()
+        active = st.session_state["dataset"]
+        shards = [active]
+        if len(catalog) > 1:
+            shards = st.multiselect("Search datasets", catalog.names(), default=[active],
+                                    help="Each dataset has its own index; they are searched in parallel "
+                                         "and the results merged by rank (reciprocal rank fusion).") or [active]
+
+        def semantic_backend(name, triples, precision):
+            """``(embeddings, index)`` for a dataset, or ``(None, None)`` while a job builds them.
+
+            Embedding and indexing run once per triple-set version and
+            precision in the background (shared by sessions on the same
+            version); exact below 50k triples, IVF above.
+            """
+            served = artifacts is not None and artifacts.serves(triples)
+            if served and artifacts.index is not None and artifacts.index.precision == precision:
+                return artifacts.embeddings, artifacts.index
             model = load_st_model()
-            return model.encode(sentences, convert_to_numpy=True)
+            store = load_embedding_store(name)
+            source = artifacts.embeddings if served else None
+
+            def build(ctx, frozen):
+                from knowmap.vector_index import build_index
+                emb = source
+                if emb is None:
+                    ctx.progress(0.0, f"Embedding {len(frozen):,} triples")
+                    emb = store.view(frozen, lambda sents: model.encode(sents, convert_to_numpy=True),
+                                     progress=lambda done, total: ctx.progress(
+                                         0.9 * done / total, f"Embedded {done:,}/{total:,} new triples"))
+                ctx.progress(0.9, "Building vector index")
+                params = {"precision": precision, "rerank": 0 if precision == "float32" else 50}
+                if len(emb) >= 50_000:
+                    return emb, build_index(emb, "ivf", n_probe=16, **params)
+                return emb, build_index(emb, "exact", **params)
+
+            job = submit_job(f"Embedding & indexing '{name}'", build,
+                             ("vector_index", name, triples.version, precision), store=triples)
+            return job.result if show_job(job) else (None, None)
+
+        def lexical_index(name, triples):
+            """Per-dataset BM25 index kept in the session and refreshed incrementally as the triples change."""
+            from knowmap.lexical import BM25Index
+            indexes = st.session_state.setdefault("bm25", {})
+            index = indexes.get(name)
+            if index is None:
+                index = indexes[name] = BM25Index(triples)
+            return index.refresh(triples)
 
-        sentences = [f"{s} {p} {o}" for s, p, o in triples]
         query = st.text_input("🔍 Semantic Search (e.g., 'Einstein physics')")
 
         highlight_nodes, highlight_edges = set(), set()
         if query.strip():
             try:
-                import numpy as np
-                from sklearn.metrics.pairwise import cosine_similarity
-
-                emb = embed_sentences(sentences)
-                q = load_st_model().encode([query], convert_to_numpy=True)
-                scores = cosine_similarity(q, emb)[0]
-                idxs = np.argsort(scores)[::-1][:top_k]
+                from knowmap.datasets import fan_out
+                from knowmap.lexical import hybrid_search
+
+                model = q = None
+                if search_mode != "Lexical (BM25)":
+                    try:
+                        model = load_st_model()
+                    except Exception as e:
+                        st.info(f"Embedding model unavailable ({e}); showing lexical (BM25) results.")
+                if model is not None:
+                    with timing.span("model.encode_query"):
+                        q = model.encode([query], convert_to_numpy=True)
+
+                def shard_search(bm25, emb, index):
+                    def search():
+                        if index is None:
+                            return bm25.search(query, int(top_k))
+                        if search_mode == "Hybrid":
+                            ids, scores = hybrid_search(bm25, query, int(top_k), emb, q, n_candidates=n_candidates,
+                                                        alpha=alpha, fusion=fusion)
+                            if len(ids):
+                                return ids, scores  # otherwise no lexical matches: semantic only
+                        ids, scores = index.search(q, int(top_k))
+                        return ids[0], scores[0]
+                    return search
+
+                # jobs and widgets stay on the script thread; only the searches fan out
+                backends, searches, pending = {}, {}, []
+                for name in shards:
+                    store = catalog[name].store
+                    emb = index = None
+                    if model is not None:
+                        emb, index = semantic_backend(name, store, precision)
+                        if index is None:
+                            pending.append(name)
+                    backends[name] = (lexical_index(name, store), emb, index)
+                    searches[name] = shard_search(*backends[name])
+                if pending:
+                    st.caption(f"Showing lexical (BM25) results for {', '.join(pending)} until the embeddings are ready.")
+                shard_ms = {}
+                # shards can score on different scales (hybrid vs BM25 while an index builds): merge by rank
+                hits = fan_out(searches, int(top_k), stats=shard_ms, merge="rrf" if len(searches) > 1 else "score")
 
                 results = []
-                for i in idxs:
-                    s, p, o = triples[i]
-                    results.append({"Subject": s, "Relation": p, "Object": o, "Score": float(scores[i])})
-                    highlight_nodes.update([s, o])
-                    highlight_edges.add((s, o, p))
+                for name, i, score in hits:
+                    s, p, o = catalog[name].store[i]
+                    row = {"Subject": s, "Relation": p, "Object": o, "Score": float(score)}
+                    if len(shards) > 1:
+                        row["Dataset"] = name
+                    results.append(row)
+                    if name == active:  # the graph below shows the active dataset
+                        highlight_nodes.update([s, o])
+                        highlight_edges.add((s, o, p))
                 st.subheader("Results")
                 st.dataframe(pd.DataFrame(results), use_container_width=True)
+                if len(shards) > 1:
+                    st.caption("Per-dataset latency: " + " · ".join(f"{n} {ms:.1f} ms" for n, ms in shard_ms.items()))
+
+                with st.expander("⏱️ Compare with semantic-only ranking"):
+                    bm25, emb, index = backends.get(active, (None, None, None))
+                    if st.button("Run comparison") and index is not None:
+                        from knowmap.lexical import compare_modes
+                        report = compare_modes([query], bm25, int(top_k), index, emb,
+                                               lambda sents: model.encode(sents, convert_to_numpy=True),
+                                               n_candidates=n_candidates, alpha=alpha, fusion=fusion)
+                        st.dataframe(pd.DataFrame(report), use_container_width=True)
+                        st.caption("Latencies include query encoding; overlap = share of the semantic-only "
+                                   "top-K also returned by that mode (active dataset).")
+                    elif index is None:
+                        st.caption("Needs the embedding model and a finished index for the active dataset.")
             except Exception as e:
                 st.error(f"Semantic search failed: {e}")
 
+        # --- Graph context around hits / paths ---
+        with st.expander("🧭 Graph context & paths"):
+            engine = get_graph_engine()
+            gc1, gc2, gc3 = st.columns(3)
+            ctx_hops = int(gc1.number_input("Hops around hits", 1, 4, 2))
+            ctx_dir = gc2.selectbox("Direction", ["both", "out", "in"])
+            ctx_rels = gc3.multiselect("Only relations", sorted(r for r, c in kg.relation_counts.items() if c > 0))
+            if highlight_nodes:
+                ctx = engine.context(sorted(highlight_nodes), ctx_hops, relations=ctx_rels or None,
+                                     direction=ctx_dir, max_nodes=5000)
+                st.write(f"{len(ctx)} triples within {ctx_hops} hops of the top hits")
+                st.dataframe(pd.DataFrame(ctx[:1000], columns=["Subject","Relation","Object"]))
+            else:
+                st.caption("Run a search to expand its hits with graph context.")
+            pc1, pc2 = st.columns(2)
+            path_from = pc1.text_input("Path from (entity)", key="path_from")
+            path_to = pc2.text_input("Path to (entity)", key="path_to")
+            if path_from and path_to:
+                path = engine.shortest_path(path_from, path_to, relations=ctx_rels or None, direction=ctx_dir)
+                if path is None:
+                    st.warning("No path found.")
+                else:
+                    st.dataframe(pd.DataFrame(path, columns=["Subject","Relation","Object"]))
+
         # --- Graph Display ---
-        H = G.copy()
-        deg = dict(H.degree())
-        max_deg = max(deg.values()) if deg else 1
-        def size_for(n): return 16 + int(22 * (deg.get(n,0) / max_deg))
-
-        net = Network(height="680px", width="100%", bgcolor="#0e1117", font_color="white")
-        net.barnes_hut(gravity=-40000, central_gravity=0.25, spring_length=260, spring_strength=0.02, damping=0.5)
-
-        for n in H.nodes():
-            color = "#FF6B6B" if n in highlight_nodes else "#7FB3FF"
-            net.add_node(n, label=n, title=n, color=color, size=size_for(n))
-
-        for u, v, data in H.edges(data=True):
-            rel = data.get("relation","")
-            is_hit = (u, v, rel) in highlight_edges or (v, u, rel) in highlight_edges
-            edge_kwargs = dict(title=rel)
-            if show_labels:
-                edge_kwargs["label"] = rel
-            if is_hit:
-                edge_kwargs["width"] = 3
-            net.add_edge(u, v, **edge_kwargs)
-
-        # Try to set options (safe for mixed pyvis versions)
-        try:
-            net.set_options("""
-{
-  "nodes": {"borderWidth": 2, "shape": "dot", "font": {"size": 16}},
-  "edges": {
-    "font": {"size": 12, "background": "rgba(14,17,23,0.85)"},
-    "color": {"inherit": false, "opacity": 0.8},
-    "smooth": {"type": "continuous"}
-  },
-  "physics": {
-    "barnesHut": {"gravitationalConstant": -40000, "springLength": 260},
-    "stabilization": {"enabled": true, "iterations": 250}
-  },
-  "interaction": {"hover": true, "tooltipDelay": 120, "zoomView": true, "dragView": true}
-}
-""")
-        except Exception:
-            pass  # fall back to defaults if pyvis version differs
+        from knowmap.render import ViewCache, build_view, layout_for, layout_from, render_html, with_highlights
+
+        vc1, vc2, vc3, vc4 = st.columns(4)
+        view_mode = vc1.selectbox("Graph view", ["Top nodes", "Communities", "Ego network around hits"])
+        max_nodes = vc2.slider("Max nodes", 50, 3000, 500, step=50)
+        hops = int(vc3.number_input("Hops (ego view)", 1, 3, 1))
+        importance = vc4.selectbox("Node importance", ["pagerank", "degree"],
+                                   help="Picks the top nodes and sizes them; PageRank is recomputed per "
+                                        "graph version, warm-started from the previous ranks.")
+        mode = {"Top nodes": "top", "Communities": "communities"}.get(view_mode, "ego")
+        if mode == "ego" and not highlight_nodes:
+            st.info("Run a search to see the neighbourhood of its hits; showing top nodes meanwhile.")
+            mode = "top"
+
+        # layouts and pages are cached per graph version; highlights are injected afterwards
+        cache = st.session_state.setdefault("view_cache", ViewCache())
+        view_key = (kg.version, mode, max_nodes, hops if mode == "ego" else 0,
+                    tuple(sorted(highlight_nodes)) if mode == "ego" else (), importance)
+
+        def build_page():
+            communities = kg.analytics.communities() if mode == "communities" else None
+            scores = kg.analytics.importance(importance)
+            view = build_view(G, mode, max_nodes, seeds=highlight_nodes, hops=hops, scores=scores,
+                              communities=communities)
+            def positions_for_view():
+                if mode == "top" and artifacts is not None and artifacts.serves(kg.store):
+                    positions = layout_from(artifacts.layout, view.nodes())
+                    if positions is not None:
+                        return positions
+                return layout_for(view)
+            positions = cache.get_or_build(("layout",) + view_key, positions_for_view)
+            if mode == "communities":
+                biggest = max((d["members"] for _, d in view.nodes(data=True)), default=1)
+                sizes = {n: 16 + int(30 * d["members"] / biggest) for n, d in view.nodes(data=True)}
+            else:
+                top_score = max(scores.values(), default=0) or 1
+                sizes = {n: 16 + int(22 * (scores.get(n, 0) / top_score) ** 0.5) for n in view.nodes()}
+            return render_html(view, positions, sizes, show_labels=show_labels)
 
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".html")
-        net.write_html(tmp.name)
-        with open(tmp.name, "r", encoding="utf-8") as f:
-            html = f.read()
+        html = cache.get_or_build(("html", show_labels) + view_key, build_page)
+        html = with_highlights(html, highlight_nodes, [(s, o) for s, o, _ in highlight_edges])
         st.components.v1.html(html, height=720, scrolling=True)
-        os.unlink(tmp.name)
 
         st.markdown("**Triple Preview**")
-        st.dataframe(pd.DataFrame(triples[:25], columns=["Subject","Relation","Object"]))
+        st.dataframe(triples.to_frame().head(25))
 
 
         # -------------------------------
 # TAB 6: ADMIN DASHBOARD (Milestone 4)
 # -------------------------------
-with tabs[5]:
-    import networkx as nx
+def render_admin():
+    import pandas as pd
     import json
     import datetime
     from io import BytesIO
@@ -352,53 +689,102 @@ with tabs[5]:
     st.header("🛠 Admin Dashboard — Graph & User Management (Milestone 4)")
 
     # --- Helpers & persistence ---
-    ADMIN_LOG = "admin_log.json"
     BACKUP_DIR = "kg_backups"
     os.makedirs(BACKUP_DIR, exist_ok=True)
+    admin_log, feedback_log = get_logs()
 
     def log_admin(action, detail=""):
-        entry = {"ts": datetime.datetime.utcnow().isoformat() + "Z", "action": action, "detail": detail}
-        logs = []
-        if os.path.exists(ADMIN_LOG):
-            try:
-                with open(ADMIN_LOG, "r") as f:
-                    logs = json.load(f)
-            except Exception:
-                logs = []
-        logs.insert(0, entry)
-        with open(ADMIN_LOG, "w") as f:
-            json.dump(logs[:200], f, indent=2)
-
-    def build_graph_from_session():
-        triples = st.session_state.get("triples", [])
-        G = nx.Graph()
-        for s, p, o in triples:
-            G.add_node(s); G.add_node(o)
-            G.add_edge(s, o, relation=p)
-        return G
-
-    def triples_from_graph(G):
-        triples = []
-        for u, v, data in G.edges(data=True):
-            triples.append((u, data.get("relation", ""), v))
-        return triples
+        admin_log.append({"ts": datetime.datetime.utcnow().isoformat() + "Z", "action": action, "detail": detail})
 
     # ensure we have a graph object available for admin actions
-    G_admin = build_graph_from_session()
+    kg = get_graph()
+    G_admin = kg.G
+
+    # edits go to an append-only journal (see knowmap/journal.py) instead of full backups
+    # one journal per dataset; the default/prebuilt dataset keeps the original kg_backups history
+    dataset_name = st.session_state["dataset"]
+    journals = st.session_state.setdefault("journals", {})
+    if dataset_name not in journals:
+        from knowmap.datasets import DEFAULT_NAME, dataset_dir
+        from knowmap.journal import EditJournal
+        journal_root = BACKUP_DIR if dataset_name in (DEFAULT_NAME, "prebuilt") else dataset_dir(BACKUP_DIR, dataset_name)
+        journals[dataset_name] = EditJournal(journal_root)
+    journal = journals[dataset_name]
+    journal_versions = st.session_state.setdefault("journal_versions", {})
+
+    def journaled(op, apply, **args):
+        """Apply an edit to kg and append it to the journal; returns the entry id."""
+        if journal_versions.get(dataset_name) != kg.version:
+            journal.begin(kg.store, note="session graph")  # graph was replaced: new history
+        apply()
+        entry_id = journal.record(op, kg.store, **args)
+        journal_versions[dataset_name] = kg.version
+        st.session_state["triples"] = kg.store
+        return entry_id
+
+    def use_restored(restore):
+        """Switch to the graph ``restore()`` rebuilds; False if its entry was compacted away."""
+        try:
+            restored = restore()
+        except KeyError:
+            st.warning("That point of the edit history was removed by a journal compaction "
+                       "(possibly in another session); the history below has been reloaded.")
+            return False
+        st.session_state["kg"] = restored
+        st.session_state["triples"] = restored.store
+        journal_versions[dataset_name] = restored.version
+        return True
     st.subheader("Quick stats")
     c1, c2, c3, c4 = st.columns(4)
-    c1.metric("Nodes", G_admin.number_of_nodes())
-    c2.metric("Edges", G_admin.number_of_edges())
-    degrees = dict(G_admin.degree())
-    top_nodes = sorted(degrees.items(), key=lambda x: x[1], reverse=True)[:5]
-    c3.metric("Top node degree", top_nodes[0][1] if top_nodes else 0)
-    # top relation counts
-    rels = {}
-    for _,_,d in G_admin.edges(data=True):
-        rels[d.get("relation","")] = rels.get(d.get("relation",""), 0) + 1
-    top_rels = sorted(rels.items(), key=lambda x: x[1], reverse=True)[:3]
+    c1.metric("Nodes", kg.n_nodes)
+    c2.metric("Edges", kg.n_edges)
+    c3.metric("Top node degree", kg.max_degree)
+    top_rels = kg.top_relations(3)
     c4.metric("Top relation (count)", f"{top_rels[0][0]} ({top_rels[0][1]})" if top_rels else "N/A")
 
+    # histograms and components are maintained by the graph's edits; scores are cached per version
+    with st.expander("📈 Graph analytics"):
+        from knowmap.analytics import approx_betweenness, degree_histogram
+        components = kg.components
+        sizes = components.sizes()
+        ac1, ac2, ac3 = st.columns(3)
+        ac1.metric("Connected components", f"{len(sizes):,}")
+        ac2.metric("Largest component", f"{sizes[0]:,} nodes" if sizes else "N/A")
+        ac3.metric("Isolated nodes", f"{kg.degree_counts.get(0, 0):,}")
+        hc1, hc2 = st.columns(2)
+        hc1.caption("Degree distribution (nodes per degree bucket)")
+        hc1.bar_chart(pd.Series(degree_histogram(kg.degree_counts), name="nodes"))
+        hc2.caption("Top relations (edges)")
+        hc2.bar_chart(pd.Series(dict(kg.top_relations(20)), name="edges"))
+
+        if st.checkbox("Compute central nodes and communities", key="admin_centrality",
+                       help="PageRank and communities are cached per graph version; "
+                            "the counts above are maintained by every edit."):
+            st.markdown("**Most central nodes**")
+            pagerank_top = kg.analytics.top(10, "pagerank")
+            st.dataframe(pd.DataFrame([{"node": n, "pagerank": round(r, 6), "degree": kg.G.degree(n)}
+                                       for n, r in pagerank_top]))
+            st.caption(f"PageRank power iteration converged in {kg.analytics.pagerank_iterations} steps "
+                       "(warm-started from the previous graph version).")
+
+            bc1, bc2 = st.columns([1, 3])
+            samples = int(bc1.number_input("Betweenness pivots", 8, 1024, 64, step=8))
+            if bc2.button("Estimate betweenness (sampled)"):
+                from knowmap.graph import KnowledgeGraph
+                st.session_state["betweenness_job"] = submit_job(
+                    "Betweenness", lambda ctx, store: approx_betweenness(KnowledgeGraph(store).G, samples),
+                    ("betweenness", kg.version, samples), store=kg.store).id
+            bt_job = get_jobs().get(st.session_state.get("betweenness_job"))
+            if bt_job is not None and bt_job.key[1] == kg.version and show_job(bt_job):
+                import heapq
+                top_bt = heapq.nlargest(10, bt_job.result.items(), key=lambda x: x[1])
+                st.dataframe(pd.DataFrame([{"node": n, "betweenness": round(b, 6)} for n, b in top_bt]))
+
+            community_method = st.selectbox("Communities", ["label_propagation", "louvain"], key="community_method")
+            communities = kg.analytics.communities(community_method)
+            st.caption(f"{len(communities):,} communities · largest: "
+                       + ", ".join(f"{len(c):,}" for c in communities[:10]))
+
     st.markdown("---")
     st.subheader("Manual Graph Controls")
 
@@ -412,15 +798,11 @@ with tabs[5]:
         elif node_to_rename not in G_admin:
             st.error("Node not found in current graph.")
         else:
-            # backup
-            ts = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-            backup_path = os.path.join(BACKUP_DIR, f"backup_before_rename_{ts}.json")
-            with open(backup_path, "w") as f: json.dump(triples_from_graph(G_admin), f)
-            # rename
-            nx.relabel_nodes(G_admin, {node_to_rename: node_new_name}, copy=False)
-            st.session_state["triples"] = triples_from_graph(G_admin)
+            # rename (applied as a delta to graph and triples, journaled for undo)
+            entry_id = journaled("rename", lambda: kg.rename_node(node_to_rename, node_new_name),
+                                 old=node_to_rename, new=node_new_name)
             log_admin("rename_node", f"{node_to_rename} -> {node_new_name}")
-            st.success(f"Renamed '{node_to_rename}' to '{node_new_name}'. Backup: {backup_path}")
+            st.success(f"Renamed '{node_to_rename}' to '{node_new_name}'. Journal entry: {entry_id}")
 
     # --- Merge nodes ---
     merge_a = st.text_input("Merge Node A (target)", key="admin_merge_a")
@@ -431,17 +813,80 @@ with tabs[5]:
         elif merge_a not in G_admin or merge_b not in G_admin:
             st.error("One or both nodes not found.")
         else:
-            ts = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-            backup_path = os.path.join(BACKUP_DIR, f"backup_before_merge_{ts}.json")
-            with open(backup_path, "w") as f: json.dump(triples_from_graph(G_admin), f)
             # move neighbors of B to A
-            for nbr in list(G_admin.neighbors(merge_b)):
-                if not G_admin.has_edge(merge_a, nbr) and nbr != merge_a:
-                    G_admin.add_edge(merge_a, nbr, **G_admin.edges[merge_b, nbr])
-            G_admin.remove_node(merge_b)
-            st.session_state["triples"] = triples_from_graph(G_admin)
+            entry_id = journaled("merge", lambda: kg.merge_nodes(merge_a, merge_b),
+                                 target=merge_a, source=merge_b)
             log_admin("merge_nodes", f"{merge_b} -> {merge_a}")
-            st.success(f"Merged '{merge_b}' into '{merge_a}'. Backup: {backup_path}")
+            st.success(f"Merged '{merge_b}' into '{merge_a}'. Journal entry: {entry_id}")
+
+    # --- Entity resolution (bulk merge proposals) ---
+    st.markdown("**Find duplicate entities**")
+    er1, er2, er3 = st.columns(3)
+    er_threshold = er1.slider("Min. similarity", 0.5, 1.0, 0.75, 0.01, key="er_threshold")
+    er_use_emb = er2.checkbox("Use MiniLM embeddings", value=True, key="er_use_emb")
+    er_limit = int(er3.number_input("Max proposals", 10, 100_000, 500, key="er_limit"))
+    if st.button("Propose merges"):
+        from knowmap.resolution import EntityResolver
+        encode = None
+        if er_use_emb:
+            model = load_st_model()
+            encode = lambda names: model.encode(names, batch_size=256, convert_to_numpy=True)
+        resolver = EntityResolver(threshold=er_threshold, encode=encode)
+        with st.spinner("Blocking and scoring candidate pairs..."):
+            proposals = resolver.resolve(kg.store, limit=er_limit)
+        st.session_state["er_proposals"] = (kg.version, proposals, resolver.stats)
+    er_state = st.session_state.get("er_proposals")
+    if er_state and er_state[0] == kg.version:
+        _, proposals, er_stats = er_state
+        st.caption(f"{er_stats['entities']} entities · {er_stats['candidates']} candidate pairs · "
+                   f"{len(proposals)} proposals · {er_stats['total_s']}s")
+        if proposals:
+            st.dataframe(pd.DataFrame(proposals))
+            accept_min = st.slider("Accept proposals with score ≥", 0.5, 1.0,
+                                   max(0.9, er_threshold), 0.01, key="er_accept_min")
+            accepted = [p for p in proposals if p["score"] >= accept_min]
+            if st.button(f"Merge {len(accepted)} accepted proposals", disabled=not accepted):
+                from knowmap.resolution import plan_merges
+                plan = plan_merges(accepted)
+                entry_id = journaled("merge_many", lambda: kg.merge_many(plan), pairs=plan)
+                log_admin("merge_proposals", f"{len(plan)} merges")
+                st.success(f"Merged {len(plan)} entities. Journal entry: {entry_id}")
+                st.session_state.pop("er_proposals", None)
+
+    # --- Cross-domain similarity links ---
+    st.markdown("**Cross-domain similarity links**")
+    entity_domains = st.session_state.get("entity_domains")
+    if not entity_domains:
+        st.caption("Needs a dataset with a `domain` column covering at least two domains.")
+    else:
+        st.caption(" · ".join(f"{d}: {n:,} entities" for d, n in entity_domains.counts().items()))
+        cd1, cd2, cd3 = st.columns(3)
+        cd_k = int(cd1.number_input("Neighbours per entity", 1, 20, 3, key="cd_k"))
+        cd_threshold = cd2.slider("Min. similarity", 0.3, 1.0, 0.75, 0.01, key="cd_threshold")
+        cd_limit = int(cd3.number_input("Max links", 10, 1_000_000, 5000, key="cd_limit"))
+        if st.button("Find cross-domain links"):
+            from knowmap.crossdomain import link_domains
+            model = load_st_model()
+            encode = lambda names: model.encode(names, batch_size=256, convert_to_numpy=True)
+            cd_stats = {}
+            with st.spinner("Embedding entities and scanning domain pairs..."):
+                links = link_domains(entity_domains.restrict(kg.G.nodes), encode, k=cd_k,
+                                     threshold=cd_threshold, max_links=cd_limit, stats=cd_stats)
+            st.session_state["cd_links"] = (kg.version, links, cd_stats)
+        cd_state = st.session_state.get("cd_links")
+        if cd_state and cd_state[0] == kg.version:
+            _, links, cd_stats = cd_state
+            st.caption(f"{cd_stats['entities']:,} entities · {len(links):,} links · "
+                       f"encode {cd_stats['encode_s']}s · search {cd_stats['search_s']}s")
+            if links:
+                st.dataframe(pd.DataFrame(links))
+                if st.button(f"Add {len(links)} similar_to edges"):
+                    from knowmap.crossdomain import link_triples
+                    new_triples = link_triples(links)
+                    entry_id = journaled("import_merge", lambda: kg.add_triples(new_triples), triples=new_triples)
+                    log_admin("cross_domain_links", f"{len(new_triples)} similar_to edges")
+                    st.success(f"Added {len(new_triples)} similar_to edges. Journal entry: {entry_id}")
+                    st.session_state.pop("cd_links", None)
 
     # --- Delete node ---
     node_delete = st.text_input("Delete node (exact)", key="admin_delete_node")
@@ -451,89 +896,217 @@ with tabs[5]:
         elif node_delete not in G_admin:
             st.error("Node not found.")
         else:
-            ts = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-            backup_path = os.path.join(BACKUP_DIR, f"backup_before_delete_{ts}.json")
-            with open(backup_path, "w") as f: json.dump(triples_from_graph(G_admin), f)
-            G_admin.remove_node(node_delete)
-            st.session_state["triples"] = triples_from_graph(G_admin)
+            entry_id = journaled("delete", lambda: kg.delete_node(node_delete), node=node_delete)
             log_admin("delete_node", node_delete)
-            st.success(f"Deleted node '{node_delete}'. Backup: {backup_path}")
+            st.success(f"Deleted node '{node_delete}'. Journal entry: {entry_id}")
+
+    # --- Undo / redo / restore ---
+    st.markdown("**Edit history**")
+    uc1, uc2, uc3 = st.columns(3)
+    if uc1.button("↩️ Undo", disabled=not journal.can_undo()) and use_restored(journal.undo):
+        log_admin("undo", str(journal.head))
+        st.experimental_rerun()
+    if uc2.button("↪️ Redo", disabled=not journal.can_redo()) and use_restored(journal.redo):
+        log_admin("redo", str(journal.head))
+        st.experimental_rerun()
+    keep_snaps = uc3.number_input("Snapshots to keep", 1, 100, 5)
+    if uc3.button("Compact journal"):
+        removed, dropped = journal.compact(keep_snapshots=int(keep_snaps))
+        log_admin("compact_journal", f"{removed} entries, {dropped} snapshots removed")
+        st.success(f"Removed {removed} journal entries and {dropped} snapshots.")
+    if uc3.button("Compact embedding cache",
+                  help="Drop cached embeddings of triples no longer in this dataset."):
+        kept = load_embedding_store(dataset_name).compact(keep=kg.store)
+        log_admin("compact_embeddings", f"{kept} rows kept")
+        st.success(f"Embedding cache compacted to {kept:,} rows.")
+    history = journal.history(limit=25)
+    if history:
+        st.dataframe(pd.DataFrame([{"id": e["id"], "ts": e["ts"], "op": e["op"], "args": json.dumps(e.get("args", {}))}
+                                   for e in history]))
+        restore_id = st.selectbox("Restore to entry", [e["id"] for e in history],
+                                  format_func=lambda i: f"{i} · {journal.entries[i]['ts']} · {journal.entries[i]['op']}")
+        if st.button("Restore selected point") and use_restored(lambda: journal.restore(restore_id)):
+            log_admin("restore", str(restore_id))
+            st.experimental_rerun()
 
     st.markdown("---")
     st.subheader("Graph Import / Export")
 
-    # Export GraphML
-    if st.button("Export graph to GraphML"):
-        path = os.path.join(BACKUP_DIR, f"knowledge_graph_{datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.graphml")
-        nx.write_graphml(G_admin, path)
-        with open(path, "rb") as f:
-            st.download_button("Download GraphML", f, file_name=os.path.basename(path))
+    from knowmap.snapshot import SUFFIX, iter_graphml_triples, read_snapshot, write_graphml, write_snapshot
+    stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    ec1, ec2, ec3 = st.columns(3)
+
+    # Binary snapshot: columnar codes + vocabularies, memory-mapped on load
+    if ec1.button("Export binary snapshot"):
+        b = BytesIO()
+        write_snapshot(kg.store, b)
+        st.download_button("Download snapshot", b.getvalue(), file_name=f"knowledge_graph_{stamp}{SUFFIX}")
+        log_admin("export_snapshot", f"{len(kg.store)} triples")
+
+    # Export GraphML (streamed from the triple store in a background job)
+    if ec2.button("Export graph to GraphML"):
+        path = os.path.join(BACKUP_DIR, f"knowledge_graph_{stamp}.graphml")
+
+        def export(ctx, store):
+            ctx.progress(0.0, f"Writing {len(store):,} triples")
+            return write_graphml(store, path)
+
+        st.session_state["export_job"] = submit_job("GraphML export", export, ("export_graphml", kg.version),
+                                                    store=kg.store).id
         log_admin("export_graphml", path)
+    export_job = get_jobs().get(st.session_state.get("export_job"))
+    if export_job is not None and show_job(export_job):
+        with open(export_job.result, "rb") as f:
+            st.download_button("Download GraphML", f, file_name=os.path.basename(export_job.result))
 
     # Export JSON triples
-    if st.button("Export triples as JSON"):
-        data = triples_from_graph(G_admin)
-        b = BytesIO(json.dumps(data, indent=2).encode("utf-8"))
+    if ec3.button("Export triples as JSON"):
+        b = BytesIO(json.dumps(list(kg.store), separators=(",", ":")).encode("utf-8"))
         st.download_button("Download triples.json", b, file_name="triples.json")
         log_admin("export_json", "triples.json")
 
-    # Upload a saved graph (GraphML or JSON)
-    uploaded_graph = st.file_uploader("Upload GraphML or triples JSON to restore/merge", type=["graphml","json"])
-    if uploaded_graph is not None:
+    # Upload a saved graph (snapshot, GraphML or JSON) to replace or merge
+    uploaded_graph = st.file_uploader("Upload a snapshot, GraphML or triples JSON to restore/merge",
+                                      type=[SUFFIX.lstrip("."), "graphml", "json"])
+    import_mode = st.radio("Import mode", ["Replace session graph", "Merge into existing graph", "Add as new dataset"],
+                           horizontal=True, key="import_mode")
+    if uploaded_graph is not None and st.button("Import"):
         try:
             fname = uploaded_graph.name.lower()
-            if fname.endswith(".graphml"):
-                H = nx.read_graphml(uploaded_graph)
-                # convert GraphML to our triples format and replace session graph
-                new_triples = []
-                for u, v, data in H.edges(data=True):
-                    rel = data.get("relation", "") or data.get("label", "") or ""
-                    new_triples.append((u, rel, v))
-                st.session_state["triples"] = new_triples
-                st.success("Loaded GraphML into session (triples replaced).")
-                log_admin("import_graphml", uploaded_graph.name)
+            if fname.endswith(SUFFIX):
+                batches = [read_snapshot(uploaded_graph.getvalue())]
+            elif fname.endswith(".graphml"):
+                batches = iter_graphml_triples(uploaded_graph)  # streamed, 50k edges per batch
             else:
-                # assume JSON triples list
                 payload = json.load(uploaded_graph)
-                # validate
-                if isinstance(payload, list) and all(len(x) >= 3 for x in payload):
-                    st.session_state["triples"] = [(str(x[0]), str(x[1]), str(x[2])) for x in payload]
-                    st.success("Loaded triples JSON into session.")
-                    log_admin("import_json", uploaded_graph.name)
-                else:
-                    st.error("JSON file not recognized as triples list.")
+                if not (isinstance(payload, list) and all(len(x) >= 3 for x in payload)):
+                    raise ValueError("JSON file not recognized as triples list.")
+                batches = [[(x[0], x[1], x[2]) for x in payload]]
+
+            if fname.endswith(SUFFIX):
+                imported = batches[0]
+            else:
+                bar = st.progress(0.0, text="Parsing…")
+                imported = TripleStore()
+                for batch in batches:
+                    imported.extend(batch)
+                    bar.progress(0.5, text=f"Parsed {len(imported):,} triples")
+                bar.empty()
+
+            if import_mode.startswith("Replace"):
+                st.session_state["triples"] = imported
+                st.session_state.pop("entity_domains", None)
+                journal.begin(imported, note=f"import {uploaded_graph.name}")
+                journal_versions[dataset_name] = imported.version
+                st.success(f"Loaded {len(imported):,} triples from {uploaded_graph.name} (session graph replaced).")
+            elif import_mode.startswith("Merge"):
+                name = journal.save_import(imported)
+                entry_id = journaled("import_merge", lambda: kg.add_triples(imported), file=name)
+                st.success(f"Merged {len(imported):,} triples from {uploaded_graph.name}. Journal entry: {entry_id}")
+            else:
+                new_name = os.path.splitext(uploaded_graph.name)[0]
+                add_dataset(new_name, imported)
+                st.success(f"Added {len(imported):,} triples from {uploaded_graph.name} as dataset '{new_name}'.")
+            log_admin("import_" + import_mode.split()[0].lower(), uploaded_graph.name)
         except Exception as e:
             st.error(f"Failed to load graph: {e}")
 
     st.markdown("---")
     st.subheader("User Management")
 
-    # list users and allow deletion
-    users = load_users()
-    st.write(f"Total users: {len(users)}")
-    if users:
-        for u in list(users.keys()):
-            col1, col2 = st.columns([4,1])
-            col1.write(u)
-            if col2.button(f"Delete {u}", key=f"deluser_{u}"):
-                users.pop(u, None)
-                save_users(users)
-                log_admin("delete_user", u)
-                st.success(f"Deleted user {u}")
-                st.experimental_rerun()
+    # paginated user list with deletion
+    user_repo = get_user_repo()
+    uc1, uc2 = st.columns([3, 1])
+    user_search = uc1.text_input("Search users", key="user_search")
+    n_users = user_repo.count(user_search or None)
+    n_pages = max(1, (n_users + 24) // 25)
+    user_page = int(uc2.number_input(f"Page (of {n_pages})", 1, n_pages, 1, key="user_page"))
+    st.write(f"Total users: {n_users}")
+    for row in user_repo.list((user_page - 1) * 25, 25, user_search or None):
+        u = row["email"]
+        col1, col2 = st.columns([4,1])
+        col1.write(u)
+        if col2.button(f"Delete {u}", key=f"deluser_{u}"):
+            user_repo.delete(u)
+            log_admin("delete_user", u)
+            st.success(f"Deleted user {u}")
+            st.experimental_rerun()
 
     st.markdown("---")
     st.subheader("Activity Log (latest)")
-    if os.path.exists(ADMIN_LOG):
-        try:
-            with open(ADMIN_LOG, "r") as f:
-                logs = json.load(f)
-            st.dataframe(pd.DataFrame(logs).head(50))
-        except Exception:
-            st.write("Log read error.")
+    lc1, lc2 = st.columns(2)
+    log_range = lc1.selectbox("Range", ["Latest", "Last hour", "Last 24 hours", "Last 7 days"])
+    log_page = int(lc2.number_input("Page (50 entries each)", 1, 10_000, 1))
+    if log_range == "Latest":
+        logs = admin_log.tail(50, skip=(log_page - 1) * 50)
+    else:
+        hours = {"Last hour": 1, "Last 24 hours": 24, "Last 7 days": 168}[log_range]
+        since = datetime.datetime.utcnow() - datetime.timedelta(hours=hours)
+        logs = admin_log.between(since)[::-1][(log_page - 1) * 50:log_page * 50]
+    if logs:
+        st.dataframe(pd.DataFrame(logs))
     else:
         st.info("No admin activity yet.")
 
+    st.markdown("---")
+    st.subheader("Feedback summary")
+    from knowmap.logs import FeedbackStats
+    if "feedback_stats" not in st.session_state:
+        st.session_state["feedback_stats"] = FeedbackStats(feedback_log)
+    fstats = st.session_state["feedback_stats"].refresh()
+    fc1, fc2, fc3 = st.columns(3)
+    fc1.metric("Responses", fstats.count)
+    fc2.metric("Avg rating", round(fstats.mean("rating"), 2))
+    fc3.metric("Avg graph relevance", round(fstats.mean("graph_relevance"), 2))
+    if fstats.count:
+        st.bar_chart(pd.DataFrame({"rating": fstats.distribution("rating"),
+                                   "graph_relevance": fstats.distribution("graph_relevance")}))
+
+    st.markdown("---")
+    st.subheader("⚙️ Background jobs")
+    jobs = get_jobs().jobs()
+    if jobs:
+        st.dataframe(pd.DataFrame([j.as_dict() for j in jobs]))
+        running = [j for j in jobs if not j.done]
+        if running:
+            names = {j.id: j.name for j in running}
+            cancel_id = st.selectbox("Running job", list(names), format_func=lambda i: f"{i} · {names[i]}")
+            if st.button("Cancel job"):
+                get_jobs().cancel(cancel_id)
+                log_admin("cancel_job", str(cancel_id))
+            st.session_state["poll_jobs"] = True
+    else:
+        st.info("No background jobs yet.")
+
+    st.markdown("---")
+    st.subheader("⚡ Performance")
+    pc1, pc2 = st.columns(2)
+    perf_on = pc1.checkbox("Enable instrumentation", value=timing.is_enabled(), key="perf_on")
+    perf_mem = pc2.checkbox("Track memory (tracemalloc, slower)", value=timing.memory_enabled(), key="perf_mem")
+    if perf_on != timing.is_enabled() or (perf_on and perf_mem != timing.memory_enabled()):
+        timing.enable(perf_on, memory=perf_mem)
+        log_admin("instrumentation", f"enabled={perf_on} memory={perf_mem}")
+    if not timing.is_enabled():
+        st.caption("Instrumentation is off; hot-path spans cost nothing until enabled.")
+    scope = st.radio("Scope", ["This session", "All sessions (process)"], horizontal=True, key="perf_scope")
+    registry = st.session_state["perf_registry"] if scope == "This session" else timing.REGISTRY
+    summary = registry.summary()
+    if summary:
+        st.dataframe(pd.DataFrame([{"span": name, **{k: v for k, v in stats.items() if k != "buckets"}}
+                                   for name, stats in summary.items()]))
+        hist_span = st.selectbox("Latency histogram", list(summary), key="perf_hist_span")
+        st.bar_chart(pd.DataFrame({"count": summary[hist_span]["buckets"]}))
+        ec1, ec2, ec3 = st.columns(3)
+        ec1.download_button("Export JSON", registry.to_json(), file_name="knowmap_perf.json")
+        ec2.download_button("Export Prometheus", registry.to_prometheus(), file_name="knowmap_perf.prom")
+        if ec3.button("Reset histograms"):
+            registry.reset()
+            st.experimental_rerun()
+    else:
+        st.info("No spans recorded yet.")
+    if timing.memory_enabled() and st.button("Top allocation sites"):
+        st.dataframe(pd.DataFrame(timing.memory_top(15)))
+
     st.markdown("---")
     st.write("Tip: Always export or backup before destructive admin actions.")
 
@@ -541,7 +1114,7 @@ with tabs[5]:
     # -------------------------------
 # TAB 7: FEEDBACK (Milestone 5)
 # -------------------------------
-with tabs[6]:
+def render_feedback():
     st.header("💬 User Feedback & Peer Testing (Milestone 5)")
     st.write("Help us improve KnowMap by sharing your feedback!")
 
@@ -555,34 +1128,47 @@ with tabs[6]:
             "graph_relevance": graph_relevance,
             "comments": comments
         }
-        with open("feedback.json", "a") as f:
-            f.write(json.dumps(feedback) + "\n")
+        get_logs()[1].append(feedback)
         st.success("✅ Thank you for your feedback!")
 
-!ls -lh app.py
-
-from pyngrok import ngrok
 
-ngrok.set_auth_token("34nHfPukbCwbGSgNsVbos3hQ7K3_2JvvHrTeYKjeaGRx8iiq5")
-
-port = 8501
-# Ensure the port is free
-!fuser -k 8501/tcp || true
-
-# Launch Streamlit in background
-get_ipython().system_raw(f"streamlit run app.py --server.port {port} --server.headless true &")
-
-# Reuse an existing tunnel if any; otherwise create one
-tunnels = ngrok.get_tunnels()
-if tunnels:
-    public_url = tunnels[0].public_url
-else:
-    public_url = ngrok.connect(addr=port, proto="http").public_url
-
-print("🔗 App URL:", public_url)
-
-from google.colab import auth
-auth.authenticate_user()
-
-!git config --global user.email "alok58484@gmail.com"
-!git config --global user.name "CODEBRAKERBOYY"
\ No newline at end of file
+# -------------------------------
+# DISPATCH + TIMING REPORT
+# -------------------------------
+RENDERERS = dict(zip(VIEWS, [render_welcome, render_auth, render_dataset, render_nlp,
+                             render_search, render_admin, render_feedback]))
+RENDERERS[view]()
+timer.mark("view")
+
+@st.cache_resource
+def get_timing_log():
+    from knowmap.logs import SegmentLog
+    return SegmentLog("logs", "timings", max_segments=50)
+
+report = timer.report(view)
+if timing.is_enabled():
+    timing.REGISTRY.observe(f"rerun.{view}", report["total_ms"])
+    st.session_state["perf_registry"].observe(f"rerun.{view}", report["total_ms"])
+if report["cold"] or timing.is_enabled():  # per-rerun lines only while instrumentation is on
+    get_timing_log().append(report)
+history = st.session_state.setdefault("rerun_timings", [])
+history.append(report)
+del history[:-50]
+with st.sidebar:
+    st.caption(f"⏱ {'cold start' if report['cold'] else 'rerun'}: {report['total_ms']:.0f} ms "
+               f"({report['new_modules']} modules imported)")
+    with st.expander("Timing report"):
+        import pandas as pd
+        st.dataframe(pd.DataFrame(history[::-1]))
+        if timer.cold_start_ms() is not None:
+            st.caption(f"Cold start: {timer.cold_start_ms():.0f} ms")
+    running = get_jobs().jobs(active_only=True)
+    if running:
+        st.caption(f"⚙️ {len(running)} background job(s): " + ", ".join(f"{j.name} {j.progress:.0%}" for j in running))
+
+# a view showing a running job polls it by re-running once the page is rendered
+if st.session_state.pop("poll_jobs", False):
+    import time
+    from knowmap.jobs import POLL_S
+    time.sleep(POLL_S)
+    st.experimental_rerun()
@@ -0,0 +1 @@
+"""KnowMap helpers shared by the Streamlit app (app.py)."""
@@ -0,0 +1,236 @@
+"""Graph analytics that stay cheap on large graphs.
+
+``KnowledgeGraph`` already keeps node/edge counts and the degree and
+relation histograms up to date on every edit; this module adds the rest of
+the dashboard and level-of-detail inputs:
+
+* ``ComponentTracker`` -- connected components maintained under edits. Edge
+  additions merge the two label sets (smaller into larger); a removed node
+  only marks its component dirty, and dirty components are re-split by a
+  BFS over their own members the next time they are read.
+* ``pagerank`` -- power iteration over the triple store's code arrays
+  (``np.bincount`` scatter per step, no networkx), warm-started from the
+  previous version's ranks so a small edit converges in a few steps.
+* ``approx_betweenness`` -- Brandes betweenness from a sample of pivots.
+* ``GraphAnalytics`` -- PageRank, betweenness and communities of a graph,
+  cached per graph version.
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+from knowmap.timing import timed
+
+
+def degree_histogram(degree_counts):
+    """``{"a-b": nodes}`` over power-of-two degree buckets from a ``degree -> nodes`` Counter."""
+    buckets = {}
+    for degree, count in degree_counts.items():
+        if count <= 0:
+            continue
+        lo = 0 if degree == 0 else 1 << int(math.log2(degree))
+        buckets[lo] = buckets.get(lo, 0) + count
+    return {("0" if lo == 0 else f"{lo}-{2 * lo - 1}"): buckets[lo] for lo in sorted(buckets)}
+
+
+class ComponentTracker:
+    """Connected components of an undirected graph, updated as edges and nodes change."""
+
+    def __init__(self, G):
+        self.G = G
+        self.label = {}
+        self.members = {}
+        self.dirty = set()
+        self._next = 0
+        import networkx as nx
+
+        for comp in nx.connected_components(G):
+            cid = self._new_label()
+            self.members[cid] = set(comp)
+            for n in comp:
+                self.label[n] = cid
+
+    def _new_label(self):
+        self._next += 1
+        return self._next
+
+    def add_node(self, n):
+        if n not in self.label:
+            cid = self._new_label()
+            self.label[n] = cid
+            self.members[cid] = {n}
+
+    def add_edge(self, u, v):
+        self.add_node(u)
+        self.add_node(v)
+        a, b = self.label[u], self.label[v]
+        if a == b:
+            return
+        if len(self.members[a]) < len(self.members[b]):
+            a, b = b, a
+        moved = self.members.pop(b)
+        for n in moved:
+            self.label[n] = a
+        self.members[a] |= moved
+        if b in self.dirty:
+            self.dirty.discard(b)
+            self.dirty.add(a)
+
+    def remove_node(self, n):
+        """Forget ``n``; its component may have split and is re-checked lazily."""
+        cid = self.label.pop(n, None)
+        if cid is None:
+            return
+        self.members[cid].discard(n)
+        if self.members[cid]:
+            self.dirty.add(cid)
+        else:
+            del self.members[cid]
+            self.dirty.discard(cid)
+
+    def _resolve(self):
+        G = self.G
+        for cid in list(self.dirty):
+            remaining = self.members.pop(cid)
+            while remaining:
+                start = remaining.pop()
+                piece, queue = {start}, deque([start])
+                while queue:
+                    for nbr in G.adj[queue.popleft()]:
+                        if nbr in remaining:
+                            remaining.discard(nbr)
+                            piece.add(nbr)
+                            queue.append(nbr)
+                new = self._new_label()
+                self.members[new] = piece
+                for n in piece:
+                    self.label[n] = new
+        self.dirty.clear()
+
+    def __len__(self):
+        self._resolve()
+        return len(self.members)
+
+    def component_of(self, n):
+        self._resolve()
+        cid = self.label.get(n)
+        return self.members[cid] if cid is not None else set()
+
+    def sizes(self):
+        """Component sizes, largest first."""
+        self._resolve()
+        return sorted((len(m) for m in self.members.values()), reverse=True)
+
+
+@timed("analytics.pagerank")
+def pagerank(store, damping=0.85, tol=1e-6, max_iter=100, start=None):
+    """PageRank of every entity code (undirected, one edge per entity pair) as a float64 array.
+
+    ``start`` is an initial rank vector (e.g. the previous version's result);
+    entities added since are padded with the uniform rank. Returns
+    ``(ranks, iterations)``; entities without live triples (including
+    nodes left isolated by edits) rank 0 and take no teleport share.
+    """
+    s, _, o = store.codes()
+    n = len(store.entities)
+    if not n or not len(s):
+        return np.zeros(n), 0
+    s, o = s.astype(np.int64), o.astype(np.int64)
+    lo, hi = np.minimum(s, o), np.maximum(s, o)
+    pairs = np.unique(lo * n + hi)
+    lo, hi = pairs // n, pairs % n
+    loops = lo == hi
+    src = np.concatenate([lo, hi[~loops]])
+    dst = np.concatenate([hi, lo[~loops]])
+    deg = np.bincount(src, minlength=n).astype(np.float64)
+    present = deg > 0  # edges are symmetric, so no graph node is dangling
+    m = int(present.sum())
+    inv_deg = np.divide(1.0, deg, out=np.zeros(n), where=present)
+
+    x = np.where(present, 1.0 / m, 0.0)
+    if start is not None and len(start):
+        prev = np.zeros(n)
+        k = min(n, len(start))
+        prev[:k] = start[:k]
+        prev[k:] = 1.0 / m
+        prev[~present] = 0.0
+        if prev.sum() > 0:
+            x = prev / prev.sum()
+    teleport = np.where(present, (1.0 - damping) / m, 0.0)
+    for it in range(1, max_iter + 1):
+        new = teleport + damping * np.bincount(dst, weights=(x * inv_deg)[src], minlength=n)
+        err = np.abs(new - x).sum()
+        x = new
+        if err < tol:
+            break
+    return x, it
+
+
+@timed("analytics.betweenness")
+def approx_betweenness(G, samples=64, seed=0):
+    """Betweenness centrality estimated from ``samples`` pivot sources (Brandes sampling)."""
+    import networkx as nx
+
+    k = min(samples, G.number_of_nodes())
+    if k == 0:
+        return {}
+    return nx.betweenness_centrality(G, k=k, seed=seed, normalized=True)
+
+
+class GraphAnalytics:
+    """Importance scores and communities of a ``KnowledgeGraph``, cached per version."""
+
+    def __init__(self, kg):
+        self.kg = kg
+        self._cache = {}
+        self._ranks = None  # last PageRank vector, the warm start for the next version
+        self.pagerank_iterations = None
+
+    def _cached(self, name, build):
+        hit = self._cache.get(name)
+        if hit is not None and hit[0] == self.kg.version:
+            return hit[1]
+        value = build()
+        self._cache[name] = (self.kg.version, value)
+        return value
+
+    def pagerank(self):
+        """``{node: rank}`` for every node of the graph."""
+        def build():
+            store = self.kg.store
+            ranks, iterations = pagerank(store, start=self._ranks)
+            self._ranks = ranks
+            self.pagerank_iterations = iterations
+            names = store.entities.values
+            return {names[i]: float(ranks[i]) for i in np.flatnonzero(ranks).tolist()}
+        return self._cached("pagerank", build)
+
+    def betweenness(self, samples=64):
+        return self._cached(("betweenness", samples), lambda: approx_betweenness(self.kg.G, samples))
+
+    def communities(self, method="label_propagation", seed=0):
+        """Communities as lists of nodes, largest first ("label_propagation" or "louvain")."""
+        def build():
+            import networkx as nx
+
+            if method == "louvain":
+                found = nx.community.louvain_communities(self.kg.G, seed=seed)
+            else:
+                found = nx.community.label_propagation_communities(self.kg.G)
+            return sorted((list(c) for c in found), key=len, reverse=True)
+        return self._cached(("communities", method), build)
+
+    def importance(self, method="pagerank"):
+        """Node scores for sizing and level of detail: "pagerank", "betweenness" or "degree"."""
+        if method == "pagerank":
+            return self.pagerank()
+        if method == "betweenness":
+            return self.betweenness()
+        return dict(self.kg.G.degree())
+
+    def top(self, k=10, method="pagerank"):
+        import heapq
+
+        scores = self.importance(method)
+        return heapq.nlargest(k, scores.items(), key=lambda x: x[1])
@@ -0,0 +1,396 @@
+"""Synthetic-scale benchmarks for every KnowMap stage.
+
+    python -m knowmap.bench --scales 1000 10000 100000 --out bench.json
+    python -m knowmap.bench --compare old.json new.json
+
+For each scale a synthetic 9-column CSV is generated (``knowmap.synthetic``)
+and the stages below run in order, each timed on its own; with memory
+profiling on, each stage is then repeated under ``tracemalloc`` to record its
+peak allocation (tracing is kept out of the timed run). Stages whose
+optional dependency is missing (spaCy model, pyvis) are reported as skipped
+instead of failing the run. Embeddings use a deterministic stub encoder so
+results do not depend on model downloads or hardware.
+"""
+import argparse
+import datetime
+import gc
+import hashlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+DEFAULT_SCALES = (1_000, 10_000, 100_000, 1_000_000)
+STAGES = ("csv_load", "triple_extraction", "spacy_extraction", "graph_build", "graph_analytics", "embedding",
+          "search", "quantized_search", "sharded_search", "admin_edits", "export_import", "pyvis_html")
+
+
+class Skip(Exception):
+    """Raised by a stage that cannot run in this environment."""
+
+
+def stub_encoder(dim=384):
+    """Deterministic ``list[str] -> (n, dim)`` encoder seeded by each sentence's hash."""
+    def encode(sentences):
+        out = np.empty((len(sentences), dim), dtype=np.float32)
+        for i, text in enumerate(sentences):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            out[i] = np.random.default_rng(seed).standard_normal(dim, dtype=np.float32)
+        return out
+    return encode
+
+
+# -------------------------------
+# stages: each takes the shared context dict and returns extra metrics
+# -------------------------------
+def stage_csv_load(ctx):
+    from knowmap.ingest import load_dataframe
+
+    with open(ctx["csv"], "rb") as f:
+        df = load_dataframe(f)
+    return {"rows": len(df), "items": len(df)}
+
+
+def stage_triple_extraction(ctx):
+    from knowmap.ingest import iter_triple_chunks
+    from knowmap.triple_store import TripleStore
+
+    store = TripleStore()
+    with open(ctx["csv"], "rb") as f:
+        for chunk in iter_triple_chunks(f):
+            store.extend(chunk)
+    ctx["store"] = store
+    return {"triples": len(store), "entities": len(store.entities), "store_mb": round(store.nbytes() / 2**20, 2),
+            "items": len(store)}
+
+
+def stage_spacy_extraction(ctx):
+    from knowmap.synthetic import generate_corpus
+
+    try:
+        from knowmap.extraction import ExtractionStats, iter_extract, load_nlp
+        nlp = load_nlp()
+    except Exception as exc:  # spaCy or the model not installed
+        raise Skip(f"spaCy unavailable: {exc}")
+    n_docs = min(ctx["spacy_docs"], max(1, ctx["scale"] // 5))
+    stats = ExtractionStats()
+    for _ in iter_extract(generate_corpus(n_docs, seed=ctx["seed"]), batch_size=64, nlp=nlp, stats=stats):
+        pass
+    return {**stats.as_dict(), "items": stats.docs}
+
+
+def stage_graph_build(ctx):
+    from knowmap.graph import KnowledgeGraph
+    from knowmap.graph_engine import CSRGraph
+
+    t0 = time.perf_counter()
+    ctx["kg"] = KnowledgeGraph(ctx["store"])
+    nx_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ctx["engine"] = CSRGraph(ctx["store"])
+    return {"nodes": ctx["kg"].n_nodes, "edges": ctx["kg"].n_edges, "networkx_s": round(nx_s, 4),
+            "csr_s": round(time.perf_counter() - t0, 4), "items": len(ctx["store"])}
+
+
+def stage_graph_analytics(ctx):
+    """PageRank (cold, and warm after an edit), component tracking under edits and communities."""
+    from knowmap.graph import KnowledgeGraph
+
+    kg = KnowledgeGraph(ctx["store"].thaw())  # edited below; leave the shared graph untouched
+    times = {}
+    t0 = time.perf_counter()
+    kg.analytics.pagerank()
+    times["pagerank_cold_s"] = time.perf_counter() - t0
+    cold_iters = kg.analytics.pagerank_iterations
+    t0 = time.perf_counter()
+    n_components = len(kg.components)
+    times["components_build_s"] = time.perf_counter() - t0
+    top = [n for n, _ in kg.top_nodes(2 * ctx["edits"])]
+    t0 = time.perf_counter()
+    for i in range(ctx["edits"]):
+        kg.merge_nodes(top[2 * i], top[2 * i + 1])
+    len(kg.components)
+    times["edits_with_components_s"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    kg.analytics.pagerank()
+    times["pagerank_warm_s"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    n_communities = len(kg.analytics.communities())
+    times["communities_s"] = time.perf_counter() - t0
+    out = {k: round(v, 4) for k, v in times.items()}
+    out.update({"pagerank_cold_iters": cold_iters, "pagerank_warm_iters": kg.analytics.pagerank_iterations,
+                "components": n_components, "communities": n_communities, "items": kg.n_edges})
+    return out
+
+
+def stage_embedding(ctx):
+    from knowmap.embedding_store import EmbeddingStore
+
+    with tempfile.TemporaryDirectory() as root:
+        store = EmbeddingStore(root, dim=ctx["dim"])
+        ctx["vectors"] = np.array(store.sync(ctx["store"], stub_encoder(ctx["dim"])))
+        t0 = time.perf_counter()
+        store.sync(ctx["store"], stub_encoder(ctx["dim"]))  # everything cached
+        warm = time.perf_counter() - t0
+    return {"dim": ctx["dim"], "warm_sync_s": round(warm, 4), "items": len(ctx["vectors"])}
+
+
+def stage_search(ctx):
+    from knowmap.vector_index import build_index
+
+    vectors = ctx["vectors"]
+    kind = "ivf" if len(vectors) >= 50_000 else "exact"
+    t0 = time.perf_counter()
+    index = build_index(vectors, kind, **({"n_probe": 16} if kind == "ivf" else {}))
+    build_s = time.perf_counter() - t0
+    queries = stub_encoder(ctx["dim"])([f"query {i}" for i in range(ctx["queries"])])
+    t0 = time.perf_counter()
+    for q in queries:
+        index.search(q, 10)
+    query_ms = 1000 * (time.perf_counter() - t0) / len(queries)
+    return {"index": kind, "build_s": round(build_s, 4), "query_ms": round(query_ms, 4), "items": len(queries)}
+
+
+def stage_quantized_search(ctx):
+    """Exact search in float16 / int8 (+ float32 re-rank): recall@10 and memory vs float32."""
+    from knowmap.vector_index import quantization_report
+
+    queries = stub_encoder(ctx["dim"])([f"query {i}" for i in range(ctx["queries"])])
+    rows = quantization_report(ctx["vectors"], queries, k=10)
+    extra = {}
+    for row in rows:
+        name = row["precision"] + (f"_rerank{row['rerank']}" if row["rerank"] else "")
+        extra[f"{name}_recall"] = round(row["recall_at_k"], 4)
+        extra[f"{name}_query_ms"] = row["query_ms"]
+        extra[f"{name}_memory_mb"] = row["memory_mb"]
+    extra["items"] = len(queries)
+    return extra
+
+
+def stage_sharded_search(ctx, shards=4):
+    """Exact top-10 over ``shards`` dataset shards fanned out in parallel vs one monolithic index."""
+    from knowmap.datasets import fan_out
+    from knowmap.vector_index import build_index
+
+    vectors = ctx["vectors"]
+    bounds = np.linspace(0, len(vectors), shards + 1).astype(int)
+    indexes = {f"shard{i}": build_index(vectors[a:b], "exact") for i, (a, b) in enumerate(zip(bounds, bounds[1:]))}
+    offsets = dict(zip(indexes, bounds.tolist()))
+    mono = build_index(vectors, "exact")
+    queries = stub_encoder(ctx["dim"])([f"query {i}" for i in range(ctx["queries"])])
+
+    def shard_search(index, q):
+        return lambda: tuple(x[0] for x in index.search(q, 10))
+
+    t0 = time.perf_counter()
+    # every shard is an exact cosine index, so raw scores are comparable
+    merged = [fan_out({n: shard_search(ix, q) for n, ix in indexes.items()}, 10, merge="score") for q in queries]
+    sharded_ms = 1000 * (time.perf_counter() - t0) / len(queries)
+    t0 = time.perf_counter()
+    expected = [mono.search(q, 10)[0][0] for q in queries]
+    mono_ms = 1000 * (time.perf_counter() - t0) / len(queries)
+    agree = np.mean([len({offsets[n] + i for n, i, _ in hits} & set(ids.tolist())) / 10
+                     for hits, ids in zip(merged, expected)])
+    return {"shards": shards, "sharded_query_ms": round(sharded_ms, 4), "monolithic_query_ms": round(mono_ms, 4),
+            "agreement": round(float(agree), 4), "items": len(queries)}
+
+
+def stage_admin_edits(ctx):
+    from knowmap.graph import KnowledgeGraph
+
+    kg = KnowledgeGraph(ctx["store"].thaw())  # leave the shared store untouched
+    top = [n for n, _ in kg.top_nodes(2 * ctx["edits"] + 2)]
+    rename_ms, merge_ms = [], []
+    for i in range(ctx["edits"]):
+        t0 = time.perf_counter()
+        kg.rename_node(top[2 * i], f"renamed {i}")
+        rename_ms.append(1000 * (time.perf_counter() - t0))
+        t0 = time.perf_counter()
+        kg.merge_nodes(f"renamed {i}", top[2 * i + 1])
+        merge_ms.append(1000 * (time.perf_counter() - t0))
+    return {"rename_ms": round(float(np.mean(rename_ms)), 3), "merge_ms": round(float(np.mean(merge_ms)), 3),
+            "items": 2 * ctx["edits"]}
+
+
+def stage_export_import(ctx):
+    """The Admin export/import paths: streamed GraphML, compact JSON and binary snapshots."""
+    from knowmap.snapshot import iter_graphml_triples, read_snapshot, write_graphml, write_snapshot
+    from knowmap.triple_store import TripleStore
+
+    store = ctx["kg"].store
+    times = {}
+    t0 = time.perf_counter()
+    buf = io.BytesIO()
+    write_graphml(store, buf)
+    times["graphml_export_s"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    buf.seek(0)
+    imported = TripleStore()
+    for batch in iter_graphml_triples(buf):
+        imported.extend(batch)
+    times["graphml_import_s"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    data = json.dumps(list(store), separators=(",", ":")).encode("utf-8")
+    times["json_export_s"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    TripleStore.from_triples([tuple(x[:3]) for x in json.loads(data)])
+    times["json_import_s"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    snap = io.BytesIO()
+    write_snapshot(store, snap)
+    times["snapshot_export_s"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    read_snapshot(snap.getvalue())
+    times["snapshot_import_s"] = time.perf_counter() - t0
+    return {**{k: round(v, 4) for k, v in times.items()}, "graphml_mb": round(buf.getbuffer().nbytes / 2**20, 2),
+            "json_mb": round(len(data) / 2**20, 2), "snapshot_mb": round(snap.getbuffer().nbytes / 2**20, 2),
+            "items": len(store)}
+
+
+def stage_pyvis_html(ctx):
+    try:
+        import pyvis  # noqa: F401
+    except ImportError:
+        raise Skip("pyvis not installed")
+    from knowmap.render import build_view, layout_for, render_html
+
+    G = ctx["kg"].G
+    view = build_view(G, "top", ctx["view_nodes"])
+    t0 = time.perf_counter()
+    positions = layout_for(view)
+    layout_s = time.perf_counter() - t0
+    html = render_html(view, positions, {n: 16 for n in view.nodes()})
+    return {"view_nodes": view.number_of_nodes(), "layout_s": round(layout_s, 4),
+            "html_kb": round(len(html) / 1024, 1), "items": view.number_of_nodes()}
+
+
+STAGE_FUNCS = {name: globals()[f"stage_{name}"] for name in STAGES}
+
+
+# -------------------------------
+# runner
+# -------------------------------
+def _run_stage(func, ctx, memory):
+    gc.collect()
+    t0 = time.perf_counter()
+    extra = func(ctx)
+    seconds = time.perf_counter() - t0
+    peak_mb = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func(ctx)
+            peak_mb = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return seconds, peak_mb, extra
+
+
+def run_scale(scale, stages=STAGES, memory=True, seed=0, skew=1.0, n_relations=20, n_entities=None,
+              workdir=None, log=print, **params):
+    """Run ``stages`` at one scale; returns a list of result rows."""
+    from knowmap.synthetic import write_csv
+
+    ctx = {"scale": scale, "seed": seed, "dim": params.get("dim", 384), "queries": params.get("queries", 100),
+           "edits": params.get("edits", 10), "spacy_docs": params.get("spacy_docs", 2000),
+           "view_nodes": params.get("view_nodes", 500)}
+    rows = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        ctx["csv"] = os.path.join(tmp, f"synthetic_{scale}.csv")
+        t0 = time.perf_counter()
+        write_csv(ctx["csv"], scale, n_entities or max(2, scale // 2), n_relations, skew, seed)
+        log(f"[{scale:,}] generated {os.path.getsize(ctx['csv']) / 2**20:.1f} MB in {time.perf_counter() - t0:.1f}s")
+        for name in STAGES:
+            if name not in stages:
+                continue
+            row = {"stage": name, "scale": scale}
+            try:
+                seconds, peak_mb, extra = _run_stage(STAGE_FUNCS[name], ctx, memory)
+            except Skip as exc:
+                row["skipped"] = str(exc)
+                log(f"[{scale:,}] {name:18s} skipped ({exc})")
+            except KeyError as exc:  # an earlier stage it depends on was not selected/skipped
+                row["skipped"] = f"needs output of an earlier stage ({exc})"
+                log(f"[{scale:,}] {name:18s} skipped ({row['skipped']})")
+            else:
+                items = extra.pop("items", None)
+                row.update(seconds=round(seconds, 4), peak_mb=peak_mb,
+                           items_per_s=round(items / seconds, 1) if items and seconds > 0 else None, **extra)
+                log(f"[{scale:,}] {name:18s} {seconds:9.3f}s" + (f"  peak {peak_mb} MB" if peak_mb is not None else ""))
+            rows.append(row)
+    return rows
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "created": datetime.datetime.utcnow().isoformat() + "Z"}
+
+
+def run(scales=DEFAULT_SCALES, stages=STAGES, memory=True, out=None, log=print, **params):
+    """Benchmark every scale; returns (and optionally writes) the JSON report."""
+    report = {"meta": {**environment(), "scales": list(scales), "memory": memory, **params}, "results": []}
+    for scale in scales:
+        report["results"].extend(run_scale(scale, stages, memory, log=log, **params))
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+def compare(old, new, threshold=1.2):
+    """Rows ``(stage, scale, old_s, new_s, ratio)``; ratios above ``threshold`` are regressions."""
+    before = {(r["stage"], r["scale"]): r for r in old["results"] if "seconds" in r}
+    rows = []
+    for r in new["results"]:
+        base = before.get((r["stage"], r["scale"]))
+        if base and "seconds" in r and base["seconds"] > 0:
+            ratio = r["seconds"] / base["seconds"]
+            rows.append({"stage": r["stage"], "scale": r["scale"], "old_s": base["seconds"],
+                         "new_s": r["seconds"], "ratio": round(ratio, 3), "regression": ratio > threshold})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m knowmap.bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES))
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--out", default="bench.json")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of entity degrees")
+    parser.add_argument("--relations", type=int, default=20)
+    parser.add_argument("--entities", type=int, default=None, help="distinct entities (default: triples / 2)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two reports and exit")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            rows = compare(json.load(f_old), json.load(f_new), args.threshold)
+        for r in rows:
+            flag = "REGRESSION" if r["regression"] else ""
+            print(f"{r['stage']:18s} {r['scale']:>9,} {r['old_s']:9.3f}s -> {r['new_s']:9.3f}s  x{r['ratio']:.2f} {flag}")
+        return 1 if any(r["regression"] for r in rows) else 0
+
+    run(args.scales, args.stages, not args.no_memory, args.out, seed=args.seed, skew=args.skew,
+        n_relations=args.relations, n_entities=args.entities)
+    print(f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
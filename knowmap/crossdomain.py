@@ -0,0 +1,250 @@
+"""Cross-domain similarity links between entities.
+
+Datasets with a ``domain`` column (see ``knowmap.ingest.NINE_COLUMNS``) say
+which domain each triple -- and so each of its entities -- belongs to.
+``EntityDomains`` collects that while ingesting. ``link_domains`` then
+embeds the distinct entities once and, for every domain, finds each
+entity's nearest neighbours among entities of *other* domains. These become
+typed ``similar_to`` triples (e.g. a physics concept <-> a finance concept).
+
+All-pairs similarity is computed tile by tile (``blocked_topk``): a
+``block_rows x block_cols`` score tile is merged into a running top-k buffer
+per row, so memory is bounded by the tile size whatever the number of
+entities. Row blocks run on a thread pool (NumPy releases the GIL inside
+matrix products).
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from knowmap.timing import span, timed
+from knowmap.vector_index import normalize
+
+SIMILAR_TO = "similar_to"
+
+
+class EntityDomains:
+    """Domain membership of entities; bit ``d`` of ``masks[name]`` is ``domains[d]``."""
+
+    def __init__(self):
+        self.domains = []
+        self.masks = {}
+        self._bits = {}
+
+    def __len__(self):
+        return len(self.masks)
+
+    def __bool__(self):
+        return len(self.domains) > 1  # linking needs at least two domains
+
+    def to_dict(self):
+        return {"domains": list(self.domains), "masks": self.masks}
+
+    @classmethod
+    def from_dict(cls, data):
+        out = cls()
+        for domain in data["domains"]:
+            out._bit(domain)
+        out.masks = dict(data["masks"])
+        return out
+
+    def _bit(self, domain):
+        bit = self._bits.get(domain)
+        if bit is None:
+            bit = self._bits[domain] = 1 << len(self.domains)
+            self.domains.append(domain)
+        return bit
+
+    def add(self, subjects, objects, domains):
+        """Record the domain of each row for both of its entities (blank domains are ignored)."""
+        masks = self.masks
+        for s, o, d in zip(subjects, objects, domains):
+            d = str(d).strip()
+            if not d:
+                continue
+            bit = self._bit(d)
+            masks[s] = masks.get(s, 0) | bit
+            masks[o] = masks.get(o, 0) | bit
+
+    def update(self, other):
+        """Merge another ``EntityDomains`` (e.g. from a worker process) into this one."""
+        remap = {1 << i: self._bit(d) for i, d in enumerate(other.domains)}
+        for name, mask in other.masks.items():
+            bits = 0
+            for old, new in remap.items():
+                if mask & old:
+                    bits |= new
+            self.masks[name] = self.masks.get(name, 0) | bits
+        return self
+
+    def domains_of(self, name):
+        mask = self.masks.get(name, 0)
+        return [d for i, d in enumerate(self.domains) if mask >> i & 1]
+
+    def counts(self):
+        """``{domain: number of entities}``."""
+        out = dict.fromkeys(self.domains, 0)
+        for mask in self.masks.values():
+            for i, d in enumerate(self.domains):
+                if mask >> i & 1:
+                    out[d] += 1
+        return out
+
+    def restrict(self, names):
+        """Only the entities still present in ``names`` (e.g. after edits)."""
+        names = set(names)
+        out = EntityDomains()
+        out.domains, out._bits = list(self.domains), dict(self._bits)
+        out.masks = {n: m for n, m in self.masks.items() if n in names}
+        return out
+
+
+# -------------------------------
+# blocked all-pairs top-k
+# -------------------------------
+def _merge_topk(best_ids, best_scores, ids, scores, k):
+    """Keep the ``k`` best of two candidate sets per row (running top-k buffer)."""
+    all_scores = np.concatenate([best_scores, scores], axis=1)
+    all_ids = np.concatenate([best_ids, ids], axis=1)
+    if all_scores.shape[1] > k:
+        keep = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+        all_scores = np.take_along_axis(all_scores, keep, axis=1)
+        all_ids = np.take_along_axis(all_ids, keep, axis=1)
+    return all_ids, all_scores
+
+
+def _row_block(q, corpus, k, threshold, block_cols, allowed):
+    n = len(q)
+    best_ids = np.full((n, k), -1, dtype=np.int64)
+    best_scores = np.full((n, k), -np.inf, dtype=np.float32)
+    for start in range(0, len(allowed), block_cols):
+        cols = allowed[start:start + block_cols]
+        tile = q @ np.asarray(corpus[cols], dtype=np.float32).T
+        # only rows whose best score in this tile can enter their top-k need a partition
+        cutoff = np.maximum(best_scores.min(axis=1), threshold)
+        active = np.flatnonzero(tile.max(axis=1) >= cutoff)
+        if not len(active):
+            continue
+        sub = tile[active]
+        kk = min(k, len(cols))
+        cand = np.argpartition(-sub, kk - 1, axis=1)[:, :kk]
+        cand_scores = np.take_along_axis(sub, cand, axis=1)
+        cand_scores[cand_scores < threshold] = -np.inf
+        best_ids[active], best_scores[active] = _merge_topk(best_ids[active], best_scores[active],
+                                                            cols[cand], cand_scores, k)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    best_ids = np.take_along_axis(best_ids, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    best_ids[~np.isfinite(best_scores)] = -1
+    return best_ids, best_scores
+
+
+@timed("crossdomain.blocked_topk")
+def blocked_topk(queries, corpus, k=5, threshold=-1.0, block_rows=1024, block_cols=16384,
+                 exclude=None, workers=None):
+    """Top-``k`` ``(ids, scores)`` of ``queries @ corpus.T`` without materialising it.
+
+    Both inputs must be unit vectors (``corpus`` may be a memmap); ``exclude``
+    is a boolean mask over corpus rows that are never returned. Rows with
+    fewer than ``k`` neighbours at or above ``threshold`` are padded with
+    ``-1`` / ``-inf``. Peak extra memory is about ``workers x block_rows x
+    block_cols`` floats. Rows whose best score in a tile cannot beat their
+    current k-th best (or ``threshold``) skip the top-k selection for it.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    n = len(queries)
+    # excluded rows are dropped from the tiles instead of masked, which also skips their products
+    allowed = np.flatnonzero(~exclude) if exclude is not None else np.arange(len(corpus))
+    ids = np.full((n, k), -1, dtype=np.int64)
+    scores = np.full((n, k), -np.inf, dtype=np.float32)
+    if not n or not len(corpus) or k <= 0:
+        return ids, scores
+
+    def work(start):
+        stop = min(n, start + block_rows)
+        ids[start:stop], scores[start:stop] = _row_block(queries[start:stop], corpus, k, threshold,
+                                                         block_cols, allowed)
+
+    starts = range(0, n, block_rows)
+    workers = workers or min(len(starts), os.cpu_count() or 1)
+    if workers <= 1:
+        for start in starts:
+            work(start)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(work, starts))
+    return ids, scores
+
+
+def encode_entities(names, encode, batch_size=1024):
+    """Unit float32 embeddings of entity names, encoded in batches."""
+    out = None
+    for start in range(0, len(names), batch_size):
+        with span("crossdomain.encode_batch"):
+            vecs = normalize(encode(names[start:start + batch_size]))
+        if out is None:
+            out = np.empty((len(names), vecs.shape[1]), dtype=np.float32)
+        out[start:start + len(vecs)] = vecs
+    return out if out is not None else np.empty((0, 0), dtype=np.float32)
+
+
+def link_domains(entity_domains, encode=None, vectors=None, k=3, threshold=0.75, max_links=None,
+                 workers=None, block_rows=1024, block_cols=16384, stats=None):
+    """Cross-domain nearest-neighbour links as a list of dicts, best first.
+
+    Give either ``encode`` (list of names -> vectors) or precomputed
+    ``vectors`` aligned with ``list(entity_domains.masks)``. For every
+    domain, each of its entities is matched against all entities outside
+    that domain; pairs found from both sides are reported once.
+    """
+    t_start = time.perf_counter()
+    names = list(entity_domains.masks)
+    # member rows per domain bit; masks are Python ints, so any number of domains fits
+    members = [[] for _ in entity_domains.domains]
+    for row, mask in enumerate(entity_domains.masks.values()):
+        while mask:
+            low = mask & -mask
+            members[low.bit_length() - 1].append(row)
+            mask ^= low
+    if vectors is None:
+        vectors = encode_entities(names, encode)
+    t_encoded = time.perf_counter()
+
+    found = {}
+    for domain, rows in zip(entity_domains.domains, members):
+        if not rows or len(rows) == len(names):
+            continue
+        rows = np.asarray(rows, dtype=np.int64)
+        inside = np.zeros(len(names), dtype=bool)
+        inside[rows] = True
+        ids, scores = blocked_topk(np.asarray(vectors[rows]), vectors, k, threshold, block_rows,
+                                   block_cols, exclude=inside, workers=workers)
+        for row, nbrs, sims in zip(rows.tolist(), ids.tolist(), scores.tolist()):
+            for col, sim in zip(nbrs, sims):
+                if col < 0:
+                    break
+                key = (row, col) if row < col else (col, row)
+                if found.get(key, (-1.0,))[0] < sim:
+                    found[key] = (sim, domain, row)
+
+    links = []
+    for (a, b), (sim, domain, src) in found.items():
+        dst = b if src == a else a
+        other = [d for d in entity_domains.domains_of(names[dst]) if d != domain]
+        links.append({"source": names[src], "target": names[dst], "score": round(float(sim), 4),
+                      "source_domain": domain, "target_domain": other[0] if other else ""})
+    links.sort(key=lambda l: -l["score"])
+    if max_links:
+        links = links[:max_links]
+    if stats is not None:
+        stats.update({"entities": len(names), "domains": len(entity_domains.domains), "links": len(links),
+                      "encode_s": round(t_encoded - t_start, 3),
+                      "search_s": round(time.perf_counter() - t_encoded, 3)})
+    return links
+
+
+def link_triples(links):
+    """``similar_to`` triples for ``link_domains`` output."""
+    return [(l["source"], SIMILAR_TO, l["target"]) for l in links]
@@ -0,0 +1,130 @@
+"""Named datasets (namespaces) and fan-out search across their shards.
+
+A session can hold several datasets -- one per domain or team corpus --
+each with its own TripleStore, entity domains, search indexes, and an
+embedding shard and edit journal under ``dataset_dir``. Indexes are keyed
+by the dataset's store version, so adding, refreshing or dropping one
+dataset never re-indexes the others, and the corpus is spread over one
+matrix per shard instead of a single monolithic one.
+
+``fan_out`` runs one search per selected shard on a thread pool (the
+vector and BM25 scoring release the GIL in NumPy) and merges the per-shard
+top-k lists into a global top-k. Shards may score on different scales
+(cosine, min-max fused hybrid, RRF, or raw BM25 with per-shard IDF while a
+shard's vector index is still building), so by default the lists are merged
+by rank with reciprocal rank fusion; ``merge="score"`` merges raw scores and
+is only meaningful when every shard uses the same scorer.
+"""
+import hashlib
+import heapq
+import os
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from knowmap.timing import timed
+
+DEFAULT_NAME = "default"
+MERGES = ("rrf", "score")
+
+
+class Dataset:
+    """One named triple set and its entity domains."""
+
+    def __init__(self, name, store, domains=None):
+        self.name = name
+        self.store = store
+        self.domains = domains
+        self.updated = time.time()
+
+    def as_dict(self):
+        n_domains = len(self.domains.domains) if self.domains is not None else 0
+        return {"name": self.name, "triples": len(self.store), "entities": len(self.store.entities),
+                "domains": n_domains, "version": self.store.version,
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.updated))}
+
+
+class DatasetCatalog:
+    """Ordered ``name -> Dataset`` mapping kept in a session."""
+
+    def __init__(self):
+        self._datasets = OrderedDict()
+
+    def __len__(self):
+        return len(self._datasets)
+
+    def __contains__(self, name):
+        return name in self._datasets
+
+    def __getitem__(self, name):
+        return self._datasets[name]
+
+    def __iter__(self):
+        return iter(self._datasets.values())
+
+    def names(self):
+        return list(self._datasets)
+
+    def add(self, name, store, domains=None):
+        """Add ``name`` or replace its contents (a refresh); other datasets are untouched."""
+        name = name.strip()
+        if not name:
+            raise ValueError("dataset name must not be empty")
+        ds = self._datasets.get(name)
+        if ds is None:
+            ds = self._datasets[name] = Dataset(name, store, domains)
+        else:
+            ds.store, ds.domains, ds.updated = store, domains, time.time()
+        return ds
+
+    def drop(self, name):
+        return self._datasets.pop(name, None)
+
+    @property
+    def total_triples(self):
+        return sum(len(ds.store) for ds in self._datasets.values())
+
+
+def dataset_dir(root, name):
+    """Per-dataset directory under ``root`` (embedding shard, journal); filesystem-safe and collision-free."""
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", name).strip("_")[:40] or "dataset"
+    return os.path.join(root, "datasets", f"{slug}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}")
+
+
+@timed("datasets.fan_out")
+def fan_out(searches, k, workers=None, stats=None, merge="rrf", rrf_k=60):
+    """Run ``{shard: search()}`` in parallel and merge into the global top-``k``.
+
+    Each ``search`` returns ``(ids, scores)`` for its shard, best first (ids
+    < 0 are padding). Returns ``[(shard, id, score)]`` best first, where
+    ``score`` is ``1 / (rrf_k + rank)`` for ``merge="rrf"`` and the shard's
+    own score for ``merge="score"``; ``stats`` (a dict) receives each
+    shard's latency in ms.
+    """
+    if merge not in MERGES:
+        raise ValueError(f"merge must be one of {MERGES}")
+
+    def run(item):
+        name, search = item
+        t0 = time.perf_counter()
+        ids, scores = search()
+        return name, ids, scores, (time.perf_counter() - t0) * 1000
+
+    items = list(searches.items())
+    workers = workers or min(len(items), os.cpu_count() or 1)
+    if workers <= 1 or len(items) <= 1:
+        done = [run(item) for item in items]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            done = list(pool.map(run, items))
+    hits = []
+    for order, (name, ids, scores, ms) in enumerate(done):
+        ranked = [(int(i), float(s)) for i, s in zip(ids, scores) if i >= 0]
+        for rank, (i, s) in enumerate(ranked, 1):
+            # equal RRF scores keep shard order, so ties interleave the shards
+            key = (1.0 / (rrf_k + rank), -order) if merge == "rrf" else (s, -order)
+            hits.append((key, name, i))
+        if stats is not None:
+            stats[name] = round(ms, 3)
+    return [(name, i, key[0]) for key, name, i in heapq.nlargest(k, hits, key=lambda h: h[0])]
@@ -0,0 +1,270 @@
+"""Persistent, incremental embedding store for triple sentences.
+
+Vectors live in a memory-mapped float matrix on disk; a parallel array of
+content hashes (one per row) maps each triple to its row. Only triples whose
+hash is not already stored get encoded, rows of deleted triples are released
+by an explicit ``compact``, and everything survives app restarts. ``view``
+returns a lazy row view instead of a copy, so quantized indexes can be built
+and re-ranked without holding a float32 matrix in RAM.
+
+Several processes may share one root (e.g. the app and a pipeline run):
+writes take an exclusive lock on ``root/.lock`` and first re-read the
+on-disk state, so rows another process appended or a compaction it ran are
+picked up instead of overwritten. The lock uses ``fcntl`` and is a no-op
+where that is unavailable (Windows); there, use one process per root.
+"""
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from knowmap.timing import span, timed
+
+KEY_DTYPE = "V20"  # raw sha1 digest; "S20" would strip trailing NUL bytes
+EMPTY_KEY = bytes(20)  # marks a free row
+
+
+def triple_sentence(triple):
+    """Sentence fed to the encoder for one (s, p, o) triple."""
+    s, p, o = triple
+    return f"{s} {p} {o}"
+
+
+def triple_key(triple):
+    """Content hash of a triple (stable across sessions and restarts)."""
+    s, p, o = triple
+    return hashlib.sha1(f"{s}\x1f{p}\x1f{o}".encode("utf-8")).digest()
+
+
+class RowView:
+    """Rows ``rows`` of a (memory-mapped) matrix, read only when indexed."""
+
+    def __init__(self, matrix, rows):
+        self.matrix = matrix
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def shape(self):
+        return (len(self.rows), self.matrix.shape[1])
+
+    def __getitem__(self, idx):
+        return np.asarray(self.matrix[self.rows[idx]])
+
+    def __array__(self, dtype=None, copy=None):
+        x = np.asarray(self.matrix[self.rows])
+        return x if dtype is None else x.astype(dtype, copy=False)
+
+
+class EmbeddingStore:
+    """On-disk embedding matrix keyed by triple content hash.
+
+    Layout of ``root``:
+        meta.json         -- dim, capacity, dtype, current vectors file, write stamp
+        vectors.<gen>.f32 -- memmap of shape (capacity, dim)
+        keys.npy          -- row -> key (``EMPTY_KEY`` for free rows)
+        .lock             -- held while a process writes
+
+    Rows are only ever written while free, and ``view``/``sync`` never free
+    a row, so a ``RowView`` handed out earlier (possibly to another session
+    sharing this directory) keeps reading the vectors it was created for.
+    Rows of triples that are gone are released by ``compact``, which writes
+    a new generation file instead of rewriting the one existing views map.
+    """
+
+    def __init__(self, root, dim=384, dtype="float32", initial_capacity=1024):
+        self.root = root
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self.stamp = None
+        os.makedirs(root, exist_ok=True)
+
+        with self._file_lock():
+            if os.path.exists(os.path.join(root, "meta.json")):
+                self._refresh()
+            else:
+                self.dim = dim
+                self.capacity = initial_capacity
+                self.generation = 0
+                self.stamp = 0
+                self.keys = np.zeros(self.capacity, dtype=KEY_DTYPE)
+                self.vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="w+",
+                                         shape=(self.capacity, self.dim))
+                self._index_keys()
+                self._save_meta()
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.root, f"vectors.{self.generation}.f32")
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, triple):
+        return triple_key(triple) in self.index
+
+    # -------------------------------
+    # persistence
+    # -------------------------------
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on the root across processes (no-op without ``fcntl``)."""
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        with open(os.path.join(self.root, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _index_keys(self):
+        keys = self.keys.tolist()
+        self.index = {k: i for i, k in enumerate(keys) if k != EMPTY_KEY}
+        self.free = [i for i, k in enumerate(keys) if k == EMPTY_KEY]
+
+    def _refresh(self):
+        """Re-read the on-disk state if another process wrote since we last did (hold the file lock)."""
+        with open(os.path.join(self.root, "meta.json"), "r") as f:
+            meta = json.load(f)
+        stamp = meta.get("stamp", 0)  # stores written before the stamp existed
+        if stamp == self.stamp:
+            return
+        self.dim = meta["dim"]
+        self.capacity = meta["capacity"]
+        self.dtype = np.dtype(meta.get("dtype", self.dtype))
+        self.generation = meta["generation"]
+        self.stamp = stamp
+        self.keys = np.load(os.path.join(self.root, "keys.npy"))
+        self.vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+",
+                                 shape=(self.capacity, self.dim))
+        self._index_keys()
+
+    def _save_meta(self):
+        tmp = os.path.join(self.root, "keys.tmp.npy")
+        np.save(tmp, self.keys)
+        os.replace(tmp, os.path.join(self.root, "keys.npy"))
+        self.stamp += 1
+        meta = {"dim": self.dim, "capacity": self.capacity, "dtype": self.dtype.name,
+                "generation": self.generation, "stamp": self.stamp}
+        tmp = os.path.join(self.root, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.root, "meta.json"))
+
+    def _grow(self, needed):
+        new_cap = self.capacity
+        while new_cap - len(self.index) < needed:
+            new_cap *= 2
+        self.vectors.flush()
+        # growing only extends the file, so existing maps of it stay valid
+        with open(self._vectors_path, "r+b") as f:
+            f.truncate(new_cap * self.dim * self.dtype.itemsize)
+        self.vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+",
+                                 shape=(new_cap, self.dim))
+        self.keys = np.concatenate([self.keys, np.zeros(new_cap - self.capacity, dtype=KEY_DTYPE)])
+        self.free.extend(range(self.capacity, new_cap))
+        self.capacity = new_cap
+
+    # -------------------------------
+    # public API
+    # -------------------------------
+    def sync(self, triples, encode, batch_size=1024, progress=None):
+        """Return an array of embeddings aligned with ``triples``.
+
+        ``encode`` is any callable mapping a list of sentences to an
+        ``(n, dim)`` array (e.g. ``SentenceTransformer.encode``). Only
+        triples not seen before are encoded. ``progress(done, total)`` is
+        called after each encoded batch; if it raises (e.g. a cancelled
+        background job) the batches encoded so far are kept.
+        """
+        return np.asarray(self.view(triples, encode, batch_size, progress))
+
+    @timed("embed.sync")
+    def view(self, triples, encode, batch_size=1024, progress=None):
+        """Like ``sync`` but returns a ``RowView`` over the on-disk matrix (no copy).
+
+        The rows stay valid across later ``sync``/``view``/``compact`` calls.
+        """
+        keys = [triple_key(t) for t in triples]
+        with self._lock:
+            if any(k not in self.index for k in keys):
+                with self._file_lock():
+                    self._refresh()  # another process may have added some of them
+                    self._encode_missing(keys, triples, encode, batch_size, progress)
+            rows = np.fromiter((self.index[k] for k in keys), dtype=np.int64, count=len(keys))
+            return RowView(self.vectors, rows)
+
+    def _encode_missing(self, keys, triples, encode, batch_size, progress):
+        todo = {}
+        for k, t in zip(keys, triples):
+            if k not in self.index and k not in todo:
+                todo[k] = t
+        if todo:
+            if len(self.free) < len(todo):
+                self._grow(len(todo))
+            self.free.sort(reverse=True)  # pop() hands out the lowest rows first
+            items = list(todo.items())
+            changed = False
+            try:
+                for start in range(0, len(items), batch_size):
+                    chunk = items[start:start + batch_size]
+                    with span("embed.encode_batch"):
+                        vecs = np.asarray(encode([triple_sentence(t) for _, t in chunk]), dtype=self.dtype)
+                    if vecs.shape != (len(chunk), self.dim):
+                        raise ValueError(f"encoder returned shape {vecs.shape}, expected ({len(chunk)}, {self.dim})")
+                    rows = [self.free.pop() for _ in chunk]
+                    self.vectors[rows] = vecs
+                    for (k, _), row in zip(chunk, rows):
+                        self.index[k] = row
+                        self.keys[row] = k
+                    changed = True
+                    if progress is not None:
+                        progress(start + len(chunk), len(items))
+            finally:
+                # an interrupted sync still persists the batches already encoded
+                if changed:
+                    self.vectors.flush()
+                    self._save_meta()
+
+    def compact(self, keep=None):
+        """Rewrite the matrix without free rows, dropping every triple not in ``keep`` (if given).
+
+        The rows go to a new generation file; views created before keep
+        reading the old one (its mapping outlives the unlinked file).
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            if keep is not None:
+                live = {triple_key(t) for t in keep}
+                used = np.array([row for k, row in self.index.items() if k in live], dtype=np.int64)
+            else:
+                used = np.array(sorted(self.index.values()), dtype=np.int64)
+            used.sort()
+            cap = max(len(used), 1)
+            old_path = self._vectors_path
+            self.generation += 1
+            vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="w+", shape=(cap, self.dim))
+            vectors[:len(used)] = self.vectors[used]
+            vectors.flush()
+            keys = self.keys[used]
+            self.vectors = vectors
+            self.keys = np.zeros(cap, dtype=KEY_DTYPE)
+            self.keys[:len(used)] = keys
+            self.capacity = cap
+            self.index = {k: i for i, k in enumerate(keys.tolist())}
+            self.free = list(range(len(used), cap))
+            self._save_meta()
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+            return len(used)
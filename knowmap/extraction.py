@@ -0,0 +1,160 @@
+"""Batched spaCy triple extraction.
+
+The pipeline is loaded once per process (``load_nlp``) and documents are
+streamed through ``nlp.pipe`` so thousands of documents can be processed
+with a bounded memory footprint and optional multiprocessing.
+"""
+import functools
+import time
+
+from knowmap.timing import span, timed
+
+DEFAULT_MODEL = "en_core_web_sm"
+
+# Components the SVO / entity heuristics rely on: dependency parse (sentences,
+# ROOT, subj/obj), lemmas for the relation, and NER for the fallback triple.
+# Anything else a model ships with (e.g. textcat, custom components) is disabled.
+PARSE_COMPONENTS = ("tok2vec", "tagger", "attribute_ruler", "lemmatizer", "parser")
+NER_COMPONENTS = ("ner",)
+
+
+@functools.lru_cache(maxsize=4)
+def load_nlp(model=DEFAULT_MODEL, use_ner=True):
+    """Load a spaCy pipeline once, keeping only the components extraction needs."""
+    import spacy
+
+    keep = set(PARSE_COMPONENTS) | (set(NER_COMPONENTS) if use_ner else set())
+    with span("spacy.load"):
+        nlp = spacy.load(model)
+    for name in list(nlp.pipe_names):
+        if name not in keep:
+            nlp.disable_pipe(name)
+    return nlp
+
+
+def triples_from_doc(doc):
+    """Extract minimal triples (S, P, O) from a parsed doc, even for single-sentence text."""
+    triples = []
+    for sent in doc.sents:
+        root = next((t for t in sent if t.dep_ == "ROOT"), None)
+        if not root:
+            continue
+        subj = next((w for w in root.lefts if "subj" in w.dep_), None)
+        obj = next((w for w in root.rights if "obj" in w.dep_ or w.dep_ == "pobj"), None)
+        if subj and obj:
+            triples.append((subj.text, root.lemma_, obj.text))
+    if not triples and len(doc.ents) >= 2:
+        triples = [(doc.ents[0].text, "related_to", doc.ents[1].text)]
+    if not triples and len(doc) >= 3:
+        tokens = [t.text for t in doc if not t.is_space]
+        triples = [(tokens[0], tokens[1], tokens[2])]
+    return triples
+
+
+class ExtractionStats:
+    """Running counters for a batch extraction."""
+
+    def __init__(self):
+        self.docs = 0
+        self.triples = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def docs_per_sec(self):
+        return self.docs / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {"docs": self.docs, "triples": self.triples,
+                "elapsed_s": round(self.elapsed, 3), "docs_per_sec": round(self.docs_per_sec, 2)}
+
+
+def iter_extract(texts, batch_size=64, n_process=1, nlp=None, stats=None):
+    """Yield ``(doc_index, triples)`` for each text as soon as it is parsed.
+
+    ``texts`` can be any iterable (list, generator, ``iter_documents``), so
+    large corpora are never held in memory at once. Pass an
+    ``ExtractionStats`` to track docs/sec while consuming the generator.
+    """
+    nlp = nlp or load_nlp()
+    stats = stats if stats is not None else ExtractionStats()
+    pairs = ((t, i) for i, t in enumerate(texts) if t and t.strip())
+    docs = nlp.pipe(pairs, as_tuples=True, batch_size=batch_size, n_process=n_process)
+    while True:
+        with span("spacy.pipe_doc"):  # a batch's parse cost lands on its first doc
+            item = next(docs, None)
+        if item is None:
+            return
+        doc, i = item
+        triples = triples_from_doc(doc)
+        stats.docs += 1
+        stats.triples += len(triples)
+        yield i, triples
+
+
+def extract_store(texts, batch_size=64, n_process=1, nlp=None, progress=None, every=50):
+    """Frozen TripleStore of all triples in ``texts`` plus the run's ``ExtractionStats``.
+
+    ``progress(frac, message)`` is called every ``every`` documents (``texts``
+    must then have a length); raising from it stops the extraction, which is
+    how background jobs are cancelled.
+    """
+    from knowmap.triple_store import TripleStore
+
+    stats = ExtractionStats()
+    store = TripleStore()
+    total = len(texts) if progress is not None else 0
+    for _, found in iter_extract(texts, batch_size=batch_size, n_process=n_process, nlp=nlp, stats=stats):
+        store.extend(found)
+        if progress is not None and stats.docs % every == 0:
+            progress(stats.docs / max(total, 1), f"{stats.docs:,}/{total:,} docs · {stats.triples:,} triples · "
+                                                 f"{stats.docs_per_sec:.1f} docs/sec")
+    return store.freeze(), stats
+
+
+@timed("spacy.extract_text")
+def extract_triples_from_text(text, nlp=None):
+    """Extract triples from one text (the NLP tab's text box)."""
+    nlp = nlp or load_nlp()
+    if len(text) <= nlp.max_length:
+        return triples_from_doc(nlp(text))
+    triples = []
+    for _, found in iter_extract(split_documents(text, max_chars=nlp.max_length), nlp=nlp):
+        triples.extend(found)
+    return triples
+
+
+def split_documents(text, max_chars=100_000):
+    """Split a large text into paragraph-based documents of at most ``max_chars``."""
+    buf, size = [], 0
+    for para in text.split("\n\n"):
+        if buf and size + len(para) > max_chars:
+            yield "\n\n".join(buf)
+            buf, size = [], 0
+        buf.append(para[:max_chars])
+        size += len(para) + 2
+    if buf:
+        yield "\n\n".join(buf)
+
+
+def iter_documents(fileobj, max_chars=100_000):
+    """Stream paragraph documents (blank-line separated) from a text file object."""
+    buf, size = [], 0
+    for line in fileobj:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        if not line.strip():
+            if buf:
+                yield "".join(buf)
+                buf, size = [], 0
+            continue
+        buf.append(line)
+        size += len(line)
+        if size >= max_chars:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
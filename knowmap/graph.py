@@ -0,0 +1,229 @@
+"""Session knowledge graph kept in sync with a TripleStore.
+
+Streamlit reruns the whole script on every interaction, so the graph is
+built once per triple-set version and then edited in place: admin rename,
+merge and delete apply the same delta to the ``nx.Graph`` and to the
+``TripleStore`` instead of rebuilding one from the other. Node/edge counts,
+average degree, the degree distribution and the relation histogram are
+maintained alongside every edit, as are connected components once they
+have been asked for (``components``); see ``knowmap.analytics``.
+"""
+import heapq
+import itertools
+from collections import Counter
+
+import networkx as nx
+
+from knowmap.analytics import ComponentTracker, GraphAnalytics
+from knowmap.timing import timed
+
+
+class KnowledgeGraph:
+    """Undirected ``nx.Graph`` over a TripleStore with incremental metrics.
+
+    Like the original app, one edge is kept per entity pair and a later
+    triple's relation overwrites an earlier one.
+    """
+
+    @timed("graph.build")
+    def __init__(self, store):
+        self.store = store
+        self.G = nx.Graph()
+        for s, p, o in store:
+            self.G.add_edge(s, o, relation=p)
+        self.n_edges = self.G.number_of_edges()
+        self.relation_counts = Counter(d.get("relation", "") for _, _, d in self.G.edges(data=True))
+        degrees = [d for _, d in self.G.degree()]
+        self.degree_counts = Counter(degrees)  # degree -> number of nodes
+        self.degree_sum = sum(degrees)
+        self.version = store.version
+        self._top_cache = (None, [])
+        self._components = None
+        self._analytics = None
+
+    def __contains__(self, node):
+        return node in self.G
+
+    def is_current(self, store):
+        """True if this graph mirrors ``store`` as it is now."""
+        return store is self.store and store.version == self.version
+
+    # -------------------------------
+    # metrics
+    # -------------------------------
+    @property
+    def n_nodes(self):
+        return self.G.number_of_nodes()
+
+    @property
+    def avg_degree(self):
+        return round(self.degree_sum / max(1, self.n_nodes), 2)
+
+    @property
+    def max_degree(self):
+        return max((d for d, c in self.degree_counts.items() if c > 0), default=0)
+
+    def top_nodes(self, k=5):
+        """Highest-degree nodes as ``(node, degree)``; computed once per version."""
+        version, top = self._top_cache
+        if version != self.version or len(top) < k:
+            top = heapq.nlargest(k, self.G.degree(), key=lambda x: x[1])
+            self._top_cache = (self.version, top)
+        return top[:k]
+
+    def top_relations(self, k=3):
+        return [(r, c) for r, c in self.relation_counts.most_common(k) if c > 0]
+
+    @property
+    def components(self):
+        """``ComponentTracker`` for this graph; built on first use, then kept current by every edit."""
+        if self._components is None:
+            self._components = ComponentTracker(self.G)
+        return self._components
+
+    @property
+    def analytics(self):
+        """PageRank, betweenness and communities, cached per version (``GraphAnalytics``)."""
+        if self._analytics is None:
+            self._analytics = GraphAnalytics(self)
+        return self._analytics
+
+    # -------------------------------
+    # low-level bookkeeping
+    # -------------------------------
+    def _set_degree(self, old, new):
+        self.degree_counts[old] -= 1
+        self.degree_counts[new] += 1
+        self.degree_sum += new - old
+
+    def _add_node(self, n):
+        if n not in self.G:
+            self.G.add_node(n)
+            self.degree_counts[0] += 1
+            if self._components is not None:
+                self._components.add_node(n)
+
+    def _add_edge(self, u, v, rel):
+        if self.G.has_edge(u, v):
+            old = self.G.edges[u, v].get("relation", "")
+            self.relation_counts[old] -= 1
+            self.relation_counts[rel] += 1
+            self.G.edges[u, v]["relation"] = rel
+            return
+        self._add_node(u)
+        self._add_node(v)
+        du, dv = self.G.degree(u), self.G.degree(v)
+        self.G.add_edge(u, v, relation=rel)
+        self._set_degree(du, self.G.degree(u))
+        if v != u:
+            self._set_degree(dv, self.G.degree(v))
+        self.relation_counts[rel] += 1
+        self.n_edges += 1
+        if self._components is not None:
+            self._components.add_edge(u, v)
+
+    def _remove_node(self, n):
+        for nbr in list(self.G.neighbors(n)):
+            if nbr != n:
+                self._set_degree(self.G.degree(nbr), self.G.degree(nbr) - 1)
+            self.relation_counts[self.G.edges[n, nbr].get("relation", "")] -= 1
+            self.n_edges -= 1
+        self.degree_counts[self.G.degree(n)] -= 1
+        self.degree_sum -= self.G.degree(n)
+        self.G.remove_node(n)
+        if self._components is not None:
+            self._components.remove_node(n)
+
+    def _writable_store(self):
+        # shared (frozen) stores are copied on the first edit of a session
+        if self.store.frozen:
+            self.store = self.store.thaw()
+        return self.store
+
+    def _commit(self):
+        self.version = self.store.version
+
+    # -------------------------------
+    # admin operations (graph + store deltas)
+    # -------------------------------
+    def rename_node(self, old, new):
+        """Rename ``old`` to ``new``; if ``new`` exists the two nodes are combined (``old``'s edges win)."""
+        edges = [(nbr, d.get("relation", "")) for nbr, d in self.G.adj[old].items()]
+        # links of ``new`` that ``old``'s edges overwrite; an edge between the two becomes a self-loop
+        overwritten = []
+        if new in self.G:
+            overwritten = [nbr for nbr in self.G.adj[new] if nbr not in (old, new) and nbr in self.G.adj[old]]
+            if new in self.G.adj[new] and (new in self.G.adj[old] or old in self.G.adj[old]):
+                overwritten.append(new)
+        self._remove_node(old)
+        self._add_node(new)
+        for nbr, rel in edges:
+            self._add_edge(new, new if nbr == old else nbr, rel)
+        store = self._writable_store()
+        store.delete_links(new, overwritten)
+        store.rename_entity(old, new)
+        # several rows can now collapse onto one pair (e.g. the new self-loop): keep the
+        # relation of the last row, as a rebuild from the store would
+        for nbr, rel in store.links(new).items():
+            if self.G.edges[new, nbr].get("relation", "") != rel:
+                self._add_edge(new, nbr, rel)
+        self._commit()
+
+    def _merge_graph(self, target, source):
+        moved, dropped = [], [target, source]
+        for nbr, d in self.G.adj[source].items():
+            if nbr not in (target, source) and not self.G.has_edge(target, nbr):
+                moved.append((nbr, d.get("relation", "")))
+            else:
+                dropped.append(nbr)
+        self._remove_node(source)
+        for nbr, rel in moved:
+            self._add_edge(target, nbr, rel)
+        return dropped
+
+    def merge_nodes(self, target, source):
+        """Move ``source``'s edges to ``target`` (existing target edges win), then drop ``source``."""
+        dropped = self._merge_graph(target, source)
+        store = self._writable_store()
+        store.delete_links(source, dropped)
+        store.rename_entity(source, target)
+        self._commit()
+
+    def merge_many(self, pairs):
+        """``merge_nodes`` for many ``(target, source)`` pairs, in order, with one store pass.
+
+        Pairs whose nodes are missing or identical (e.g. already merged) are
+        skipped; returns the pairs actually applied.
+        """
+        merges = []
+        for target, source in pairs:
+            if target == source or target not in self.G or source not in self.G:
+                continue
+            merges.append((target, source, self._merge_graph(target, source)))
+        if merges:
+            self._writable_store().merge_entities(merges)
+            self._commit()
+        return [(t, s) for t, s, _ in merges]
+
+    def delete_node(self, node):
+        self._remove_node(node)
+        self._writable_store().delete_entity(node)
+        self._commit()
+
+    def add_triples(self, triples, batch_size=50_000):
+        """Append triples to the store and graph (import in merge mode), ``batch_size`` at a time."""
+        it = iter(triples)
+        store = self._writable_store()
+        while True:
+            batch = list(itertools.islice(it, batch_size))
+            if not batch:
+                break
+            for s, p, o in batch:
+                self._add_edge(str(s), str(o), str(p))
+            store.extend(batch)
+        self._commit()
+
+
+def triples_from_graph(G):
+    """(s, p, o) triples for every edge of ``G``."""
+    return [(u, data.get("relation", ""), v) for u, v, data in G.edges(data=True)]
@@ -0,0 +1,166 @@
+"""CSR-backed, directed, relation-typed graph engine over a TripleStore.
+
+Every live triple is one directed edge ``s -[p]-> o``; parallel relations
+between the same pair are all kept. Adjacency is stored twice in CSR form
+(outgoing and incoming) as NumPy arrays, so neighbourhood expansion, BFS and
+relation filters run as vectorised array operations instead of Python
+dict-of-dict walks.
+"""
+import numpy as np
+
+from knowmap.timing import timed
+
+DIRECTIONS = ("out", "in", "both")
+
+
+def _csr(src, dst, rel, n):
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order], rel[order], order
+
+
+def _expand(indptr, nodes):
+    """Positions in the CSR arrays of all edges leaving ``nodes`` (vectorised)."""
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    owner = np.repeat(np.arange(len(nodes)), lengths)
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return starts[owner] + offsets, nodes[owner]
+
+
+class CSRGraph:
+    """Compact multi-relational digraph; node ids are TripleStore entity codes."""
+
+    @timed("graph.csr_build")
+    def __init__(self, store):
+        self.store = store
+        self.version = store.version
+        s, p, o = (np.asarray(a, dtype=np.int64) for a in store.codes())
+        self.n_nodes = len(store.entities)
+        self.n_edges = len(s)
+        # edge ids are positions of live triples, so store[edge_id] is the triple
+        self.out_ptr, self.out_dst, self.out_rel, self.out_eid = _csr(s, o, p, self.n_nodes)
+        self.in_ptr, self.in_src, self.in_rel, self.in_eid = _csr(o, s, p, self.n_nodes)
+
+    # -------------------------------
+    # name <-> id helpers
+    # -------------------------------
+    def node_ids(self, names):
+        codes = [self.store.entities.get(n) for n in names]
+        return np.array([c for c in codes if c >= 0], dtype=np.int64)
+
+    def node_names(self, ids):
+        values = self.store.entities.values
+        return [values[i] for i in np.asarray(ids).tolist()]
+
+    def relation_ids(self, names):
+        if names is None:
+            return None
+        codes = [self.store.relations.get(n) for n in names]
+        return np.array([c for c in codes if c >= 0], dtype=np.int64)
+
+    # -------------------------------
+    # traversal
+    # -------------------------------
+    def _step(self, frontier, relations, direction):
+        """(neighbour, edge id, from-node) arrays for one hop out of ``frontier``."""
+        nbrs, eids, froms = [], [], []
+        if direction in ("out", "both"):
+            pos, owner = _expand(self.out_ptr, frontier)
+            keep = np.isin(self.out_rel[pos], relations) if relations is not None else slice(None)
+            nbrs.append(self.out_dst[pos][keep]); eids.append(self.out_eid[pos][keep]); froms.append(owner[keep])
+        if direction in ("in", "both"):
+            pos, owner = _expand(self.in_ptr, frontier)
+            keep = np.isin(self.in_rel[pos], relations) if relations is not None else slice(None)
+            nbrs.append(self.in_src[pos][keep]); eids.append(self.in_eid[pos][keep]); froms.append(owner[keep])
+        return np.concatenate(nbrs), np.concatenate(eids), np.concatenate(froms)
+
+    @timed("graph.k_hop")
+    def k_hop(self, seeds, k=1, relations=None, direction="both", max_nodes=None):
+        """Nodes within ``k`` hops of ``seeds`` and the hop distance of each.
+
+        ``seeds`` are entity names; ``relations`` optionally restricts the
+        traversal to the given relation names. Returns ``(node_ids, hops)``.
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+        rel = self.relation_ids(relations)
+        dist = np.full(self.n_nodes, -1, dtype=np.int64)
+        frontier = np.unique(self.node_ids(seeds))
+        dist[frontier] = 0
+        found = len(frontier)
+        for hop in range(1, k + 1):
+            if not len(frontier):
+                break
+            nbrs, _, _ = self._step(frontier, rel, direction)
+            nbrs = np.unique(nbrs)
+            frontier = nbrs[dist[nbrs] < 0]
+            if max_nodes is not None and found + len(frontier) > max_nodes:
+                frontier = frontier[:max(0, max_nodes - found)]
+            dist[frontier] = hop
+            found += len(frontier)
+        nodes = np.flatnonzero(dist >= 0)
+        order = np.argsort(dist[nodes], kind="stable")
+        return nodes[order], dist[nodes][order]
+
+    @timed("graph.shortest_path")
+    def shortest_path(self, source, target, relations=None, direction="both", max_hops=None):
+        """Triples on one shortest path from ``source`` to ``target`` (BFS), or None."""
+        src, dst = self.node_ids([source]), self.node_ids([target])
+        if not len(src) or not len(dst):
+            return None
+        src, dst = int(src[0]), int(dst[0])
+        if src == dst:
+            return []
+        rel = self.relation_ids(relations)
+        parent_node = np.full(self.n_nodes, -1, dtype=np.int64)
+        parent_edge = np.full(self.n_nodes, -1, dtype=np.int64)
+        parent_node[src] = src
+        frontier = np.array([src], dtype=np.int64)
+        hops = 0
+        while len(frontier) and parent_node[dst] < 0:
+            if max_hops is not None and hops >= max_hops:
+                break
+            nbrs, eids, froms = self._step(frontier, rel, direction)
+            new = parent_node[nbrs] < 0
+            nbrs, eids, froms = nbrs[new], eids[new], froms[new]
+            nbrs, first = np.unique(nbrs, return_index=True)
+            parent_node[nbrs] = froms[first]
+            parent_edge[nbrs] = eids[first]
+            frontier = nbrs
+            hops += 1
+        if parent_node[dst] < 0:
+            return None
+        path, node = [], dst
+        while node != src:
+            path.append(self.store[int(parent_edge[node])])
+            node = int(parent_node[node])
+        return path[::-1]
+
+    def subgraph_edges(self, nodes, relations=None):
+        """Edge ids (store positions) with both endpoints in ``nodes`` (entity ids)."""
+        inside = np.zeros(self.n_nodes, dtype=bool)
+        inside[np.asarray(nodes, dtype=np.int64)] = True
+        pos, _ = _expand(self.out_ptr, np.flatnonzero(inside))
+        keep = inside[self.out_dst[pos]]
+        if relations is not None:
+            keep &= np.isin(self.out_rel[pos], self.relation_ids(relations))
+        return np.sort(self.out_eid[pos][keep])
+
+    def context(self, seeds, k=2, relations=None, direction="both", max_nodes=None):
+        """Triples of the k-hop subgraph around ``seeds`` (the "graph context" of hits)."""
+        nodes, _ = self.k_hop(seeds, k, relations, direction, max_nodes)
+        return [self.store[int(e)] for e in self.subgraph_edges(nodes, relations)]
+
+    def to_multidigraph(self):
+        """``nx.MultiDiGraph`` with one keyed edge per triple (``relation`` attribute)."""
+        import networkx as nx
+
+        M = nx.MultiDiGraph()
+        for s, p, o in self.store:
+            M.add_edge(s, o, key=p, relation=p)
+        return M
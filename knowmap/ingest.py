@@ -0,0 +1,227 @@
+"""Streaming CSV/TSV ingestion for triple datasets.
+
+The delimiter and header are sniffed once from a small sample, then the file
+is parsed in fixed-size chunks with pandas' C engine (or pyarrow's streaming
+reader when installed), so peak memory is bounded by the chunk size rather
+than the upload size.
+"""
+import csv
+import io
+import re
+import warnings
+
+import pandas as pd
+
+from knowmap.timing import span
+
+SAMPLE_BYTES = 64 * 1024
+DEFAULT_CHUNKSIZE = 100_000
+
+NINE_COLUMNS = ["id", "entity_1", "relation", "entity_2",
+                "domain", "country", "start_year", "end_year", "notes"]
+SUBJECT_ALIASES = ("entity_1", "subject")
+RELATION_ALIASES = ("relation", "predicate", "rel")
+OBJECT_ALIASES = ("entity_2", "object")
+KNOWN_HEADERS = set(NINE_COLUMNS) | set(SUBJECT_ALIASES + RELATION_ALIASES + OBJECT_ALIASES)
+_SKIPPED_LINE = re.compile(r"Skipping line (\d+)")  # pandas' ParserWarning for on_bad_lines="warn"
+
+
+class CsvFormat:
+    """Result of sniffing a sample: delimiter, header flag and column names."""
+
+    def __init__(self, sep, has_header, columns):
+        self.sep = sep
+        self.has_header = has_header
+        self.columns = columns
+
+    def __repr__(self):
+        return f"CsvFormat(sep={self.sep!r}, has_header={self.has_header}, columns={self.columns})"
+
+
+def name_columns(columns):
+    """Apply KnowMap's column auto-naming to a list of (raw) column names."""
+    columns = [str(c) for c in columns]
+    lower_cols = [c.lower() for c in columns]
+    if not {"entity_1", "relation", "entity_2"}.issubset(set(lower_cols)):
+        if len(columns) >= 9:
+            return NINE_COLUMNS + [f"col{i}" for i in range(len(columns) - 9)]
+        if len(columns) >= 3 and not triple_columns(columns)[0]:
+            return ["entity_1", "relation", "entity_2"] + [f"col{i}" for i in range(len(columns) - 3)]
+    return columns
+
+
+def triple_columns(columns):
+    """Return the (subject, relation, object) column names, or (None, None, None)."""
+    cols = {str(c).lower(): c for c in columns}
+    s_col = next((cols[a] for a in SUBJECT_ALIASES if a in cols), None)
+    p_col = next((cols[a] for a in RELATION_ALIASES if a in cols), None)
+    o_col = next((cols[a] for a in OBJECT_ALIASES if a in cols), None)
+    if s_col and p_col and o_col:
+        return s_col, p_col, o_col
+    return None, None, None
+
+
+def domain_column(columns):
+    """Name of the ``domain`` column, or None."""
+    return next((c for c in columns if str(c).lower() == "domain"), None)
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _read_sample(fileobj):
+    fileobj.seek(0)
+    raw = fileobj.read(SAMPLE_BYTES)
+    fileobj.seek(0)
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="replace")
+    if len(raw) == SAMPLE_BYTES and "\n" in raw:
+        raw = raw[:raw.rindex("\n")]  # drop the partial last line
+    return raw
+
+
+def sniff_format(fileobj):
+    """Detect delimiter, header and column names from the first ``SAMPLE_BYTES``."""
+    sample = _read_sample(fileobj)
+    try:
+        sep = csv.Sniffer().sniff(sample, delimiters=",\t;|").delimiter
+    except csv.Error:
+        sep = "\t" if sample.count("\t") > sample.count(",") else ","
+
+    rows = list(csv.reader(io.StringIO(sample), delimiter=sep))
+    first = rows[0] if rows else []
+    if any(c.strip().lower() in KNOWN_HEADERS for c in first):
+        has_header = True
+    else:
+        # header rows hold names, never numbers (ids, years)
+        try:
+            has_header = csv.Sniffer().has_header(sample) and not any(_is_number(c) for c in first)
+        except csv.Error:
+            has_header = False
+
+    ncols = max((len(r) for r in rows[:50]), default=0)
+    raw_columns = [c.strip() for c in first] if has_header else list(range(ncols))
+    return CsvFormat(sep, has_header, name_columns(raw_columns))
+
+
+def _pyarrow_chunks(fileobj, fmt, chunksize, skipped):
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    read_opts = pa_csv.ReadOptions(column_names=fmt.columns, skip_rows=1 if fmt.has_header else 0,
+                                   block_size=max(1 << 20, chunksize * 64))
+    convert = pa_csv.ConvertOptions(column_types={c: pa.string() for c in fmt.columns},
+                                    strings_can_be_null=False)
+    def skip(row):
+        skipped.append(row.number)
+        return "skip"
+
+    parse_opts = pa_csv.ParseOptions(delimiter=fmt.sep, invalid_row_handler=skip)
+    reader = pa_csv.open_csv(fileobj, read_options=read_opts, parse_options=parse_opts,
+                             convert_options=convert)
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+def iter_chunks(fileobj, chunksize=DEFAULT_CHUNKSIZE, fmt=None, engine="c", skipped=None):
+    """Yield named DataFrame chunks of at most ``chunksize`` rows (all columns as str).
+
+    ``engine="pyarrow"`` uses pyarrow's streaming CSV reader if available and
+    falls back to the C engine otherwise. Rows with more fields than the
+    sniffed columns are skipped, not fatal; pass a list as ``skipped`` to
+    collect their line numbers.
+    """
+    fmt = fmt or sniff_format(fileobj)
+    if skipped is None:
+        skipped = []
+    fileobj.seek(0)
+    if engine == "pyarrow":
+        try:
+            yield from _pyarrow_chunks(fileobj, fmt, chunksize, skipped)
+            return
+        except ImportError:
+            fileobj.seek(0)
+
+    reader = pd.read_csv(
+        fileobj, sep=fmt.sep, engine="c", header=None, names=fmt.columns,
+        skiprows=1 if fmt.has_header else 0, dtype=str, na_filter=False,
+        chunksize=chunksize, on_bad_lines="warn",
+    )
+    chunks = iter(reader)
+    while True:
+        with span("csv.parse_chunk"), warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", pd.errors.ParserWarning)
+            chunk = next(chunks, None)
+        for w in caught:
+            if issubclass(w.category, pd.errors.ParserWarning):
+                skipped.extend(int(n) for n in _SKIPPED_LINE.findall(str(w.message)))
+            else:
+                warnings.warn_explicit(w.message, w.category, w.filename, w.lineno)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def iter_triple_chunks(fileobj, chunksize=DEFAULT_CHUNKSIZE, fmt=None, engine="c", progress=None,
+                       domains=None, skipped=None):
+    """Yield lists of (s, p, o) string triples, one list per parsed chunk.
+
+    ``progress(fraction, rows_so_far)`` is called after every chunk when the
+    input size is known. If the file has a ``domain`` column, the domain of
+    every row's entities is recorded in ``domains`` (an
+    ``knowmap.crossdomain.EntityDomains``) when given. Malformed rows are
+    reported through ``skipped`` as in ``iter_chunks``. Raises ``ValueError``
+    if no triple columns exist.
+    """
+    fmt = fmt or sniff_format(fileobj)
+    s_col, p_col, o_col = triple_columns(fmt.columns)
+    if not s_col:
+        raise ValueError(f"No triple columns detected in {fmt.columns}")
+    d_col = domain_column(fmt.columns) if domains is not None else None
+
+    total = _size_of(fileobj)
+    rows = 0
+    for chunk in iter_chunks(fileobj, chunksize, fmt=fmt, engine=engine, skipped=skipped):
+        triples = list(zip(chunk[s_col].tolist(), chunk[p_col].tolist(), chunk[o_col].tolist()))
+        if d_col is not None:
+            domains.add(chunk[s_col].tolist(), chunk[o_col].tolist(), chunk[d_col].tolist())
+        rows += len(triples)
+        if progress is not None:
+            frac = min(1.0, fileobj.tell() / total) if total else 0.0
+            progress(frac, rows)
+        yield triples
+
+
+def _size_of(fileobj):
+    try:
+        pos = fileobj.tell()
+        fileobj.seek(0, io.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(pos)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+def load_dataframe(fileobj, chunksize=DEFAULT_CHUNKSIZE, max_rows=None, fmt=None):
+    """Load a whole (or the first ``max_rows``) CSV/TSV into one named DataFrame.
+
+    ``fmt`` is a ``CsvFormat`` from an earlier ``sniff_format`` call, if any.
+    """
+    fmt = fmt or sniff_format(fileobj)
+    chunks = []
+    rows = 0
+    for chunk in iter_chunks(fileobj, chunksize=min(chunksize, max_rows or chunksize), fmt=fmt):
+        chunks.append(chunk)
+        rows += len(chunk)
+        if max_rows and rows >= max_rows:
+            break
+    if not chunks:
+        return pd.DataFrame(columns=fmt.columns)
+    df = pd.concat(chunks, ignore_index=True)
+    return df.head(max_rows) if max_rows else df
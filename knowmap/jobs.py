@@ -0,0 +1,232 @@
+"""Background jobs for long-running work (extraction, embedding, export).
+
+Streamlit runs the script on the thread that serves the browser, so a
+100k-sentence encode inside a view freezes the page until it finishes.
+``JobQueue`` runs such work on a thread pool (or a process pool for
+picklable, CPU-bound functions) and hands back a ``Job`` right away; views
+re-render every ``POLL_S`` seconds showing its progress until it is done,
+then read ``job.result``.
+
+Jobs submitted with the same ``key`` while one is queued or running share
+that job, and a finished job keeps answering for its key until it is
+evicted or ``forget``-ed -- so two sessions asking for the index of the
+same triple-set version build it once, and the result is published to
+both. ``keep`` finished jobs are retained, evicting the least recently
+used first (``submit``, ``find`` and ``get`` count as a use), so a result
+a session keeps reading is not pushed out by a burst of other jobs.
+
+Thread jobs get a ``JobContext`` as first argument: ``ctx.progress(frac,
+message)`` reports progress and raises ``Cancelled`` once the job has been
+cancelled, so cancellation takes effect at the next progress report.
+Process jobs only report completion and can be cancelled while queued.
+"""
+import itertools
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from knowmap import timing
+
+POLL_S = 0.75  # how often a view showing a running job re-renders
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class Cancelled(Exception):
+    """Raised inside a job when it has been cancelled."""
+
+
+class JobContext:
+    """Handle passed to thread jobs for progress reports and cancellation checks."""
+
+    def __init__(self, job):
+        self._job = job
+
+    @property
+    def cancelled(self):
+        return self._job._cancel.is_set()
+
+    def check(self):
+        if self._job._cancel.is_set():
+            raise Cancelled()
+
+    def progress(self, frac=None, message=None):
+        """Record progress (``frac`` in [0, 1]); raises ``Cancelled`` if the job was cancelled."""
+        if frac is not None:
+            self._job.progress = min(1.0, max(0.0, float(frac)))
+        if message is not None:
+            self._job.message = message
+        self.check()
+
+
+class Job:
+    """One submitted unit of work; its fields are updated by the worker."""
+
+    def __init__(self, job_id, key, name):
+        self.id = job_id
+        self.key = key
+        self.name = name
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.used = self.submitted  # last submit/find/get, for LRU eviction
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    @property
+    def ok(self):
+        return self.status == DONE
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def as_dict(self):
+        return {"id": self.id, "name": self.name, "status": self.status,
+                "progress": round(self.progress, 3), "message": self.message,
+                "elapsed_s": round(self.elapsed, 2), "error": self.error}
+
+
+class JobQueue:
+    """Thread/process pools with job ids, progress, cancellation and per-key dedup."""
+
+    def __init__(self, threads=2, processes=0, keep=16):
+        self._threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="knowmap-job")
+        self._processes = ProcessPoolExecutor(max_workers=processes) if processes else None
+        self.keep = keep
+        self._jobs = OrderedDict()  # id -> Job, in submission order
+        self._by_key = {}  # key -> id of the job currently answering for it
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, name, func, *args, key=None, process=False, registry=None, **kwargs):
+        """Run ``func`` in the background and return its ``Job``.
+
+        If a job with the same ``key`` is in flight or finished successfully
+        (and not yet evicted) that job is returned instead and ``func`` does
+        not run. Thread jobs are called as ``func(ctx, *args, **kwargs)``;
+        ``process=True`` jobs as ``func(*args, **kwargs)`` on the process
+        pool. ``registry`` is a ``timing.Registry`` that the worker binds
+        so the job's spans also count towards the submitting session.
+        """
+        with self._lock:
+            if key is not None:
+                existing = self._jobs.get(self._by_key.get(key))
+                if existing is not None and existing.status not in (FAILED, CANCELLED):
+                    existing.used = time.time()
+                    return existing
+            job = Job(next(self._ids), key, name)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job.id
+            self._evict()
+        if process:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1))
+            job.status = RUNNING
+            job.started = time.time()
+            job._future = self._processes.submit(func, *args, **kwargs)
+            job._future.add_done_callback(lambda f: self._settle(job, f))
+        else:
+            job._future = self._threads.submit(self._run, job, func, args, kwargs, registry)
+        return job
+
+    def _run(self, job, func, args, kwargs, registry):
+        if job._cancel.is_set():
+            job.status, job.finished = CANCELLED, time.time()
+            return
+        job.status, job.started = RUNNING, time.time()
+        timing.bind_session(registry)
+        try:
+            job.result = func(JobContext(job), *args, **kwargs)
+            job.progress, job.status = 1.0, DONE
+        except Cancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.message = traceback.format_exc(limit=5)
+            job.status = FAILED
+        finally:
+            timing.bind_session(None)
+            job.finished = job.used = time.time()
+            with self._lock:
+                self._evict()
+
+    def _settle(self, job, future):
+        job.finished = job.used = time.time()
+        if future.cancelled():
+            job.status = CANCELLED
+        elif future.exception() is not None:
+            e = future.exception()
+            job.error, job.status = f"{type(e).__name__}: {e}", FAILED
+        else:
+            job.result, job.progress, job.status = future.result(), 1.0, DONE
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        finished = sorted((j for j in self._jobs.values() if j.done), key=lambda j: j.used)
+        for job in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.used = time.time()
+        return job
+
+    def find(self, key):
+        """The job currently answering for ``key`` (any status), or None."""
+        with self._lock:
+            job = self._jobs.get(self._by_key.get(key))
+            if job is not None:
+                job.used = time.time()
+            return job
+
+    def cancel(self, job_id):
+        """Ask a job to stop; queued jobs never start, running thread jobs stop at their next progress report."""
+        job = self._jobs.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel.set()
+        if job._future is not None and job._future.cancel():
+            job.status, job.finished = CANCELLED, time.time()
+        return True
+
+    def forget(self, key):
+        """Drop the finished job for ``key`` so the next submit runs again."""
+        with self._lock:
+            job = self._jobs.get(self._by_key.get(key))
+            if job is not None and job.done:
+                del self._jobs[job.id]
+                del self._by_key[key]
+
+    def jobs(self, active_only=False):
+        """Jobs newest first."""
+        with self._lock:
+            out = list(self._jobs.values())[::-1]
+        return [j for j in out if not j.done] if active_only else out
+
+    def shutdown(self, wait=False):
+        for job in self.jobs(active_only=True):
+            self.cancel(job.id)
+        self._threads.shutdown(wait=wait)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait)
@@ -0,0 +1,314 @@
+"""Append-only edit journal (write-ahead log) for admin graph edits.
+
+Each admin operation (rename / merge / bulk merge / delete / import) is appended to
+``journal.jsonl`` as one small JSON line pointing at its parent entry, so a
+backup costs as much as the edit itself instead of a full copy of the graph.
+Full snapshots of the triple set (binary ``.kmap`` files, see
+``knowmap.snapshot``) are written
+only when a dataset is first journaled and then every ``snapshot_every``
+edits; large merge imports are kept in their own ``.kmap`` file; any entry can be rebuilt
+by loading the nearest snapshot on its ancestry and replaying the ops after
+it. Following parents gives multi-step undo, children give redo, and
+``restore`` jumps to any point in time.
+
+Sessions share the files but each keeps its own ``head``. Entries record
+the store version they correspond to, so a session starting from a store
+that is already journaled (e.g. the shared prebuilt graph) continues from
+that entry instead of writing another snapshot; and a session whose head
+was removed by another session's ``compact`` re-anchors its next edit at
+a fresh snapshot.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+
+from knowmap.graph import KnowledgeGraph
+from knowmap.snapshot import SUFFIX, read_snapshot, write_snapshot
+from knowmap.triple_store import TripleStore
+
+JOURNAL_FILE = "journal.jsonl"
+SNAPSHOT_PREFIX = "snapshot_"
+IMPORT_PREFIX = "import_"
+
+# one lock for all journals in the process: sessions share the same files
+_FILE_LOCK = threading.RLock()
+# store versions are only unique within a process; entries pair them with this token
+_PROCESS = f"{os.getpid()}-{time.time_ns()}"
+
+
+def _now():
+    return datetime.datetime.utcnow().isoformat() + "Z"
+
+
+def apply_op(kg, entry, root=None):
+    """Apply one journal entry to a KnowledgeGraph; returns the (possibly new) graph.
+
+    ``root`` is the journal directory, needed for imports stored as files.
+    """
+    op, args = entry["op"], entry.get("args", {})
+    if op == "rename":
+        kg.rename_node(args["old"], args["new"])
+    elif op == "merge":
+        kg.merge_nodes(args["target"], args["source"])
+    elif op == "merge_many":
+        kg.merge_many(args["pairs"])
+    elif op == "delete":
+        kg.delete_node(args["node"])
+    elif op == "import_merge":
+        kg.add_triples(args["triples"] if "file" not in args else read_snapshot(os.path.join(root, args["file"])))
+    elif op == "replace":
+        kg = KnowledgeGraph(TripleStore.from_triples(args["triples"]))
+    elif op != "begin":
+        raise ValueError(f"Unknown journal op {op!r}")
+    return kg
+
+
+class EditJournal:
+    """Journal of graph edits with snapshots, undo/redo and point-in-time restore.
+
+    ``head`` is the entry matching the caller's current graph; it is kept per
+    instance (i.e. per session) while the files are shared.
+    """
+
+    def __init__(self, root="kg_backups", snapshot_every=100):
+        self.root = root
+        self.snapshot_every = snapshot_every
+        self.path = os.path.join(root, JOURNAL_FILE)
+        self._lock = _FILE_LOCK
+        os.makedirs(root, exist_ok=True)
+        self.entries = {}
+        self.head = None
+        self.reload()
+
+    # -------------------------------
+    # files
+    # -------------------------------
+    def reload(self):
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from a crash
+                    self.entries[entry["id"]] = entry
+        self.snapshots = set()
+        for name in os.listdir(self.root):
+            stem, ext = os.path.splitext(name)
+            if name.startswith(SNAPSHOT_PREFIX) and ext == SUFFIX:
+                self.snapshots.add(int(stem[len(SNAPSHOT_PREFIX):]))
+
+    def _snapshot_path(self, entry_id):
+        return os.path.join(self.root, f"{SNAPSHOT_PREFIX}{entry_id}{SUFFIX}")
+
+    def _write_snapshot(self, entry_id, store):
+        write_snapshot(store, self._snapshot_path(entry_id))
+        self.snapshots.add(entry_id)
+
+    def _read_snapshot(self, entry_id):
+        return read_snapshot(self._snapshot_path(entry_id))
+
+    def save_import(self, store):
+        """Write imported triples to their own file; pass the name as ``file=`` to ``record``."""
+        name = f"{IMPORT_PREFIX}{self._new_id()}{SUFFIX}"
+        write_snapshot(store, os.path.join(self.root, name))
+        return name
+
+    def _append(self, entry):
+        line = json.dumps(entry) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+        self.entries[entry["id"]] = entry
+
+    def _new_id(self):
+        # time-ordered and unique across sessions sharing the directory
+        new_id = time.time_ns()
+        while new_id in self.entries:
+            new_id += 1
+        return new_id
+
+    # -------------------------------
+    # recording
+    # -------------------------------
+    def begin(self, store, note=""):
+        """Start a new history at ``store`` and return its id.
+
+        If an entry for this exact store version exists (another session
+        journaled the same shared store) it becomes ``head`` and no
+        snapshot is written; otherwise a root snapshot is.
+        """
+        with self._lock:
+            self.reload()
+            key = [_PROCESS, store.version]
+            for entry_id in sorted(self.entries, reverse=True):
+                if self.entries[entry_id].get("store") == key and self._rebuildable(entry_id):
+                    self.head = entry_id
+                    return self.head
+            entry = {"id": self._new_id(), "parent": None, "ts": _now(), "op": "begin",
+                     "args": {"note": note, "triples": len(store)}, "store": key}
+            self._write_snapshot(entry["id"], store)
+            self._append(entry)
+            self.head = entry["id"]
+            return self.head
+
+    def record(self, op, store_after, **args):
+        """Append ``op`` as a child of ``head``; ``store_after`` is the state it produced.
+
+        If ``head`` can no longer be rebuilt (compacted away by another
+        session) the entry starts a new root with its own snapshot.
+        """
+        if self.head is None:
+            raise ValueError("journal has no head; call begin() first")
+        with self._lock:
+            parent = self.head if self._rebuildable(self.head) else None
+            entry = {"id": self._new_id(), "parent": parent, "ts": _now(), "op": op, "args": args,
+                     "store": [_PROCESS, store_after.version]}
+            self._append(entry)
+            self.head = entry["id"]
+            if parent is None or self._distance_to_snapshot(self.head) >= self.snapshot_every:
+                self._write_snapshot(self.head, store_after)
+            return self.head
+
+    def _rebuildable(self, entry_id):
+        """True if ``entry_id`` still has a snapshot on its ancestry (re-reads the files once if not)."""
+        for attempt in range(2):
+            try:
+                if os.path.exists(self._snapshot_path(self._chain(entry_id)[-1])):
+                    return True
+            except KeyError:
+                pass
+            if attempt == 0:
+                self.reload()  # another session may have compacted the journal
+        return False
+
+    def _chain(self, entry_id):
+        """Entry ids from ``entry_id`` back to its nearest snapshot (inclusive)."""
+        chain = []
+        while entry_id is not None:
+            chain.append(entry_id)
+            if entry_id in self.snapshots:
+                return chain
+            entry = self.entries.get(entry_id)
+            if entry is None:
+                break
+            entry_id = entry["parent"]
+        raise KeyError("no snapshot on the ancestry of this entry (compacted away?)")
+
+    def _distance_to_snapshot(self, entry_id):
+        return len(self._chain(entry_id)) - 1
+
+    # -------------------------------
+    # restore / undo / redo
+    # -------------------------------
+    def state_at(self, entry_id):
+        """Rebuild the graph as of ``entry_id`` (nearest snapshot + replay).
+
+        Raises ``KeyError`` if the entry was compacted away.
+        """
+        if not self._rebuildable(entry_id):
+            raise KeyError(f"journal entry {entry_id} was removed by a compaction")
+        chain = self._chain(entry_id)
+        kg = KnowledgeGraph(self._read_snapshot(chain[-1]))
+        for eid in reversed(chain[:-1]):
+            kg = apply_op(kg, self.entries[eid], self.root)
+        return kg
+
+    def restore(self, entry_id):
+        """Move ``head`` to any entry (point-in-time restore) and return its graph."""
+        kg = self.state_at(entry_id)
+        self.head = entry_id
+        return kg
+
+    def restore_time(self, when):
+        """Restore the latest entry on the current branch at or before ISO time ``when``."""
+        for entry in self.history():
+            if entry["ts"] <= when:
+                return self.restore(entry["id"])
+        raise KeyError(f"no journal entry at or before {when}")
+
+    def can_undo(self):
+        entry = self.entries.get(self.head)
+        return bool(entry and entry["parent"] is not None)
+
+    def undo(self):
+        if not self.can_undo():
+            raise IndexError("nothing to undo")
+        return self.restore(self.entries[self.head]["parent"])
+
+    def _children(self, entry_id):
+        return sorted(e["id"] for e in self.entries.values() if e["parent"] == entry_id)
+
+    def can_redo(self):
+        return self.head is not None and bool(self._children(self.head))
+
+    def redo(self):
+        """Re-apply the most recent child of ``head``."""
+        children = self._children(self.head)
+        if not children:
+            raise IndexError("nothing to redo")
+        return self.restore(children[-1])
+
+    def history(self, limit=None):
+        """Entries on the current branch, newest first."""
+        out, entry_id = [], self.head
+        while entry_id is not None and entry_id in self.entries:
+            out.append(self.entries[entry_id])
+            if limit and len(out) >= limit:
+                break
+            entry_id = self.entries[entry_id]["parent"]
+        return out
+
+    # -------------------------------
+    # retention
+    # -------------------------------
+    def compact(self, keep_snapshots=5, max_age_days=None):
+        """Apply retention: keep the newest snapshots (plus the one ``head`` needs).
+
+        Snapshots older than ``max_age_days`` are dropped too, and journal
+        entries that can no longer be rebuilt from a kept snapshot are
+        removed from the log. Returns ``(entries_removed, snapshots_removed)``.
+        """
+        with self._lock:
+            self.reload()  # other sessions may have appended since we loaded
+            keep = set(sorted(self.snapshots)[-keep_snapshots:]) if keep_snapshots else set()
+            if max_age_days is not None:
+                cutoff = time.time_ns() - int(max_age_days * 86400 * 1e9)
+                keep = {s for s in keep if s >= cutoff}
+            if self.head is not None and self._rebuildable(self.head):
+                keep.add(self._chain(self.head)[-1])
+
+            valid = {}
+            for eid in sorted(self.entries):
+                parent = self.entries[eid]["parent"]
+                valid[eid] = eid in keep or (parent is not None and valid.get(parent, False))
+            kept_entries = [self.entries[e] for e in sorted(self.entries) if valid[e]]
+            for entry in kept_entries:  # kept snapshots become roots of what remains
+                if entry["parent"] is not None and not valid.get(entry["parent"], False):
+                    entry["parent"] = None
+
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for entry in kept_entries:
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp, self.path)
+
+            dropped = self.snapshots - keep
+            files = [self._snapshot_path(sid) for sid in dropped]
+            files += [os.path.join(self.root, self.entries[e]["args"]["file"]) for e in self.entries
+                      if not valid[e] and "file" in self.entries[e].get("args", {})]
+            for path in files:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            removed = len(self.entries) - len(kept_entries)
+            self.entries = {e["id"]: e for e in kept_entries}
+            self.snapshots = keep & self.snapshots
+            return removed, len(dropped)
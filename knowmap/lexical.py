@@ -0,0 +1,224 @@
+"""BM25 lexical search over triples, and hybrid lexical -> dense ranking.
+
+A triple's text is its subject, relation and object. Because the
+TripleStore interns those strings, the inverted index is kept at the
+vocabulary level: each token maps to the entity and relation codes whose
+names contain it. Rows are found through code -> row lookups built from the
+store's code arrays (once per store version, vectorised), so the index
+follows renames, merges and deletes without re-tokenising anything, and
+only strings interned since the last refresh are tokenised.
+
+``hybrid_search`` takes the BM25 top candidates and re-ranks only those
+with dense (MiniLM) similarities; without an encoder it degrades to pure
+BM25, which keeps search usable on machines with no model cache.
+"""
+import math
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+from knowmap.graph_engine import _expand
+from knowmap.timing import timed
+from knowmap.vector_index import normalize, topk
+
+_TOKEN = re.compile(r"[0-9a-z]+")
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or the to was with".split())
+FUSIONS = ("linear", "rrf")
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+def _code_index(codes, n):
+    """``indptr, rows`` such that ``rows[indptr[c]:indptr[c + 1]]`` hold code ``c``."""
+    rows = np.argsort(codes, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=n), out=indptr[1:])
+    return indptr, rows
+
+
+class _Vocab:
+    """token -> (codes, term counts) for one Interner, extended incrementally."""
+
+    def __init__(self):
+        self.postings = {}  # token -> ([codes], [tf])
+        self.lengths = np.zeros(0, dtype=np.int32)
+
+    def sync(self, values):
+        start = len(self.lengths)
+        if start == len(values):
+            return
+        lengths = np.zeros(len(values) - start, dtype=np.int32)
+        for i, value in enumerate(values[start:]):
+            counts = Counter(tokenize(value))
+            lengths[i] = sum(counts.values())
+            for tok, tf in counts.items():
+                codes, tfs = self.postings.setdefault(tok, ([], []))
+                codes.append(start + i)
+                tfs.append(tf)
+        self.lengths = np.concatenate([self.lengths, lengths])
+
+    def lookup(self, token):
+        codes, tfs = self.postings.get(token, ((), ()))
+        return np.asarray(codes, dtype=np.int64), np.asarray(tfs, dtype=np.float64)
+
+
+class BM25Index:
+    """Okapi BM25 over live triples of a TripleStore; scores are by live position."""
+
+    def __init__(self, store, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.entities = _Vocab()
+        self.relations = _Vocab()
+        self.store = None
+        self._rows_version = None
+        self.refresh(store)
+
+    def refresh(self, store=None):
+        """Follow ``store`` (or the current one) after edits; only new strings are tokenised.
+
+        A different store object is adopted without re-tokenising when its
+        vocabularies extend the indexed ones (e.g. the editable copy a frozen
+        store is thawed into); otherwise the index is rebuilt.
+        """
+        store = store if store is not None else self.store
+        if self.store is not None and store is not self.store:
+            n_ent, n_rel = len(self.entities.lengths), len(self.relations.lengths)
+            if (store.entities.values[:n_ent] != self.store.entities.values[:n_ent]
+                    or store.relations.values[:n_rel] != self.store.relations.values[:n_rel]):
+                self.entities, self.relations = _Vocab(), _Vocab()
+        self.store = store
+        self.entities.sync(store.entities.values)
+        self.relations.sync(store.relations.values)
+        return self
+
+    def _rows(self):
+        if self._rows_version != self.store.version:
+            s, p, o = (np.asarray(a, dtype=np.int64) for a in self.store.codes())
+            n_ent, n_rel = len(self.entities.lengths), len(self.relations.lengths)
+            self._s, self._p, self._o = s, p, o
+            self._by_s = _code_index(s, n_ent)
+            self._by_o = _code_index(o, n_ent)
+            self._by_p = _code_index(p, n_rel)
+            self._doc_len = (self.entities.lengths[s] + self.relations.lengths[p]
+                             + self.entities.lengths[o]).astype(np.float64)
+            self._avg_len = float(self._doc_len.mean()) if len(s) else 1.0
+            self._rows_version = self.store.version
+        return self
+
+    def _term_rows(self, token):
+        """(rows, tf) for one token across subject, relation and object."""
+        rows, tfs = [], []
+        for vocab, (indptr, order) in ((self.entities, self._by_s), (self.relations, self._by_p),
+                                       (self.entities, self._by_o)):
+            codes, tf = vocab.lookup(token)
+            codes_ok = codes < len(indptr) - 1
+            codes, tf = codes[codes_ok], tf[codes_ok]
+            if not len(codes):
+                continue
+            pos, owner = _expand(indptr, codes)
+            rows.append(order[pos])
+            tfs.append(tf[np.searchsorted(codes, owner)])
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        rows, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        return rows, np.bincount(inverse, weights=np.concatenate(tfs))
+
+    @timed("lexical.score")
+    def scores(self, query):
+        """``(positions, scores)`` of every triple matching at least one query token."""
+        self.refresh()._rows()
+        n = len(self._s)
+        all_rows, all_scores = [], []
+        for token in set(tokenize(query)):
+            rows, tf = self._term_rows(token)
+            if not len(rows):
+                continue
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._doc_len[rows] / self._avg_len)
+            all_rows.append(rows)
+            all_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not all_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        rows, inverse = np.unique(np.concatenate(all_rows), return_inverse=True)
+        return rows, np.bincount(inverse, weights=np.concatenate(all_scores))
+
+    def search(self, query, k=10):
+        """Top-``k`` ``(positions, scores)`` by BM25."""
+        rows, scores = self.scores(query)
+        best = topk(scores, k)
+        return rows[best], scores[best]
+
+
+# -------------------------------
+# hybrid ranking
+# -------------------------------
+def _minmax(x):
+    if not len(x):
+        return x
+    lo, hi = float(x.min()), float(x.max())
+    return np.ones_like(x) if hi - lo < 1e-12 else (x - lo) / (hi - lo)
+
+
+@timed("lexical.hybrid")
+def hybrid_search(index, query, k=10, embeddings=None, query_vector=None, n_candidates=200,
+                  alpha=0.5, fusion="linear", rrf_k=60):
+    """BM25 candidates re-ranked with dense similarity; returns ``(positions, scores)``.
+
+    ``embeddings`` is the matrix aligned with store positions and
+    ``query_vector`` the encoded query; if either is missing the BM25 ranking
+    is returned. ``fusion="linear"`` mixes min-max normalised scores as
+    ``alpha * dense + (1 - alpha) * bm25``; ``"rrf"`` uses reciprocal rank
+    fusion of the two rankings.
+    """
+    if fusion not in FUSIONS:
+        raise ValueError(f"fusion must be one of {FUSIONS}")
+    cand, lex = index.search(query, n_candidates)
+    if embeddings is None or query_vector is None or not len(cand):
+        return cand[:k], lex[:k]
+    q = normalize(query_vector)[0]
+    dense = normalize(np.asarray(embeddings[np.sort(cand)]))[np.argsort(np.argsort(cand))] @ q
+    if fusion == "linear":
+        fused = alpha * _minmax(dense) + (1 - alpha) * _minmax(lex)
+    else:
+        lex_rank = np.arange(len(cand))  # cand is already in BM25 order
+        dense_rank = np.empty(len(cand), dtype=np.int64)
+        dense_rank[np.argsort(-dense, kind="stable")] = np.arange(len(cand))
+        fused = 1.0 / (rrf_k + 1 + lex_rank) + 1.0 / (rrf_k + 1 + dense_rank)
+    best = topk(fused, k)
+    return cand[best], fused[best]
+
+
+def compare_modes(queries, index, k=10, dense_index=None, embeddings=None, encode=None, **hybrid_params):
+    """Latency per mode and overlap@k of lexical/hybrid results with dense-only ranking.
+
+    ``dense_index`` is the current vector index (``search(q, k)``) and
+    ``encode`` maps a list of strings to vectors. Returns one row per query.
+    """
+    rows = []
+    for query in queries:
+        row = {"query": query}
+        t0 = time.perf_counter()
+        lex_ids, _ = index.search(query, k)
+        row["lexical_ms"] = round(1000 * (time.perf_counter() - t0), 3)
+        if encode is None or dense_index is None:
+            rows.append(row)
+            continue
+        t0 = time.perf_counter()
+        q = encode([query])
+        encode_ms = 1000 * (time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        dense_ids = dense_index.search(q, k)[0][0]
+        row["dense_ms"] = round(encode_ms + 1000 * (time.perf_counter() - t0), 3)
+        t0 = time.perf_counter()
+        hyb_ids, _ = hybrid_search(index, query, k, embeddings, q, **hybrid_params)
+        row["hybrid_ms"] = round(encode_ms + 1000 * (time.perf_counter() - t0), 3)
+        truth = set(dense_ids[dense_ids >= 0].tolist())
+        row["lexical_overlap"] = round(len(truth & set(lex_ids.tolist())) / max(1, len(truth)), 3)
+        row["hybrid_overlap"] = round(len(truth & set(hyb_ids.tolist())) / max(1, len(truth)), 3)
+        rows.append(row)
+    return rows
@@ -0,0 +1,287 @@
+"""Append-only, rotated JSONL logs with a sparse time index.
+
+Used for the admin activity log and user feedback. Writers only ever append
+one line per entry (no read-modify-write), segments rotate by size or age,
+and a small ``.idx`` file per segment records the timestamp and byte offset
+of every ``index_every``-th entry so the dashboard can page the latest N
+entries or a time range by seeking instead of parsing whole files.
+"""
+import bisect
+import datetime
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+_LOCKS = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+def _lock_for(path):
+    with _LOCKS_GUARD:
+        return _LOCKS.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def _iso(ts_ns):
+    return datetime.datetime.utcfromtimestamp(ts_ns / 1e9).isoformat() + "Z"
+
+
+def to_ns(when):
+    """ISO string / datetime / epoch seconds -> epoch nanoseconds."""
+    if isinstance(when, (int, float)):
+        return int(when * 1e9)
+    if isinstance(when, str):
+        when = datetime.datetime.fromisoformat(when.rstrip("Z"))
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return int(when.timestamp() * 1e9)
+
+
+class SegmentLog:
+    """Rotating append-only JSONL log ``<root>/<name>.<start_ns>.jsonl``."""
+
+    def __init__(self, root="logs", name="activity", max_bytes=1 << 20, max_age_s=86400,
+                 index_every=64, max_segments=None):
+        self.root = root
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.index_every = index_every
+        self.max_segments = max_segments
+        self._lock = _lock_for(os.path.join(root, name))
+        self._counts = {}  # segment -> entries written (drives index density)
+        os.makedirs(root, exist_ok=True)
+
+    # -------------------------------
+    # segments
+    # -------------------------------
+    def segments(self):
+        """Segment start times (ns), oldest first."""
+        prefix, starts = self.name + ".", []
+        for fname in os.listdir(self.root):
+            if fname.startswith(prefix) and fname.endswith(".jsonl"):
+                stamp = fname[len(prefix):-len(".jsonl")]
+                if stamp.isdigit():
+                    starts.append(int(stamp))
+        return sorted(starts)
+
+    def _path(self, start, ext="jsonl"):
+        return os.path.join(self.root, f"{self.name}.{start:020d}.{ext}")
+
+    def _index(self, start):
+        """[(ts_ns, offset), ...] for one segment."""
+        points = []
+        try:
+            with open(self._path(start, "idx"), "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2:
+                        points.append((int(parts[0]), int(parts[1])))
+        except FileNotFoundError:
+            pass
+        return points
+
+    def _current_segment(self, now_ns):
+        starts = self.segments()
+        if starts:
+            start = starts[-1]
+            size = os.path.getsize(self._path(start))
+            if size < self.max_bytes and (now_ns - start) / 1e9 < self.max_age_s:
+                return start, size
+        start = max(now_ns, starts[-1] + 1) if starts else now_ns
+        open(self._path(start), "a").close()
+        if self.max_segments:
+            for old in self.segments()[:-self.max_segments]:
+                for ext in ("jsonl", "idx"):
+                    try:
+                        os.remove(self._path(old, ext))
+                    except FileNotFoundError:
+                        pass
+        return start, 0
+
+    # -------------------------------
+    # writing
+    # -------------------------------
+    def append(self, entry):
+        """Append one entry (a dict); adds ``ts`` if missing. Returns the entry.
+
+        An entry that already has a ``ts`` (e.g. an imported legacy one) is
+        placed in a segment and the time index by that timestamp.
+        """
+        now_ns = time.time_ns()
+        entry = dict(entry)
+        if "ts" in entry:
+            try:
+                now_ns = to_ns(entry["ts"])
+            except (TypeError, ValueError):
+                pass
+        else:
+            entry["ts"] = _iso(now_ns)
+        data = (json.dumps(entry) + "\n").encode("utf-8")
+        with self._lock:
+            start, offset = self._current_segment(now_ns)
+            fd = os.open(self._path(start), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)  # single write of a whole line
+            finally:
+                os.close(fd)
+            count = self._count_hint(start)
+            if count % self.index_every == 0:
+                with open(self._path(start, "idx"), "a") as f:
+                    f.write(f"{now_ns} {offset}\n")
+            self._counts[start] = count + 1
+        return entry
+
+    def _count_hint(self, start):
+        # entries written to this segment; recovered from the index after a restart
+        counts = self._counts
+        if start not in counts:
+            if os.path.getsize(self._path(start)) == 0:
+                counts[start] = 0
+            else:
+                with open(self._path(start), "rb") as f:
+                    counts[start] = sum(1 for _ in f) - 1  # the line just written
+        return counts[start]
+
+    def import_entries(self, entries):
+        """Bulk-append (e.g. a one-shot migration from a legacy JSON log)."""
+        for entry in entries:
+            self.append(entry)
+
+    # -------------------------------
+    # reading
+    # -------------------------------
+    def _read_block(self, start, begin, end=None):
+        with open(self._path(start), "rb") as f:
+            f.seek(begin)
+            data = f.read() if end is None else f.read(end - begin)
+        out = []
+        for line in data.splitlines():
+            try:
+                out.append(json.loads(line))
+            except ValueError:
+                continue
+        return out
+
+    def tail(self, n=50, skip=0):
+        """Latest ``n`` entries (newest first), after skipping the newest ``skip``."""
+        want = n + skip
+        out = []
+        for start in reversed(self.segments()):
+            offsets = [off for _, off in self._index(start)] or [0]
+            bounds = offsets + [None]
+            for i in range(len(offsets) - 1, -1, -1):
+                block = self._read_block(start, bounds[i], bounds[i + 1])
+                out.extend(reversed(block))
+                if len(out) >= want:
+                    return out[skip:want]
+        return out[skip:want]
+
+    def between(self, since=None, until=None):
+        """Entries with ``since <= ts <= until`` (oldest first); bounds are ISO/datetime/epoch."""
+        lo = to_ns(since) if since is not None else None
+        hi = to_ns(until) if until is not None else None
+        starts = self.segments()
+        out = []
+        for i, start in enumerate(starts):
+            seg_end = starts[i + 1] if i + 1 < len(starts) else None
+            if hi is not None and start > hi:
+                break
+            if lo is not None and seg_end is not None and seg_end < lo:
+                continue
+            points = self._index(start)
+            begin = 0
+            if lo is not None and points:
+                j = bisect.bisect_right([ts for ts, _ in points], lo) - 1
+                begin = points[max(j, 0)][1]
+            for entry in self._read_block(start, begin):
+                ts = to_ns(entry["ts"]) if "ts" in entry else None
+                if ts is None:
+                    continue
+                if lo is not None and ts < lo:
+                    continue
+                if hi is not None and ts > hi:
+                    return out
+                out.append(entry)
+        return out
+
+    def __iter__(self):
+        for start in self.segments():
+            yield from self._read_block(start, 0)
+
+
+class FeedbackStats:
+    """Rating / graph-relevance distributions maintained incrementally.
+
+    The aggregate and a checkpoint (segment, byte offset) are saved to
+    ``<root>/<name>.stats.json``; ``refresh()`` only parses entries appended
+    after the checkpoint.
+    """
+
+    FIELDS = ("rating", "graph_relevance")
+
+    def __init__(self, log):
+        self.log = log
+        self.path = os.path.join(log.root, f"{log.name}.stats.json")
+        self.count = 0
+        self.dists = {f: Counter() for f in self.FIELDS}
+        self.checkpoint = (0, 0)
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    saved = json.load(f)
+                self.count = saved["count"]
+                self.dists = {f: Counter({int(k): v for k, v in saved["dists"].get(f, {}).items()})
+                              for f in self.FIELDS}
+                self.checkpoint = tuple(saved["checkpoint"])
+            except (ValueError, KeyError):
+                pass
+
+    def add(self, entry):
+        self.count += 1
+        for f in self.FIELDS:
+            try:
+                self.dists[f][int(entry[f])] += 1
+            except (KeyError, TypeError, ValueError):
+                continue  # missing, None or non-numeric rating
+
+    def refresh(self):
+        """Fold in entries appended since the last checkpoint; returns self."""
+        seg, offset = self.checkpoint
+        changed = False
+        for start in self.log.segments():
+            if start < seg:
+                continue
+            begin = offset if start == seg else 0
+            path = self.log._path(start)
+            size = os.path.getsize(path)
+            if size > begin:
+                with open(path, "rb") as f:
+                    f.seek(begin)
+                    data = f.read(size - begin)
+                end = data.rfind(b"\n") + 1  # ignore a line still being written
+                for line in data[:end].splitlines():
+                    try:
+                        self.add(json.loads(line))
+                    except ValueError:
+                        continue
+                self.checkpoint = (start, begin + end)
+                changed = True
+            else:
+                self.checkpoint = (start, begin)
+        if changed:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"count": self.count, "checkpoint": list(self.checkpoint),
+                           "dists": {k: dict(v) for k, v in self.dists.items()}}, f)
+            os.replace(tmp, self.path)
+        return self
+
+    def mean(self, field):
+        dist = self.dists[field]
+        total = sum(dist.values())
+        return sum(k * v for k, v in dist.items()) / total if total else 0.0
+
+    def distribution(self, field, scale=range(1, 6)):
+        return {k: self.dists[field].get(k, 0) for k in scale}
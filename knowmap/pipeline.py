@@ -0,0 +1,327 @@
+"""Headless batch pipeline: ingest -> extract -> embed -> graph -> artifacts.
+
+Runs the same steps as the Streamlit tabs without a browser, so large
+corpora can be rebuilt offline (e.g. nightly from cron) and the app only
+serves the result::
+
+    python -m knowmap.pipeline data/*.csv docs/*.txt --out artifacts --workers 8
+
+CSV/TSV inputs are parsed and ``.txt`` documents are run through spaCy in a
+process pool, one file per task. With ``--link-domains K`` entities of
+different ``domain`` values are joined by up to K ``similar_to`` links each
+(``knowmap.crossdomain``) before embedding. Embeddings reuse the app's incremental
+``EmbeddingStore`` cache (only new triples are encoded), and the vector index
+and the layout of the top nodes are built concurrently. Every run writes a
+new directory ``<out>/<version>/``; ``<out>/LATEST`` names the newest
+complete one and is only switched once all files are written.
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from knowmap.triple_store import TripleStore
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+TEXT_SUFFIXES = (".txt", ".md")
+LATEST_FILE = "LATEST"
+
+
+# -------------------------------
+# stages (workers run in child processes)
+# -------------------------------
+def ingest_file(path, chunksize=100_000):
+    """Triples and entity domains of one CSV/TSV file, via the app's chunked loader."""
+    from knowmap.crossdomain import EntityDomains
+    from knowmap.ingest import iter_triple_chunks, sniff_format
+
+    store, domains = TripleStore(), EntityDomains()
+    with open(path, "rb") as f:
+        fmt = sniff_format(f)
+        for chunk in iter_triple_chunks(f, chunksize, fmt=fmt, domains=domains):
+            store.extend(chunk)
+    return store, domains
+
+
+def extract_file(path, batch_size=64):
+    """Triples extracted from one text file (paragraph documents, batched spaCy); no domains."""
+    from knowmap.extraction import iter_documents, iter_extract, load_nlp
+
+    store = TripleStore()
+    with open(path, "rb") as f:
+        for _, found in iter_extract(iter_documents(f), batch_size=batch_size, nlp=load_nlp()):
+            store.extend(found)
+    return store, None
+
+
+def collect_triples(paths, workers=1, batch_size=64, log=print):
+    """Ingest/extract every input in a process pool; returns ``(store, entity_domains)``."""
+    from knowmap.crossdomain import EntityDomains
+
+    store, domains = TripleStore(), EntityDomains()
+    tasks = [(extract_file, p, batch_size) if p.lower().endswith(TEXT_SUFFIXES) else (ingest_file, p)
+             for p in paths]
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [(args[1], pool.submit(*args)) for args in tasks]
+        for path, future in futures:
+            part, part_domains = future.result()
+            store.extend(part)
+            if part_domains is not None:
+                domains.update(part_domains)
+            log(f"  {path}: {len(part):,} triples")
+    return store, domains
+
+
+def link_cross_domain(store, domains, model_name=DEFAULT_MODEL, k=3, threshold=0.75, workers=None,
+                      log=print):
+    """Append ``similar_to`` triples between entities of different domains; returns the links."""
+    from sentence_transformers import SentenceTransformer
+
+    from knowmap.crossdomain import link_domains, link_triples
+
+    model = SentenceTransformer(model_name)
+    encode = lambda names: model.encode(names, batch_size=256, convert_to_numpy=True)
+    stats = {}
+    links = link_domains(domains.restrict(store.entities.values), encode, k=k, threshold=threshold,
+                         workers=workers, stats=stats)
+    store.extend(link_triples(links))
+    log(f"      {stats['links']:,} links between {stats['domains']} domains "
+        f"(encode {stats['encode_s']}s, search {stats['search_s']}s)")
+    return links
+
+
+def embed(store, cache_dir="kg_embeddings", model_name=DEFAULT_MODEL, workers=1, batch_size=1024):
+    """Embeddings aligned with ``store``; only triples missing from the cache are encoded."""
+    from sentence_transformers import SentenceTransformer
+
+    from knowmap.embedding_store import EmbeddingStore
+
+    model = SentenceTransformer(model_name)
+    cache = EmbeddingStore(os.path.join(cache_dir, model_name),
+                           dim=model.get_sentence_embedding_dimension())
+    pool = None
+    if workers > 1:
+        pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+        encode = lambda sents: model.encode_multi_process(sents, pool)
+    else:
+        encode = lambda sents: model.encode(sents, convert_to_numpy=True)
+    try:
+        return cache.sync(store, encode, batch_size=batch_size)
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+
+def build_vector_index(vectors, kind="auto"):
+    from knowmap.vector_index import build_index
+
+    if kind == "auto":
+        kind = "ivf" if len(vectors) >= 50_000 else "exact"
+    return build_index(vectors, kind, **({"n_probe": 16} if kind == "ivf" else {}))
+
+
+def build_layout(store, layout_nodes=3000):
+    """Graph metrics plus a normalised layout of the ``layout_nodes`` highest-degree nodes."""
+    from knowmap.graph import KnowledgeGraph
+    from knowmap.render import layout_for, top_nodes
+
+    kg = KnowledgeGraph(store)
+    view = kg.G.subgraph(top_nodes(kg.G, layout_nodes))
+    metrics = {"nodes": kg.n_nodes, "edges": kg.n_edges, "avg_degree": kg.avg_degree,
+               "max_degree": kg.max_degree, "top_relations": kg.top_relations(10)}
+    return metrics, layout_for(view, normalized=True)
+
+
+# -------------------------------
+# artifacts
+# -------------------------------
+def new_version():
+    return datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def write_artifacts(out, store, vectors, index, layout, manifest, domains=None):
+    """Write one version directory atomically and point ``LATEST`` at it."""
+    from knowmap.snapshot import write_snapshot
+    from knowmap.vector_index import save_index
+
+    version = manifest["version"]
+    tmp = os.path.join(out, version + ".tmp")
+    os.makedirs(tmp, exist_ok=True)
+    write_snapshot(store, os.path.join(tmp, "triples.kmap"))
+    if vectors is not None:
+        np.save(os.path.join(tmp, "embeddings.npy"), np.asarray(vectors, dtype=np.float32))
+        save_index(index, os.path.join(tmp, "index.npz"))
+    with open(os.path.join(tmp, "layout.json"), "w", encoding="utf-8") as f:
+        json.dump({"nodes": list(layout), "positions": [list(xy) for xy in layout.values()]}, f)
+    if domains:
+        with open(os.path.join(tmp, "domains.json"), "w", encoding="utf-8") as f:
+            json.dump(domains.to_dict(), f)
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(out, version))
+
+    latest_tmp = os.path.join(out, LATEST_FILE + ".tmp")
+    with open(latest_tmp, "w") as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(out, LATEST_FILE))
+    return os.path.join(out, version)
+
+
+def prune_versions(out, keep=5):
+    """Delete all but the newest ``keep`` complete versions."""
+    versions = sorted(d for d in os.listdir(out)
+                      if os.path.isfile(os.path.join(out, d, "manifest.json")))
+    for old in versions[:-keep] if keep else []:
+        shutil.rmtree(os.path.join(out, old), ignore_errors=True)
+
+
+class Artifacts:
+    """One pipeline output loaded for serving (triples frozen, embeddings memory-mapped)."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest["version"]
+
+        from knowmap.snapshot import read_snapshot
+
+        self.store = read_snapshot(os.path.join(path, "triples.kmap"))  # memory-mapped
+
+        self.embeddings, self.index = None, None
+        emb_path = os.path.join(path, "embeddings.npy")
+        if os.path.exists(emb_path):
+            from knowmap.vector_index import load_index
+
+            self.embeddings = np.load(emb_path, mmap_mode="r")
+            self.index = load_index(os.path.join(path, "index.npz"), self.embeddings)
+
+        with open(os.path.join(path, "layout.json"), "r", encoding="utf-8") as f:
+            layout = json.load(f)
+        self.layout = {n: tuple(xy) for n, xy in zip(layout["nodes"], layout["positions"])}
+
+        from knowmap.crossdomain import EntityDomains
+
+        self.domains = EntityDomains()
+        domains_path = os.path.join(path, "domains.json")
+        if os.path.exists(domains_path):
+            with open(domains_path, "r", encoding="utf-8") as f:
+                self.domains = EntityDomains.from_dict(json.load(f))
+
+    def serves(self, store):
+        """True if ``store`` is this artifact's triple set, unedited."""
+        return store is self.store
+
+
+def load_latest(out="artifacts"):
+    """The newest complete artifact set under ``out``, or None."""
+    try:
+        with open(os.path.join(out, LATEST_FILE), "r") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(out, version)
+    return Artifacts(path) if os.path.exists(os.path.join(path, "manifest.json")) else None
+
+
+# -------------------------------
+# driver
+# -------------------------------
+def run(inputs, out="artifacts", workers=1, batch_size=64, embed_cache="kg_embeddings",
+        model_name=DEFAULT_MODEL, index_kind="auto", layout_nodes=3000, dedup=True,
+        skip_embeddings=False, keep=5, link_k=0, link_threshold=0.75, log=print):
+    """Run every stage and write a new artifact version; returns its directory."""
+    timings = {}
+    t0 = time.perf_counter()
+    log(f"[1/4] ingest + extract ({len(inputs)} inputs, {workers} workers)")
+    store, domains = collect_triples(inputs, workers, batch_size, log)
+    if dedup:
+        store.dedup()
+        store.compact()
+    timings["ingest_extract_s"] = round(time.perf_counter() - t0, 3)
+    log(f"      {len(store):,} triples, {len(store.entities):,} entities, {len(domains.domains)} domains")
+
+    links = []
+    if link_k and domains:
+        t0 = time.perf_counter()
+        log(f"      cross-domain links (k={link_k}, threshold={link_threshold})")
+        links = link_cross_domain(store, domains, model_name, link_k, link_threshold, workers, log)
+        timings["cross_domain_s"] = round(time.perf_counter() - t0, 3)
+
+    vectors = None
+    if not skip_embeddings:
+        t0 = time.perf_counter()
+        log("[2/4] embed")
+        vectors = embed(store, embed_cache, model_name, workers)
+        timings["embed_s"] = round(time.perf_counter() - t0, 3)
+
+    t0 = time.perf_counter()
+    log("[3/4] index + graph layout")
+    with ThreadPoolExecutor(max_workers=2) as pool:  # NumPy releases the GIL in both
+        index_job = pool.submit(build_vector_index, vectors, index_kind) if vectors is not None else None
+        metrics, layout = pool.submit(build_layout, store, layout_nodes).result()
+        index = index_job.result() if index_job else None
+    timings["index_graph_s"] = round(time.perf_counter() - t0, 3)
+
+    log("[4/4] write artifacts")
+    manifest = {
+        "version": new_version(),
+        "created": datetime.datetime.utcnow().isoformat() + "Z",
+        "inputs": [{"path": p, "bytes": os.path.getsize(p)} for p in inputs],
+        "triples": len(store), "entities": len(store.entities), "relations": len(store.relations),
+        "model": None if skip_embeddings else model_name,
+        "index": index.kind if index is not None else None,
+        "layout_nodes": len(layout), "graph": metrics, "timings": timings,
+        "domains": domains.counts(), "cross_domain_links": len(links),
+    }
+    path = write_artifacts(out, store, vectors, index, layout, manifest, domains)
+    prune_versions(out, keep)
+    log(f"done: {path}")
+    return path
+
+
+def expand_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*")
+        paths.extend(sorted(p for p in glob.glob(pattern) if os.path.isfile(p)))
+    return list(dict.fromkeys(paths))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m knowmap.pipeline", description=__doc__.split("\n\n")[0])
+    parser.add_argument("inputs", nargs="+", help="CSV/TSV triple files, .txt documents, directories or globs")
+    parser.add_argument("--out", default="artifacts", help="artifact root (default: artifacts)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=64, help="spaCy batch size")
+    parser.add_argument("--embed-cache", default="kg_embeddings")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--index", default="auto", choices=["auto", "exact", "ivf"])
+    parser.add_argument("--layout-nodes", type=int, default=3000)
+    parser.add_argument("--no-dedup", action="store_true")
+    parser.add_argument("--no-embeddings", action="store_true")
+    parser.add_argument("--keep", type=int, default=5, help="artifact versions to keep")
+    parser.add_argument("--link-domains", type=int, default=0, metavar="K",
+                        help="add up to K similar_to links per entity to other domains (default: off)")
+    parser.add_argument("--link-threshold", type=float, default=0.75)
+    args = parser.parse_args(argv)
+
+    inputs = expand_inputs(args.inputs)
+    if not inputs:
+        parser.error("no input files matched")
+    run(inputs, args.out, args.workers, args.batch_size, args.embed_cache, args.model, args.index,
+        args.layout_nodes, not args.no_dedup, args.no_embeddings, args.keep, args.link_domains,
+        args.link_threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
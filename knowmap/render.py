@@ -0,0 +1,263 @@
+"""Scalable graph rendering for the Semantic Search tab.
+
+Instead of handing every node to pyvis and letting Barnes-Hut physics run in
+the browser, a view is rendered in three steps:
+
+1. pick the nodes to show (level of detail): the top-N nodes by importance,
+   aggregated communities, or the k-hop ego network around search hits;
+2. lay them out server-side with a vectorised force-directed layout, cached
+   per graph version, and disable physics in the client;
+3. build the HTML once per view and apply search highlights with a small
+   injected script, so a new query does not regenerate the page.
+"""
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+from knowmap.crossdomain import SIMILAR_TO
+from knowmap.timing import timed
+
+NODE_COLOR = "#7FB3FF"
+HIT_COLOR = "#FF6B6B"
+COMMUNITY_COLOR = "#9B8CFF"
+SIMILAR_COLOR = "#F4B400"
+
+VIS_OPTIONS = {
+    "nodes": {"borderWidth": 2, "shape": "dot", "font": {"size": 16}},
+    "edges": {
+        "font": {"size": 12, "background": "rgba(14,17,23,0.85)"},
+        "color": {"inherit": False, "opacity": 0.8},
+        "smooth": False,
+    },
+    "physics": {"enabled": False},
+    "interaction": {"hover": True, "tooltipDelay": 120, "zoomView": True, "dragView": True,
+                    "hideEdgesOnDrag": True},
+}
+
+
+class ViewCache:
+    """Small LRU cache for layouts and rendered HTML (kept per session)."""
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+
+    def get_or_build(self, key, build):
+        if key in self._data:
+            self._data.move_to_end(key)
+            return self._data[key]
+        value = self._data[key] = build()
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+        return value
+
+
+# -------------------------------
+# layout
+# -------------------------------
+@timed("render.layout")
+def force_layout(n, edges, iterations=None, seed=0, block=1024):
+    """Fruchterman-Reingold layout in NumPy; returns an ``(n, 2)`` array in [-1, 1].
+
+    ``edges`` is an ``(m, 2)`` int array of node indices. Repulsion is
+    computed in row blocks so memory stays at ``block * n`` pairs. By default
+    fewer iterations are run for larger graphs to bound the one-off cost.
+    """
+    if iterations is None:
+        iterations = max(20, min(60, 60000 // max(n, 1)))
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-1, 1, size=(n, 2))
+    if n <= 1:
+        return pos
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    k = np.sqrt(4.0 / n)
+    temp = 0.1
+    for _ in range(iterations):
+        disp = np.empty_like(pos)
+        sq = (pos ** 2).sum(1)
+        for start in range(0, n, block):
+            p = pos[start:start + block]
+            # sum_j w_ij (p_i - p_j) with w_ij = k^2 / |p_i - p_j|^2, as matrix products
+            dist2 = np.maximum(sq[start:start + block, None] + sq[None, :] - 2 * p @ pos.T, 1e-6)
+            w = (k * k) / dist2
+            w[np.arange(len(p)), np.arange(start, start + len(p))] = 0.0
+            disp[start:start + block] = p * w.sum(1, keepdims=True) - w @ pos
+        if len(edges):
+            delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+            dist = np.maximum(np.linalg.norm(delta, axis=1, keepdims=True), 1e-3)
+            pull = delta * dist / k
+            for axis in range(2):
+                disp[:, axis] -= np.bincount(edges[:, 0], pull[:, axis], minlength=n)
+                disp[:, axis] += np.bincount(edges[:, 1], pull[:, axis], minlength=n)
+        length = np.maximum(np.linalg.norm(disp, axis=1, keepdims=True), 1e-9)
+        pos += disp / length * np.minimum(length, temp)
+        temp *= 0.95
+    pos -= pos.mean(0)
+    return pos / max(np.abs(pos).max(), 1e-9)
+
+
+def layout_for(G, normalized=False):
+    """Positions for every node of ``G`` as ``{node: (x, y)}``.
+
+    Pixels by default; ``normalized=True`` returns the raw [-1, 1] layout,
+    which is what the batch pipeline stores (see ``layout_from``).
+    """
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+    pos = force_layout(len(nodes), edges)
+    scale = 1.0 if normalized else 120 * np.sqrt(max(len(nodes), 1))
+    return {node: (float(x * scale), float(y * scale)) for node, (x, y) in zip(nodes, pos)}
+
+
+def layout_from(normalized, nodes):
+    """Pixel positions for ``nodes`` taken from a precomputed normalised layout.
+
+    Returns None if any node is missing, so callers can fall back to
+    ``layout_for``.
+    """
+    nodes = list(nodes)
+    if not all(n in normalized for n in nodes):
+        return None
+    scale = 120 * np.sqrt(max(len(nodes), 1))
+    return {n: (normalized[n][0] * scale, normalized[n][1] * scale) for n in nodes}
+
+
+# -------------------------------
+# level of detail
+# -------------------------------
+def top_nodes(G, max_nodes, scores=None):
+    """The ``max_nodes`` most important nodes (degree unless ``scores`` is given)."""
+    import heapq
+
+    if G.number_of_nodes() <= max_nodes:
+        return list(G.nodes())
+    key = (lambda n: scores.get(n, 0.0)) if scores is not None else G.degree
+    return heapq.nlargest(max_nodes, G.nodes(), key=key)
+
+
+def ego_nodes(G, seeds, hops=1, max_nodes=None):
+    """Nodes within ``hops`` of any seed (breadth-first, seeds first)."""
+    seen = [s for s in dict.fromkeys(seeds) if s in G]
+    visited = set(seen)
+    frontier = list(seen)
+    for _ in range(hops):
+        nxt = []
+        for node in frontier:
+            for nbr in G.adj[node]:
+                if nbr not in visited:
+                    visited.add(nbr)
+                    seen.append(nbr)
+                    nxt.append(nbr)
+                    if max_nodes and len(seen) >= max_nodes:
+                        return seen
+        frontier = nxt
+    return seen
+
+
+def community_graph(G, max_nodes, communities=None):
+    """Collapse ``G`` into one node per community (largest ``max_nodes`` communities).
+
+    Node attributes: ``members`` (count) and ``label`` (highest-degree member);
+    edge attribute ``weight`` is the number of original edges between communities.
+    """
+    import networkx as nx
+
+    if communities is None:
+        communities = nx.community.label_propagation_communities(G)
+    communities = sorted((list(c) for c in communities), key=len, reverse=True)[:max_nodes]
+    member_of = {}
+    C = nx.Graph()
+    for i, members in enumerate(communities):
+        head = max(members, key=G.degree)
+        cid = f"community {i}"
+        C.add_node(cid, members=len(members), label=f"{head} (+{len(members) - 1})")
+        for m in members:
+            member_of[m] = cid
+    for u, v in G.edges():
+        cu, cv = member_of.get(u), member_of.get(v)
+        if cu and cv and cu != cv:
+            w = C.edges[cu, cv]["weight"] + 1 if C.has_edge(cu, cv) else 1
+            C.add_edge(cu, cv, weight=w, relation=f"{w} links")
+    return C
+
+
+def build_view(G, mode="top", max_nodes=500, seeds=(), hops=1, scores=None, communities=None):
+    """Graph to draw for a view ``mode``: "top", "communities" or "ego"."""
+    if mode == "communities":
+        return community_graph(G, max_nodes, communities)
+    if mode == "ego":
+        return G.subgraph(ego_nodes(G, seeds, hops, max_nodes))
+    return G.subgraph(top_nodes(G, max_nodes, scores))
+
+
+# -------------------------------
+# html
+# -------------------------------
+def edge_id(u, v):
+    return f"{u}\u0001{v}"
+
+
+@timed("render.html")
+def render_html(G, positions, sizes, show_labels=False, height="680px", colors=None):
+    """Static (physics-off) pyvis HTML for ``G`` with precomputed positions."""
+    from pyvis.network import Network
+
+    net = Network(height=height, width="100%", bgcolor="#0e1117", font_color="white")
+    for n, data in G.nodes(data=True):
+        x, y = positions[n]
+        label = data.get("label", n)
+        net.add_node(n, label=label, title=label, x=x, y=y, physics=False,
+                     color=(colors or {}).get(n, NODE_COLOR), size=sizes.get(n, 16))
+    for u, v, data in G.edges(data=True):
+        rel = data.get("relation", "")
+        edge_kwargs = dict(title=rel, id=edge_id(u, v))
+        if rel == SIMILAR_TO:  # inferred cross-domain link, not a dataset fact
+            edge_kwargs.update(dashes=True, color=SIMILAR_COLOR)
+        if show_labels:
+            edge_kwargs["label"] = rel
+        net.add_edge(u, v, **edge_kwargs)
+    net.set_options(json.dumps(VIS_OPTIONS))
+
+    if hasattr(net, "generate_html"):  # pyvis >= 0.3
+        return net.generate_html()
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".html")
+    tmp.close()
+    try:
+        net.write_html(tmp.name)
+        with open(tmp.name, "r", encoding="utf-8") as f:
+            return f.read()
+    finally:
+        os.unlink(tmp.name)
+
+
+def _script_json(value):
+    """``json.dumps`` safe to inline in ``<script>``: a node named ``</script>`` can't close the tag."""
+    return json.dumps(value).replace("</", "<\\/")
+
+
+def with_highlights(page, nodes, edges):
+    """Return ``page`` with a script colouring hit nodes and thickening hit edges.
+
+    ``edges`` holds ``(u, v)`` pairs; both directions are tried and ids absent
+    from the current view are ignored.
+    """
+    if not nodes and not edges:
+        return page
+    edge_ids = [edge_id(u, v) for u, v in edges] + [edge_id(v, u) for u, v in edges]
+    script = (
+        "<script>(function(){"
+        f"var hitNodes={_script_json(sorted(nodes))},hitEdges={_script_json(edge_ids)};"
+        "nodes.update(hitNodes.filter(function(id){return nodes.get(id);})"
+        f".map(function(id){{return {{id:id,color:{_script_json(HIT_COLOR)}}};}}));"
+        "edges.update(hitEdges.filter(function(id){return edges.get(id);})"
+        ".map(function(id){return {id:id,width:3};}));"
+        "})();</script>"
+    )
+    if "</body>" in page:
+        return page.replace("</body>", script + "</body>", 1)
+    return page + script
@@ -0,0 +1,280 @@
+"""Batch entity resolution: propose merges for near-duplicate nodes.
+
+Extracted graphs contain many spellings of one entity ("Einstein",
+"Albert Einstein", "A. Einstein"). Comparing every pair of names is O(N²), so
+candidates are generated by cheap blocking instead:
+
+* exact normalised keys (case, punctuation, accents, a leading "the");
+* name keys: the last token and initials + last token;
+* MinHash signatures of character 3-grams, bucketed with LSH bands.
+
+Only pairs sharing a block are scored, with a mix of string similarity
+(MinHash Jaccard estimate and token/initial overlap) and, when an encoder is
+given, the cosine similarity of entity embeddings. The ranked proposals can
+be accepted in bulk with ``KnowledgeGraph.merge_many``.
+"""
+import re
+import time
+import unicodedata
+
+import numpy as np
+
+_PRIME = (1 << 31) - 1
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(name):
+    """Lower-case, accent-free, punctuation-free form of an entity name."""
+    name = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii")
+    name = _NON_ALNUM.sub(" ", name.lower()).strip()
+    if name.startswith("the "):
+        name = name[4:]
+    return name
+
+
+def name_keys(tokens):
+    """Blocking keys for person/organisation style names."""
+    if len(tokens) < 2:
+        return [tokens[0]] if tokens and len(tokens[0]) > 2 else []
+    last = tokens[-1]
+    initials = "".join(t[0] for t in tokens[:-1])
+    return [last, f"{initials} {last}"] if len(last) > 2 else []
+
+
+def token_similarity(a, b):
+    """Share of the shorter name's tokens found in the longer one (initials match a prefix)."""
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return 0.0
+    remaining = list(b)
+    matched = 0
+    for tok in a:
+        hit = next((t for t in remaining if t == tok or (len(tok) == 1 and t.startswith(tok))), None)
+        if hit is not None:
+            remaining.remove(hit)
+            matched += 1
+    return matched / len(a)
+
+
+# -------------------------------
+# minhash / lsh
+# -------------------------------
+def shingle_hashes(names, n=3):
+    """Hashed character ``n``-grams of every name: ``(hashes, owner)`` arrays.
+
+    Names are padded with a space on each side; all names are encoded into
+    one code-point buffer so the rolling hash is a handful of array ops.
+    """
+    padded = [f" {x} " for x in names]
+    lengths = np.fromiter((len(x) for x in padded), dtype=np.int64, count=len(padded))
+    cps = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    starts = np.cumsum(lengths) - lengths
+    grams = np.maximum(lengths - n + 1, 0)
+    owner = np.repeat(np.arange(len(names)), grams)
+    pos = np.repeat(starts, grams) + (np.arange(grams.sum()) - np.repeat(np.cumsum(grams) - grams, grams))
+    h = np.zeros(len(pos), dtype=np.uint64)
+    for k in range(n):
+        h = (h * np.uint64(1000003) + cps[pos + k]) % np.uint64(_PRIME)
+    return h, owner
+
+
+def minhash_signatures(names, num_perm=64, seed=0):
+    """``(len(names), num_perm)`` uint32 MinHash signatures over character 3-grams."""
+    hashes, owner = shingle_hashes(names)
+    sig = np.full((len(names), num_perm), 0xFFFFFFFF, dtype=np.uint64)
+    if not len(hashes):
+        return sig.astype(np.uint32)
+    order = np.argsort(owner, kind="stable")
+    hashes, owner = hashes[order], owner[order]
+    firsts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+    rng = np.random.default_rng(seed)
+    # multiply-shift hashing: (a * x + b) mod 2**64, keep the high 32 bits
+    a = rng.integers(1, 1 << 63, num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+    shift = np.uint64(32)
+    for k in range(num_perm):
+        perm = (a[k] * hashes + b[k]) >> shift
+        sig[owner[firsts], k] = np.minimum.reduceat(perm, firsts)
+    return sig.astype(np.uint32)
+
+
+def _bucket_pairs(keys, max_block):
+    """All index pairs ``(i, j)``, ``i < j``, that share a key; oversized blocks are skipped."""
+    keys = np.asarray(keys)
+    if not len(keys):
+        return np.empty((0, 2), dtype=np.int64)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    bounds = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1], True])
+    sizes = np.diff(bounds)
+    out = []
+    triu = {}
+    for start, size in zip(bounds[:-1][sizes > 1].tolist(), sizes[sizes > 1].tolist()):
+        if size > max_block:
+            continue
+        if size not in triu:
+            triu[size] = np.triu_indices(size, 1)
+        ii, jj = triu[size]
+        block = order[start:start + size]
+        out.append(np.stack([block[ii], block[jj]], axis=1))
+    if not out:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.concatenate(out)
+    return np.sort(pairs, axis=1)
+
+
+def lsh_pairs(signatures, bands=16, max_block=50):
+    """Candidate pairs whose signatures agree on every row of at least one band."""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    out = []
+    for b in range(bands):
+        band = signatures[:, b * rows:(b + 1) * rows].astype(np.uint64)
+        key = np.zeros(n, dtype=np.uint64)
+        for col in range(rows):
+            key = key * np.uint64(0x9E3779B1) + band[:, col]  # wraps mod 2**64
+        out.append(_bucket_pairs(key, max_block))
+    return np.concatenate(out) if out else np.empty((0, 2), dtype=np.int64)
+
+
+def _unique_pairs(pairs, n):
+    if not len(pairs):
+        return pairs
+    codes = np.unique(pairs[:, 0].astype(np.int64) * n + pairs[:, 1])
+    return np.stack([codes // n, codes % n], axis=1)
+
+
+# -------------------------------
+# resolver
+# -------------------------------
+class EntityResolver:
+    """Blocking + scoring pipeline producing ranked merge proposals.
+
+    ``encode`` is an optional ``list[str] -> (n, d) array`` function (e.g. the
+    MiniLM ``SentenceTransformer.encode``); only entities that appear in a
+    candidate pair are encoded. The final score is
+    ``string_weight * string + (1 - string_weight) * embedding`` (string only
+    without an encoder).
+    """
+
+    def __init__(self, num_perm=64, bands=16, max_block=50, threshold=0.75,
+                 string_weight=0.5, encode=None, seed=0):
+        self.num_perm = num_perm
+        self.bands = bands
+        self.max_block = max_block
+        self.threshold = threshold
+        self.string_weight = string_weight
+        self.encode = encode
+        self.seed = seed
+        self.stats = {}
+
+    def candidates(self, names):
+        """Deduplicated candidate index pairs over ``names`` plus their MinHash signatures."""
+        norm = [normalize_name(x) for x in names]
+        tokens = [x.split() for x in norm]
+        key_owner, key_values = [], []
+        for i, toks in enumerate(tokens):
+            for key in ([norm[i]] if norm[i] else []) + name_keys(toks):
+                key_owner.append(i)
+                key_values.append(key)
+        blocks = []
+        if key_values:
+            by_key = _bucket_pairs(np.array(key_values, dtype=object), self.max_block)
+            owners = np.asarray(key_owner, dtype=np.int64)
+            blocks.append(np.sort(owners[by_key], axis=1))
+
+        t0 = time.perf_counter()
+        signatures = minhash_signatures(norm, self.num_perm, self.seed)
+        blocks.append(lsh_pairs(signatures, self.bands, self.max_block))
+        self.stats["minhash_s"] = round(time.perf_counter() - t0, 3)
+
+        pairs = _unique_pairs(np.concatenate(blocks), len(names))
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        return pairs, signatures, tokens
+
+    def score(self, pairs, signatures, tokens, names):
+        """``(string, embedding, total)`` score arrays for candidate ``pairs``."""
+        jaccard = np.empty(len(pairs))
+        for start in range(0, len(pairs), 1 << 16):
+            chunk = pairs[start:start + (1 << 16)]
+            jaccard[start:start + len(chunk)] = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(1)
+        overlap = np.fromiter((token_similarity(tokens[i], tokens[j]) for i, j in pairs.tolist()),
+                              dtype=float, count=len(pairs))
+        string = np.maximum(jaccard, 0.5 * (jaccard + overlap))
+
+        if self.encode is None or not len(pairs):
+            return string, np.full(len(pairs), np.nan), string
+        used = np.unique(pairs)
+        vectors = np.asarray(self.encode([names[i] for i in used.tolist()]), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        slot = np.full(len(names), -1, dtype=np.int64)
+        slot[used] = np.arange(len(used))
+        embedding = np.einsum("ij,ij->i", vectors[slot[pairs[:, 0]]], vectors[slot[pairs[:, 1]]])
+        total = self.string_weight * string + (1 - self.string_weight) * embedding
+        return string, embedding, total
+
+    def resolve(self, store, limit=None):
+        """Ranked merge proposals for the live entities of a TripleStore.
+
+        Each proposal is a dict with ``target`` (the more frequent name, longer
+        on ties), ``source``, ``score``, ``string`` and ``embedding``.
+        """
+        t_start = time.perf_counter()
+        s, _, o = store.codes()
+        counts = np.bincount(np.concatenate([s, o]), minlength=len(store.entities))
+        live = np.flatnonzero(counts)
+        names = [store.entities.values[i] for i in live.tolist()]
+
+        t0 = time.perf_counter()
+        pairs, signatures, tokens = self.candidates(names)
+        self.stats.update(entities=len(names), candidates=len(pairs),
+                          blocking_s=round(time.perf_counter() - t0, 3))
+
+        t0 = time.perf_counter()
+        string, embedding, total = self.score(pairs, signatures, tokens, names)
+        self.stats["scoring_s"] = round(time.perf_counter() - t0, 3)
+
+        keep = np.flatnonzero(total >= self.threshold)
+        keep = keep[np.argsort(-total[keep], kind="stable")]
+        if limit is not None:
+            keep = keep[:limit]
+        freq = counts[live]
+        proposals = []
+        for k in keep.tolist():
+            i, j = pairs[k].tolist()
+            if (freq[j], len(names[j])) > (freq[i], len(names[i])):
+                i, j = j, i
+            proposals.append({
+                "target": names[i], "source": names[j], "score": round(float(total[k]), 4),
+                "string": round(float(string[k]), 4),
+                "embedding": None if np.isnan(embedding[k]) else round(float(embedding[k]), 4),
+            })
+        self.stats.update(proposals=len(proposals), total_s=round(time.perf_counter() - t_start, 3))
+        return proposals
+
+
+def plan_merges(proposals):
+    """Turn accepted proposals into an ordered ``(target, source)`` list.
+
+    Proposals can chain or overlap ("A. Einstein" -> "Einstein" -> "Albert
+    Einstein"); a union-find keeps every cluster pointing at one surviving
+    name so each source is merged exactly once into a node that still exists.
+    """
+    parent = {}
+
+    def find(x):
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(x, x) != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    plan = []
+    for p in proposals:
+        target, source = find(p["target"]), find(p["source"])
+        if target != source:
+            parent[source] = target
+            plan.append((target, source))
+    return plan
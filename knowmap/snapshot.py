@@ -0,0 +1,199 @@
+"""Binary graph snapshots and streaming GraphML import/export.
+
+A snapshot (``.kmap``) is one file holding the TripleStore columns as they
+are in memory: the three int32 code arrays plus the entity and relation
+vocabularies as NUL-joined UTF-8 blobs. Layout::
+
+    b"KMAPSNAP" | uint64 header length | JSON header | arrays (64-byte aligned)
+
+The header lists each array's dtype, shape and offset, so ``read_snapshot``
+memory-maps the code arrays in place and decodes each vocabulary with one
+``split``; the entity lookup dict is only built when something is looked up
+or edited. Loading therefore does no per-triple work, unlike a GraphML or
+JSON round-trip.
+
+``iter_graphml_triples`` streams GraphML with ``iterparse`` in batches and
+discards parsed elements as it goes; ``write_graphml`` streams the store out
+without building a networkx graph or an XML tree.
+"""
+import io
+import json
+import os
+from xml.etree.ElementTree import iterparse
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+from knowmap.timing import timed
+from knowmap.triple_store import TripleStore
+
+MAGIC = b"KMAPSNAP"
+FORMAT_VERSION = 1
+SUFFIX = ".kmap"
+ALIGN = 64
+SEP = "\x00"
+
+
+def _vocab_blob(values):
+    joined = SEP.join(values)
+    if joined.count(SEP) != max(0, len(values) - 1):
+        raise ValueError("names containing NUL characters cannot be written to a snapshot")
+    return np.frombuffer(joined.encode("utf-8"), dtype=np.uint8)
+
+
+def _vocab_values(blob, count):
+    if not count:
+        return []
+    return bytes(blob).decode("utf-8").split(SEP)
+
+
+@timed("snapshot.write")
+def write_snapshot(store, dest):
+    """Write ``store`` (live triples only) to path or binary file ``dest``."""
+    s, p, o = store.codes()
+    arrays = {"s": np.ascontiguousarray(s), "p": np.ascontiguousarray(p), "o": np.ascontiguousarray(o),
+              "entities": _vocab_blob(store.entities.values),
+              "relations": _vocab_blob(store.relations.values)}
+    header = {"format": FORMAT_VERSION, "triples": len(s), "entities": len(store.entities),
+              "relations": len(store.relations), "arrays": {}}
+    offset = 0
+    for name, arr in arrays.items():
+        header["arrays"][name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += -(-arr.nbytes // ALIGN) * ALIGN
+    raw_header = json.dumps(header).encode("utf-8")
+    prefix = len(MAGIC) + 8 + len(raw_header)
+    data_start = -(-prefix // ALIGN) * ALIGN
+
+    def write(f):
+        f.write(MAGIC)
+        f.write(np.uint64(len(raw_header)).tobytes())
+        f.write(raw_header)
+        f.write(b"\0" * (data_start - prefix))
+        for arr in arrays.values():
+            f.write(arr.tobytes())
+            f.write(b"\0" * (-arr.nbytes % ALIGN))
+
+    if hasattr(dest, "write"):
+        write(dest)
+        return dest
+    tmp = dest + ".tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, dest)
+    return dest
+
+
+def _read_header(buf):
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError("not a KnowMap snapshot")
+    n = int(np.frombuffer(bytes(buf[len(MAGIC):len(MAGIC) + 8]), dtype=np.uint64)[0])
+    start = len(MAGIC) + 8
+    header = json.loads(bytes(buf[start:start + n]).decode("utf-8"))
+    if header.get("format", 0) > FORMAT_VERSION:
+        raise ValueError(f"snapshot format {header['format']} is newer than this version supports")
+    return header, -(-(start + n) // ALIGN) * ALIGN
+
+
+@timed("snapshot.read")
+def read_snapshot(src):
+    """Frozen TripleStore from a snapshot path (memory-mapped) or bytes/file object."""
+    if isinstance(src, (str, os.PathLike)):
+        buf = np.memmap(src, dtype=np.uint8, mode="r")
+    else:
+        raw = src if isinstance(src, (bytes, bytearray, memoryview)) else src.read()
+        buf = np.frombuffer(raw, dtype=np.uint8)
+    header, data_start = _read_header(buf)
+
+    def array(name):
+        spec = header["arrays"][name]
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        start = data_start + spec["offset"]
+        return buf[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+
+    entities = _vocab_values(array("entities"), header["entities"])
+    relations = _vocab_values(array("relations"), header["relations"])
+    store = TripleStore.from_codes(entities, relations, array("s"), array("p"), array("o"), copy=False)
+    return store.freeze()
+
+
+def is_snapshot(head):
+    """True if the leading bytes ``head`` belong to a snapshot."""
+    return bytes(head[:len(MAGIC)]) == MAGIC
+
+
+# -------------------------------
+# GraphML
+# -------------------------------
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+@timed("snapshot.graphml_parse")
+def iter_graphml_triples(fileobj, batch_size=50_000, relation_keys=("relation", "label")):
+    """Yield lists of ``(source, relation, target)`` from GraphML, ``batch_size`` edges at a time.
+
+    Edge relations are read from the ``<data>`` whose key is declared with
+    an ``attr.name`` in ``relation_keys`` (first match wins). Elements are
+    dropped as soon as they are consumed, so memory stays flat however many
+    edges the file has.
+    """
+    rel_keys = {}  # key id -> priority
+    batch, graph = [], None
+    for event, elem in iterparse(fileobj, events=("start", "end")):
+        tag = _local(elem.tag)
+        if event == "start":
+            if tag == "graph" and graph is None:
+                graph = elem
+            continue
+        if tag == "key":
+            name = elem.get("attr.name") or elem.get("id")
+            if name in relation_keys and elem.get("for", "edge") in ("edge", "all"):
+                rel_keys[elem.get("id")] = relation_keys.index(name)
+        elif tag == "edge":
+            rel, best = "", len(relation_keys)
+            for data in elem:
+                rank = rel_keys.get(data.get("key"))
+                if rank is not None and rank < best:
+                    rel, best = data.text or "", rank
+            batch.append((elem.get("source"), rel, elem.get("target")))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        else:
+            continue
+        elem.clear()
+        if graph is not None:
+            del graph[:]  # consumed children would otherwise accumulate under <graph>
+    if batch:
+        yield batch
+
+
+@timed("snapshot.graphml_write")
+def write_graphml(store, dest, chunk=50_000):
+    """Stream ``store`` as directed GraphML (edge key ``relation``) to path or text/binary file."""
+    if not hasattr(dest, "write"):
+        with open(dest, "w", encoding="utf-8") as f:
+            return write_graphml(store, f, chunk)
+    out = io.TextIOWrapper(dest, encoding="utf-8", write_through=True) if not isinstance(dest, io.TextIOBase) else dest
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+              '<key id="d0" for="edge" attr.name="relation" attr.type="string"/>\n'
+              '<graph edgedefault="directed">\n')
+    s, p, o = store.codes()
+    ents, rels = store.entities.values, store.relations.values
+    used = np.zeros(len(ents), dtype=bool)
+    used[s] = True
+    used[o] = True
+    names = [quoteattr(ents[i]) for i in np.flatnonzero(used).tolist()]
+    for start in range(0, len(names), chunk):
+        out.write("".join(f"<node id={n}/>\n" for n in names[start:start + chunk]))
+    for start in range(0, len(s), chunk):
+        out.write("".join(
+            f"<edge source={quoteattr(ents[a])} target={quoteattr(ents[c])}><data key=\"d0\">{escape(rels[b])}</data></edge>\n"
+            for a, b, c in zip(s[start:start + chunk].tolist(), p[start:start + chunk].tolist(),
+                               o[start:start + chunk].tolist())))
+    out.write("</graph>\n</graphml>\n")
+    if out is not dest:
+        out.detach()
+    return dest
@@ -0,0 +1,109 @@
+"""Synthetic datasets for benchmarks and load tests.
+
+Entities are drawn from a Zipf-like distribution (``skew`` controls how
+heavy the hubs are), relations from a fixed vocabulary, and every triple is
+written in the 9-column schema the CSV sniffer recognises
+(``knowmap.ingest.NINE_COLUMNS``). ``generate_corpus`` produces simple
+subject-verb-object sentences over the same entities for the spaCy stage.
+"""
+import csv
+
+import numpy as np
+
+from knowmap.ingest import NINE_COLUMNS
+
+_SYLLABLES = ["al", "ber", "cor", "dan", "el", "fin", "gar", "hel", "is", "jor", "ka", "lum",
+              "mar", "nor", "os", "pra", "qui", "ros", "sil", "tor", "ur", "vel", "wen", "xan",
+              "yor", "zel"]
+RELATIONS = ["influences", "develops", "funds", "cites", "studies", "founded", "acquired",
+             "located_in", "part_of", "collaborates_with", "regulates", "produces", "teaches",
+             "inspired", "competes_with", "supplies", "employs", "discovered", "published",
+             "won"]
+VERBS = ["influences", "develops", "funds", "cites", "studies", "founded", "acquired",
+         "regulates", "produces", "teaches", "inspired", "supplies", "employs", "discovered"]
+DOMAINS = ["science", "business", "technology", "health", "policy", "culture"]
+COUNTRIES = ["IN", "US", "DE", "FR", "JP", "BR", "GB", "CN"]
+
+
+def entity_names(n):
+    """``n`` distinct, pronounceable two-part names ("Alber Corvel" style)."""
+    base = len(_SYLLABLES)
+    names = []
+    for i in range(n):
+        parts, x = [], i
+        for _ in range(4):
+            parts.append(_SYLLABLES[x % base])
+            x //= base
+        first = (parts[0] + parts[1]).capitalize()
+        last = (parts[2] + parts[3]).capitalize()
+        names.append(f"{first} {last}" + (f" {x}" if x else ""))
+    return names
+
+
+def relation_names(n):
+    return [RELATIONS[i] if i < len(RELATIONS) else f"relation_{i}" for i in range(n)]
+
+
+def zipf_weights(n, skew=1.0):
+    w = 1.0 / np.arange(1, n + 1) ** skew
+    return w / w.sum()
+
+
+def generate_codes(n_triples, n_entities=None, n_relations=20, skew=1.0, seed=0):
+    """``(s, p, o)`` int arrays; ``n_entities`` defaults to ``n_triples // 2``."""
+    rng = np.random.default_rng(seed)
+    n_entities = n_entities or max(2, n_triples // 2)
+    weights = zipf_weights(n_entities, skew)
+    perm = rng.permutation(n_entities)  # hubs are not simply the first names
+    s = perm[rng.choice(n_entities, n_triples, p=weights)]
+    o = perm[rng.choice(n_entities, n_triples, p=weights)]
+    clash = s == o
+    o[clash] = (o[clash] + 1) % n_entities
+    p = rng.choice(n_relations, n_triples, p=zipf_weights(n_relations, 0.5))
+    return s, p, o
+
+
+def generate_triples(n_triples, n_entities=None, n_relations=20, skew=1.0, seed=0):
+    """List of ``(subject, relation, object)`` string triples."""
+    s, p, o = generate_codes(n_triples, n_entities, n_relations, skew, seed)
+    ents = entity_names(int(max(s.max(), o.max())) + 1)
+    rels = relation_names(n_relations)
+    return [(ents[a], rels[b], ents[c]) for a, b, c in zip(s.tolist(), p.tolist(), o.tolist())]
+
+
+def write_csv(path, n_triples, n_entities=None, n_relations=20, skew=1.0, seed=0,
+              header=True, chunk=100_000):
+    """Write a 9-column CSV (``id, entity_1, relation, entity_2, domain, ...``)."""
+    rng = np.random.default_rng(seed + 1)
+    s, p, o = generate_codes(n_triples, n_entities, n_relations, skew, seed)
+    ents = entity_names(int(max(s.max(), o.max())) + 1)
+    rels = relation_names(n_relations)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if header:
+            writer.writerow(NINE_COLUMNS)
+        for start in range(0, n_triples, chunk):
+            stop = min(n_triples, start + chunk)
+            years = rng.integers(1950, 2020, stop - start)
+            domains = rng.integers(0, len(DOMAINS), stop - start)
+            countries = rng.integers(0, len(COUNTRIES), stop - start)
+            writer.writerows(
+                (i, ents[a], rels[b], ents[c], DOMAINS[d], COUNTRIES[k], y, y + 5, "synthetic")
+                for i, a, b, c, d, k, y in zip(range(start, stop), s[start:stop].tolist(),
+                                               p[start:stop].tolist(), o[start:stop].tolist(),
+                                               domains.tolist(), countries.tolist(), years.tolist())
+            )
+    return path
+
+
+def generate_corpus(n_docs, sentences_per_doc=5, n_entities=1000, skew=1.0, seed=0):
+    """``n_docs`` short documents of "<Entity> <verb> <Entity>." sentences."""
+    rng = np.random.default_rng(seed)
+    ents = entity_names(n_entities)
+    weights = zipf_weights(n_entities, skew)
+    total = n_docs * sentences_per_doc
+    s = rng.choice(n_entities, total, p=weights)
+    o = rng.choice(n_entities, total, p=weights)
+    v = rng.integers(0, len(VERBS), total)
+    sentences = [f"{ents[a]} {VERBS[b]} {ents[c]}." for a, b, c in zip(s.tolist(), v.tolist(), o.tolist())]
+    return [" ".join(sentences[i:i + sentences_per_doc]) for i in range(0, total, sentences_per_doc)]
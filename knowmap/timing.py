@@ -0,0 +1,264 @@
+"""Startup/rerun timing and hot-path instrumentation.
+
+Streamlit re-executes ``app.py`` on every interaction, so the first rerun of
+a process pays for imports and cached resources (cold start) and later
+reruns should only pay for the active view. ``RerunTimer`` records stage
+marks for one rerun and reports how many modules that rerun imported, which
+makes a heavy import sneaking back into the hot path easy to spot.
+
+``span(name)`` / ``@timed(name)`` wrap hot paths (CSV parse, ``spacy.load``,
+encoding, vector search, graph build, HTML generation). Durations go into
+fixed-bucket latency histograms, process-wide and for the session bound to
+the current thread, optionally with tracemalloc peaks. Instrumentation is
+off by default: a disabled span is a shared no-op object (well under a
+microsecond), so the calls can stay in the code permanently.
+"""
+import functools
+import json
+import math
+import sys
+import threading
+import time
+import tracemalloc
+
+PROCESS_START = time.perf_counter()  # first import of this module ~ process start
+_state = {"reruns": 0, "cold_ms": None}
+
+
+class RerunTimer:
+    """Wall-clock marks for one script run; create it at the top of ``app.py``."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.modules_at_start = len(sys.modules)
+        self.cold = _state["reruns"] == 0
+        _state["reruns"] += 1
+        self.marks = []
+        self._last = self.start
+
+    def mark(self, name):
+        """Record the time since the previous mark under ``name``."""
+        now = time.perf_counter()
+        self.marks.append((name, (now - self._last) * 1000))
+        self._last = now
+
+    @property
+    def total_ms(self):
+        return (self._last - self.start) * 1000
+
+    def cold_start_ms(self):
+        """Process start to the end of the first completed rerun (None until then).
+
+        If the first rerun is interrupted (e.g. a rerun request during load),
+        the next one to report counts as the cold start.
+        """
+        return _state["cold_ms"]
+
+    def report(self, view=None):
+        """One flat dict per rerun (suitable for a log line or a DataFrame row)."""
+        if _state["cold_ms"] is None:
+            _state["cold_ms"] = (self._last - PROCESS_START) * 1000
+        row = {"view": view, "cold": self.cold, "total_ms": round(self.total_ms, 2),
+               "new_modules": len(sys.modules) - self.modules_at_start}
+        row.update({f"{name}_ms": round(ms, 2) for name, ms in self.marks})
+        return row
+
+
+# -------------------------------
+# spans and latency histograms
+# -------------------------------
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, math.inf)
+_config = {"enabled": False, "memory": False}
+_local = threading.local()
+
+
+class Histogram:
+    """Latency histogram over ``BUCKETS_MS`` (upper bounds) plus sum/min/max."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.min_ms = math.inf
+        self.peak_bytes = 0
+
+    def observe(self, ms, peak_bytes=None):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.min_ms = min(self.min_ms, ms)
+        if peak_bytes:
+            self.peak_bytes = max(self.peak_bytes, peak_bytes)
+
+    def quantile(self, q):
+        """Bucket upper bound holding the ``q`` quantile (capped at the observed max)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, c in zip(BUCKETS_MS, self.counts):
+            seen += c
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def as_dict(self):
+        return {"count": self.count, "mean_ms": round(self.sum_ms / self.count, 3) if self.count else 0.0,
+                "min_ms": round(self.min_ms, 3) if self.count else 0.0, "p50_ms": round(self.quantile(0.5), 3),
+                "p95_ms": round(self.quantile(0.95), 3), "max_ms": round(self.max_ms, 3),
+                "peak_mb": round(self.peak_bytes / 2**20, 2) if self.peak_bytes else None,
+                "buckets": {("inf" if math.isinf(b) else str(b)): c for b, c in zip(BUCKETS_MS, self.counts)}}
+
+
+class Registry:
+    """Named histograms; one process-wide (``REGISTRY``) plus one per session."""
+
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, ms, peak_bytes=None):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(ms, peak_bytes)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+    def summary(self):
+        """``{span: stats}`` sorted by total time spent, largest first."""
+        with self._lock:
+            items = sorted(self.histograms.items(), key=lambda kv: -kv[1].sum_ms)
+            return {name: hist.as_dict() for name, hist in items}
+
+    def to_json(self):
+        return json.dumps({"buckets_ms": [str(b) for b in BUCKETS_MS], "spans": self.summary()}, indent=2)
+
+    def to_prometheus(self, prefix="knowmap"):
+        """Prometheus text exposition format (histogram in seconds, peak memory gauge)."""
+        metric = f"{prefix}_span_duration_seconds"
+        lines = [f"# HELP {metric} Duration of instrumented KnowMap spans.", f"# TYPE {metric} histogram"]
+        peaks = []
+        with self._lock:
+            for name, hist in sorted(self.histograms.items()):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                cumulative = 0
+                for bound, c in zip(BUCKETS_MS, hist.counts):
+                    cumulative += c
+                    le = "+Inf" if math.isinf(bound) else repr(bound / 1000)
+                    lines.append(f'{metric}_bucket{{span="{label}",le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{span="{label}"}} {hist.sum_ms / 1000}')
+                lines.append(f'{metric}_count{{span="{label}"}} {hist.count}')
+                if hist.peak_bytes:
+                    peaks.append(f'{prefix}_span_peak_bytes{{span="{label}"}} {hist.peak_bytes}')
+        if peaks:
+            lines += [f"# HELP {prefix}_span_peak_bytes Peak traced allocation inside a span.",
+                      f"# TYPE {prefix}_span_peak_bytes gauge"] + peaks
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def enable(enabled=True, memory=False):
+    """Turn instrumentation on/off for the process; ``memory`` also starts tracemalloc."""
+    _config["enabled"] = enabled
+    _config["memory"] = enabled and memory
+    if _config["memory"] and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not _config["memory"] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _config["enabled"]
+
+
+def memory_enabled():
+    return _config["memory"]
+
+
+def bind_session(registry):
+    """Also record this thread's spans into ``registry`` (call at the top of a rerun)."""
+    _local.session = registry
+
+
+def memory_top(limit=10):
+    """Largest allocation sites (``file:line``, MB) from a tracemalloc snapshot."""
+    if not tracemalloc.is_tracing():
+        return []
+    stats = tracemalloc.take_snapshot().statistics("lineno")[:limit]
+    return [{"site": str(s.traceback), "mb": round(s.size / 2**20, 3), "blocks": s.count} for s in stats]
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start", "child_peak", "base")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.child_peak = 0
+        if _config["memory"]:
+            stack = _local.__dict__.setdefault("stack", [])
+            stack.append(self)
+            self.base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.start) * 1000
+        peak = None
+        if _config["memory"] and getattr(self, "base", None) is not None:
+            # nested spans reset the shared peak counter, so children report theirs upwards
+            abs_peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            peak = max(0, abs_peak - self.base)
+            stack = _local.__dict__.get("stack", [])
+            if stack and stack[-1] is self:
+                stack.pop()
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, abs_peak)
+        REGISTRY.observe(self.name, ms, peak)
+        session = getattr(_local, "session", None)
+        if session is not None:
+            session.observe(self.name, ms, peak)
+        return False
+
+
+def span(name):
+    """Context manager timing a block as ``name`` (no-op while disabled)."""
+    return _Span(name) if _config["enabled"] else _NOOP
+
+
+def timed(name):
+    """Decorator form of ``span``."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _config["enabled"]:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,445 @@
+"""Compact, interned, columnar triple store.
+
+Entity and relation strings are interned once into dictionaries and the
+triples themselves are three int32 code arrays. Compared to a Python list of
+``(str, str, str)`` tuples this cuts memory by roughly an order of magnitude
+and lets pandas/NumPy consumers work on the codes directly.
+
+A ``TripleStore`` behaves like a read-only sequence of ``(s, p, o)`` tuples
+(``len``, iteration, positional indexing and slicing), so code written for
+the old list keeps working. Positions refer to live triples in insertion
+order; ``row_ids()`` maps them to stable internal ids used by ``delete``.
+"""
+import itertools
+
+import numpy as np
+
+CODE_DTYPE = np.int32
+
+# process-wide counter so a version identifies one state of one store
+_VERSIONS = itertools.count(1)
+
+
+class Interner:
+    """Bidirectional string <-> int code dictionary (append-only)."""
+
+    def __init__(self, values=()):
+        self.values = []
+        self._codes = {}
+        for v in values:
+            self.intern(v)
+
+    @classmethod
+    def from_values(cls, values):
+        """Interner over already-distinct ``values``; the reverse dict is built on first lookup."""
+        other = cls()
+        other.values = values if isinstance(values, list) else list(values)
+        other._codes = None
+        return other
+
+    @property
+    def codes(self):
+        if self._codes is None:
+            self._codes = {v: i for i, v in enumerate(self.values)}
+        return self._codes
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, value):
+        return value in self.codes
+
+    def intern(self, value):
+        codes = self._codes if self._codes is not None else self.codes
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def get(self, value, default=-1):
+        return self.codes.get(value, default)
+
+    def copy(self):
+        other = Interner()
+        other.values = list(self.values)
+        other._codes = dict(self.codes)
+        return other
+
+
+class ReadOnlyError(RuntimeError):
+    """Raised when mutating a frozen (shared) TripleStore."""
+
+
+class TripleStore:
+    """Interned columnar storage for (subject, relation, object) triples."""
+
+    def __init__(self, capacity=1024):
+        self.entities = Interner()
+        self.relations = Interner()
+        self._s = np.empty(capacity, dtype=CODE_DTYPE)
+        self._p = np.empty(capacity, dtype=CODE_DTYPE)
+        self._o = np.empty(capacity, dtype=CODE_DTYPE)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._n = 0          # rows used (live + deleted)
+        self._live = 0
+        self.version = next(_VERSIONS)  # changes on every mutation
+        self.frozen = False
+        self._rows_cache = (None, None)
+
+    @classmethod
+    def from_triples(cls, triples, dedup=False):
+        store = cls(capacity=max(1024, len(triples) if hasattr(triples, "__len__") else 1024))
+        store.extend(triples)
+        if dedup:
+            store.dedup()
+        return store
+
+    @classmethod
+    def from_codes(cls, entities, relations, s, p, o, copy=True):
+        """Store over existing (distinct) vocabularies and code arrays (no per-triple Python work).
+
+        With ``copy=False`` the code arrays are used as given (e.g. read-only
+        memmaps); freeze the store before sharing it.
+        """
+        store = cls(capacity=0)
+        store.entities = Interner.from_values(entities)
+        store.relations = Interner.from_values(relations)
+        as_codes = (lambda a: np.array(a, dtype=CODE_DTYPE)) if copy else (lambda a: np.asarray(a, dtype=CODE_DTYPE))
+        store._s, store._p, store._o = (as_codes(a) for a in (s, p, o))
+        store._alive = np.ones(len(store._s), dtype=bool)
+        store._n = store._live = len(store._s)
+        return store
+
+    # -------------------------------
+    # sequence protocol
+    # -------------------------------
+    def __len__(self):
+        return self._live
+
+    def __iter__(self):
+        ent, rel = self.entities.values, self.relations.values
+        rows = self.row_ids()
+        for s, p, o in zip(self._s[rows].tolist(), self._p[rows].tolist(), self._o[rows].tolist()):
+            yield ent[s], rel[p], ent[o]
+
+    def __getitem__(self, pos):
+        rows = self.row_ids()
+        if isinstance(pos, slice):
+            return [self.get(r) for r in rows[pos].tolist()]
+        return self.get(int(rows[pos]))
+
+    def __bool__(self):
+        return self._live > 0
+
+    def __repr__(self):
+        return (f"TripleStore({self._live} triples, {len(self.entities)} entities, "
+                f"{len(self.relations)} relations, version={self.version})")
+
+    def get(self, row):
+        """Triple stored at internal ``row`` id."""
+        if not self._alive[row]:
+            raise KeyError(row)
+        return (self.entities.values[self._s[row]], self.relations.values[self._p[row]],
+                self.entities.values[self._o[row]])
+
+    def row_ids(self):
+        """Internal ids of live triples in insertion order (cached per version)."""
+        version, rows = self._rows_cache
+        if version != self.version:
+            if self._live == self._n:
+                rows = np.arange(self._n)
+            else:
+                rows = np.flatnonzero(self._alive[:self._n])
+            self._rows_cache = (self.version, rows)
+        return rows
+
+    # -------------------------------
+    # columnar views
+    # -------------------------------
+    def codes(self):
+        """(s, p, o) int32 code arrays of live triples (views when nothing was deleted)."""
+        if self._live == self._n:
+            return self._s[:self._n], self._p[:self._n], self._o[:self._n]
+        rows = self.row_ids()
+        return self._s[rows], self._p[rows], self._o[rows]
+
+    def to_frame(self, columns=("Subject", "Relation", "Object")):
+        """DataFrame of live triples backed by categoricals over the interned strings."""
+        import pandas as pd
+
+        s, p, o = self.codes()
+        ent = pd.Index(self.entities.values, dtype=object)
+        rel = pd.Index(self.relations.values, dtype=object)
+        return pd.DataFrame({
+            columns[0]: pd.Categorical.from_codes(s, categories=ent, validate=False),
+            columns[1]: pd.Categorical.from_codes(p, categories=rel, validate=False),
+            columns[2]: pd.Categorical.from_codes(o, categories=ent, validate=False),
+        })
+
+    def sentences(self):
+        """Yield "s p o" sentences (the embedding input) for live triples."""
+        for s, p, o in self:
+            yield f"{s} {p} {o}"
+
+    # -------------------------------
+    # mutation
+    # -------------------------------
+    def _check_writable(self):
+        if self.frozen:
+            raise ReadOnlyError("TripleStore is frozen (shared); use thaw() for an editable copy")
+
+    def _reserve(self, extra):
+        need = self._n + extra
+        cap = max(len(self._s), 1)
+        if need <= cap:
+            return
+        while cap < need:
+            cap *= 2
+        for name in ("_s", "_p", "_o", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros(cap, dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def append(self, s, p, o):
+        """Add one triple in amortised O(1); returns its row id."""
+        self._check_writable()
+        self._reserve(1)
+        row = self._n
+        self._s[row] = self.entities.intern(str(s))
+        self._p[row] = self.relations.intern(str(p))
+        self._o[row] = self.entities.intern(str(o))
+        self._alive[row] = True
+        self._n += 1
+        self._live += 1
+        self.version = next(_VERSIONS)
+        return row
+
+    def extend(self, triples):
+        """Append many triples; returns the number added.
+
+        If ``triples`` raises part-way, the rows appended before the error
+        are kept (live and counted) and the error propagates.
+        """
+        self._check_writable()
+        if hasattr(triples, "__len__"):
+            self._reserve(len(triples))
+        ent, rel = self.entities.intern, self.relations.intern
+        start = self._n
+        try:
+            for s, p, o in triples:
+                if self._n >= len(self._s):
+                    self._reserve(1)
+                row = self._n
+                self._s[row] = ent(str(s))
+                self._p[row] = rel(str(p))
+                self._o[row] = ent(str(o))
+                self._n += 1
+        finally:
+            added = self._n - start
+            self._alive[start:self._n] = True
+            self._live += added
+            if added:
+                self.version = next(_VERSIONS)
+        return added
+
+    def delete(self, row):
+        """Delete the triple with internal id ``row`` in O(1)."""
+        self._check_writable()
+        if not self._alive[row]:
+            raise KeyError(row)
+        self._alive[row] = False
+        self._live -= 1
+        self.version = next(_VERSIONS)
+
+    def delete_where(self, mask):
+        """Delete every live triple whose position in ``mask`` is True; returns the count."""
+        self._check_writable()
+        rows = self.row_ids()[np.asarray(mask, dtype=bool)]
+        self._alive[rows] = False
+        self._live -= len(rows)
+        if len(rows):
+            self.version = next(_VERSIONS)
+        return len(rows)
+
+    def _entity_mask(self, code):
+        n = self._n
+        return self._alive[:n] & ((self._s[:n] == code) | (self._o[:n] == code))
+
+    def links(self, entity):
+        """``{other: relation}`` for the live triples touching ``entity``; later rows win, as in ``KnowledgeGraph``."""
+        code = self.entities.get(entity)
+        if code < 0:
+            return {}
+        rows = np.flatnonzero(self._entity_mask(code))
+        s, p, o = self._s[rows], self._p[rows], self._o[rows]
+        others = np.where(s == code, o, s)
+        names, rels = self.entities.values, self.relations.values
+        return {names[x]: rels[r] for x, r in zip(others.tolist(), p.tolist())}
+
+    def rename_entity(self, old, new):
+        """Point every triple using entity ``old`` at ``new`` (merging if it exists); returns the count."""
+        self._check_writable()
+        code = self.entities.get(old)
+        if code < 0 or old == new:
+            return 0
+        new_code = self.entities.intern(str(new))
+        n = self._n
+        alive = self._alive[:n]
+        in_s = alive & (self._s[:n] == code)
+        in_o = alive & (self._o[:n] == code)
+        self._s[:n][in_s] = new_code
+        self._o[:n][in_o] = new_code
+        changed = int((in_s | in_o).sum())
+        if changed:
+            self.version = next(_VERSIONS)
+        return changed
+
+    def delete_entity(self, name):
+        """Delete every triple with ``name`` as subject or object; returns the count."""
+        self._check_writable()
+        code = self.entities.get(name)
+        if code < 0:
+            return 0
+        mask = self._entity_mask(code)
+        count = int(mask.sum())
+        if count:
+            self._alive[:self._n][mask] = False
+            self._live -= count
+            self.version = next(_VERSIONS)
+        return count
+
+    def delete_links(self, entity, others):
+        """Delete triples between ``entity`` and any of ``others`` (either direction)."""
+        self._check_writable()
+        code = self.entities.get(entity)
+        other_codes = [c for c in (self.entities.get(x) for x in others) if c >= 0]
+        if code < 0 or not other_codes:
+            return 0
+        n = self._n
+        s, o = self._s[:n], self._o[:n]
+        mask = self._alive[:n] & (((s == code) & np.isin(o, other_codes)) |
+                                  ((o == code) & np.isin(s, other_codes)))
+        count = int(mask.sum())
+        if count:
+            self._alive[:n][mask] = False
+            self._live -= count
+            self.version = next(_VERSIONS)
+        return count
+
+    def merge_entities(self, merges):
+        """Apply many ``(target, source, dropped)`` merges in order, in one pass over the arrays.
+
+        Each merge is ``delete_links(source, dropped)`` followed by
+        ``rename_entity(source, target)``; only the rows touching a source
+        are inspected per merge and codes are rewritten once at the end.
+        Returns the number of triples deleted.
+        """
+        self._check_writable()
+        n = self._n
+        s, o, alive = self._s[:n], self._o[:n], self._alive[:n]
+        rep = np.arange(len(self.entities), dtype=np.int64)  # current name of every code
+        members = {}  # representative -> original codes renamed into it
+        rows_of = {}  # representative -> candidate rows touching it
+        order_s, order_o = np.argsort(s, kind="stable"), np.argsort(o, kind="stable")
+        s_sorted, o_sorted = s[order_s], o[order_o]
+
+        def rows_for(code):
+            if code not in rows_of:
+                a = order_s[np.searchsorted(s_sorted, code):np.searchsorted(s_sorted, code, "right")]
+                b = order_o[np.searchsorted(o_sorted, code):np.searchsorted(o_sorted, code, "right")]
+                rows_of[code] = np.concatenate([a, b])
+            return rows_of[code]
+
+        deleted = 0
+        for target, source, dropped in merges:
+            src, tgt = self.entities.get(source), self.entities.get(target)
+            if src < 0 or tgt < 0 or src == tgt:
+                continue
+            rows = rows_for(src)
+            rows = rows[alive[rows]]
+            cur_s, cur_o = rep[s[rows]], rep[o[rows]]
+            mine = (cur_s == src) | (cur_o == src)
+            rows, cur_s, cur_o = rows[mine], cur_s[mine], cur_o[mine]
+            drop_codes = [c for c in (self.entities.get(x) for x in dropped) if c >= 0]
+            other = np.where(cur_s == src, cur_o, cur_s)
+            kill = np.unique(rows[np.isin(other, drop_codes)])
+            if len(kill):
+                alive[kill] = False
+                deleted += len(kill)
+            renamed = members.pop(src, [src])
+            rep[renamed] = tgt
+            members.setdefault(tgt, [tgt]).extend(renamed)
+            rows_of[tgt] = np.concatenate([rows_for(tgt), rows])
+            rows_of.pop(src, None)
+        if members:
+            s[:] = rep[s]
+            o[:] = rep[o]
+            self._live -= deleted
+            self.version = next(_VERSIONS)
+        return deleted
+
+    def dedup(self):
+        """Drop repeated triples, keeping the first occurrence; returns the count removed."""
+        self._check_writable()
+        rows = self.row_ids()
+        if not len(rows):
+            return 0
+        keys = np.stack([self._s[rows], self._p[rows], self._o[rows]], axis=1)
+        _, first = np.unique(keys, axis=0, return_index=True)
+        keep = np.zeros(len(rows), dtype=bool)
+        keep[first] = True
+        return self.delete_where(~keep)
+
+    def compact(self):
+        """Drop deleted rows from the arrays (row ids change)."""
+        self._check_writable()
+        rows = self.row_ids()
+        for name in ("_s", "_p", "_o"):
+            setattr(self, name, getattr(self, name)[rows].copy())
+        self._alive = np.ones(len(rows), dtype=bool)
+        self._n = self._live = len(rows)
+        self.version = next(_VERSIONS)
+
+    # -------------------------------
+    # sharing
+    # -------------------------------
+    def freeze(self):
+        """Make the store read-only so one instance can be shared across sessions."""
+        for name in ("_s", "_p", "_o", "_alive"):
+            getattr(self, name).flags.writeable = False
+        self.frozen = True
+        return self
+
+    def thaw(self):
+        """Editable copy of this store (the shared original stays untouched)."""
+        other = TripleStore.__new__(TripleStore)
+        other.entities = self.entities.copy()
+        other.relations = self.relations.copy()
+        for name in ("_s", "_p", "_o", "_alive"):
+            setattr(other, name, getattr(self, name).copy())
+        other._n, other._live = self._n, self._live
+        other.version = next(_VERSIONS)
+        other.frozen = False
+        other._rows_cache = (None, None)
+        return other
+
+    def snapshot(self):
+        """Frozen copy of the current contents (same version), e.g. for a background job.
+
+        A store that is already frozen cannot change and is returned as is.
+        """
+        if self.frozen:
+            return self
+        other = self.thaw()
+        other.version = self.version
+        return other.freeze()
+
+    def nbytes(self):
+        """Approximate memory footprint of the code arrays and string dictionaries."""
+        import sys
+
+        arrays = sum(getattr(self, n).nbytes for n in ("_s", "_p", "_o", "_alive"))
+        strings = sum(sys.getsizeof(v) for v in self.entities.values + self.relations.values)
+        return arrays + strings + sys.getsizeof(self.entities.codes) + sys.getsizeof(self.relations.codes)
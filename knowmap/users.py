@@ -0,0 +1,201 @@
+"""SQLite-backed user repository.
+
+Replaces the whole-file ``users.json`` reads/rewrites: every registration or
+deletion is a single-row statement, concurrent sessions are serialised by
+SQLite (WAL mode, so readers never block the writer), and the admin list is
+paginated. Passwords are stored as salted PBKDF2-SHA256 hashes with a
+tunable iteration count.
+"""
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import queue
+import secrets
+import sqlite3
+import time
+from contextlib import contextmanager
+
+DEFAULT_ITERATIONS = 200_000
+HASH_SCHEME = "pbkdf2_sha256"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users(email);
+"""
+
+
+def hash_password(password, iterations=DEFAULT_ITERATIONS, salt=None):
+    """``pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>``."""
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{HASH_SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def verify_password(password, stored):
+    try:
+        scheme, iterations, salt, digest = stored.split("$")
+    except ValueError:
+        return False
+    if scheme != HASH_SCHEME:
+        return False
+    check = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(check.hex(), digest)
+
+
+def hash_iterations(stored):
+    try:
+        return int(stored.split("$")[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def benchmark_hashing(iteration_counts=(50_000, 100_000, 200_000, 400_000, 600_000), repeat=3):
+    """Median hashing latency (ms) per iteration count, to pick a login budget."""
+    rows = []
+    for n in iteration_counts:
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            hash_password("benchmark-password", n)
+            times.append((time.perf_counter() - t0) * 1000)
+        rows.append({"iterations": n, "ms": round(sorted(times)[len(times) // 2], 2)})
+    return rows
+
+
+def _like_pattern(search):
+    """``%search%`` with LIKE wildcards in ``search`` matched literally (use with ``ESCAPE '\\'``)."""
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _shred(path):
+    """Overwrite ``path`` with zeros, then delete it."""
+    with open(path, "r+b") as f:
+        f.write(b"\0" * os.path.getsize(path))
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(path)
+
+
+class UserRepository:
+    """Users table with pooled connections (safe to share across sessions)."""
+
+    def __init__(self, path="users.db", pool_size=4, iterations=DEFAULT_ITERATIONS):
+        self.path = path
+        self.iterations = iterations
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._pool.put(conn)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _conn(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    # -------------------------------
+    # single-row operations
+    # -------------------------------
+    def register(self, email, password):
+        """Insert a user; returns False if the email is already taken."""
+        pw_hash = hash_password(password, self.iterations)
+        created = datetime.datetime.utcnow().isoformat() + "Z"
+        try:
+            with self._conn() as conn:
+                conn.execute("INSERT INTO users (email, password_hash, created_at) VALUES (?, ?, ?)",
+                             (email, pw_hash, created))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def authenticate(self, email, password):
+        """Return "ok", "wrong_password" or "unknown"."""
+        with self._conn() as conn:
+            row = conn.execute("SELECT password_hash FROM users WHERE email = ?", (email,)).fetchone()
+        if row is None:
+            return "unknown"
+        if not verify_password(password, row[0]):
+            return "wrong_password"
+        if hash_iterations(row[0]) != self.iterations:  # cost changed: upgrade on login
+            with self._conn() as conn:
+                conn.execute("UPDATE users SET password_hash = ? WHERE email = ?",
+                             (hash_password(password, self.iterations), email))
+        return "ok"
+
+    def exists(self, email):
+        with self._conn() as conn:
+            return conn.execute("SELECT 1 FROM users WHERE email = ?", (email,)).fetchone() is not None
+
+    def delete(self, email):
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM users WHERE email = ?", (email,)).rowcount > 0
+
+    # -------------------------------
+    # listing
+    # -------------------------------
+    def count(self, search=None):
+        with self._conn() as conn:
+            if search:
+                return conn.execute("SELECT COUNT(*) FROM users WHERE email LIKE ? ESCAPE '\\'",
+                                    (_like_pattern(search),)).fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def list(self, offset=0, limit=25, search=None):
+        """One page of ``{"email", "created_at"}`` rows ordered by email."""
+        sql = "SELECT email, created_at FROM users"
+        params = []
+        if search:
+            sql += " WHERE email LIKE ? ESCAPE '\\'"
+            params.append(_like_pattern(search))
+        sql += " ORDER BY email LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._conn() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [{"email": e, "created_at": c} for e, c in rows]
+
+    # -------------------------------
+    # migration
+    # -------------------------------
+    def migrate_from_json(self, json_path="users.json"):
+        """One-shot import of the legacy ``{email: {"password": ...}}`` file.
+
+        Plain-text passwords are hashed on the way in; once the import has
+        committed the file is overwritten and deleted, so neither the
+        plain-text passwords nor a second import remain. Returns the count.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, "r") as f:
+            legacy = json.load(f)
+        created = datetime.datetime.utcnow().isoformat() + "Z"
+        rows = [(email, hash_password(str(info.get("password", "")), self.iterations), created)
+                for email, info in legacy.items()]
+        with self._conn() as conn:
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("INSERT OR IGNORE INTO users (email, password_hash, created_at) VALUES (?, ?, ?)",
+                                 rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")  # never hand a connection back to the pool mid-transaction
+                raise
+        _shred(json_path)
+        return len(rows)
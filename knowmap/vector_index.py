@@ -0,0 +1,350 @@
+"""Vector indexes for semantic search over triple embeddings.
+
+Two backends share the same ``search(queries, k) -> (ids, scores)`` API:
+
+* ``ExactIndex`` -- brute force on pre-normalised vectors with an
+  ``argpartition`` top-k (O(n) per query instead of a full argsort).
+* ``IVFIndex``   -- inverted-file index in pure NumPy: k-means coarse
+  quantiser, vectors regrouped by list, and only the ``n_probe`` closest
+  lists are scanned. ``n_lists`` / ``n_probe`` trade recall for latency.
+
+Both store vectors as ``QuantizedVectors`` in float32, float16 or int8
+(one scale per row), i.e. 1x / 2x / 4x less memory; scores are computed on
+the quantized data and the top candidates can optionally be re-ranked
+against the original float32 vectors (``rerank=``).
+
+Scores are cosine similarities (inner products of unit vectors).
+"""
+import time
+
+import numpy as np
+
+from knowmap.timing import timed
+
+
+def normalize(x):
+    """Row-normalise to unit length as float32 (zero rows stay zero)."""
+    x = np.asarray(x, dtype=np.float32)
+    if x.ndim == 1:
+        x = x[None, :]
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def topk(scores, k):
+    """Indices of the ``k`` largest scores along the last axis, best first."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < scores.shape[-1]:
+        part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(scores.shape[-1]), scores.shape).copy()
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+PRECISIONS = ("float32", "float16", "int8")
+
+
+class QuantizedVectors:
+    """Unit vectors stored as float32, float16 or int8 with one scale per row.
+
+    With ``order`` the stored rows are ``vectors[order]`` (e.g. grouped by
+    IVF list), gathered chunk by chunk.
+
+    int8 rows hold ``round(127 * x / max|x|)`` and keep ``max|x| / 127`` as
+    their scale. Scoring widens ``chunk`` rows at a time to float32 and uses
+    BLAS, so the temporary never exceeds ``chunk x dim`` floats (and stays in
+    cache). NumPy's float16 -> float32 conversion is slow, so int8 is usually
+    both the smallest and the fastest option.
+    """
+
+    def __init__(self, vectors, precision="float32", chunk=2048, order=None):
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {PRECISIONS}")
+        self.precision = precision
+        self.chunk = chunk
+        self.scales = None
+        n = len(vectors) if order is None else len(order)
+        dim = np.asarray(vectors[:1]).shape[-1]
+        self.data = np.empty((n, dim), dtype=precision)
+        if precision == "int8":
+            self.scales = np.empty(n, dtype=np.float32)
+        # never materialise the whole float32 matrix (or, with ``order``, a reordered copy of it)
+        for start in range(0, n, chunk):
+            if order is None:
+                x = normalize(vectors[start:start + chunk])
+            else:
+                rows = order[start:start + chunk]
+                sort = np.argsort(rows, kind="stable")  # ascending reads are friendlier to memmaps
+                x = np.empty((len(rows), dim), dtype=np.float32)
+                x[sort] = normalize(vectors[rows[sort]])
+            if precision != "int8":
+                self.data[start:start + len(x)] = x
+                continue
+            scale = np.abs(x).max(axis=1) / 127
+            scale[scale == 0] = 1.0
+            self.data[start:start + len(x)] = np.rint(x / scale[:, None])
+            self.scales[start:start + len(x)] = scale
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def scores(self, q, start=0, stop=None):
+        """``q @ rows[start:stop].T`` for unit queries ``q`` of shape ``(m, dim)``."""
+        stop = len(self.data) if stop is None else stop
+        if self.precision == "float32":
+            return q @ self.data[start:stop].T
+        out = np.empty((len(q), stop - start), dtype=np.float32)
+        for a in range(start, stop, self.chunk):
+            b = min(stop, a + self.chunk)
+            block = q @ self.data[a:b].astype(np.float32).T
+            if self.scales is not None:
+                block *= self.scales[a:b]
+            out[:, a - start:b - start] = block
+        return out
+
+
+def _rerank(source, q, candidates, k):
+    """Re-score ``candidates`` (``-1`` padded) of each query against float32 ``source`` rows."""
+    ids = np.full((len(q), k), -1, dtype=np.int64)
+    scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+    for qi, cand in enumerate(candidates):
+        cand = np.sort(cand[cand >= 0])  # ascending reads are friendlier to memmaps
+        if not len(cand):
+            continue
+        exact = normalize(source[cand]) @ q[qi]
+        best = topk(exact, k)
+        ids[qi, :len(best)] = cand[best]
+        scores[qi, :len(best)] = exact[best]
+    return ids, scores
+
+
+class ExactIndex:
+    """Exact cosine top-k over all vectors (exact up to the storage ``precision``).
+
+    With ``rerank=n`` the best ``n`` candidates from the quantized scores
+    are re-scored against ``vectors`` in float32; only those rows are read,
+    so a memory-mapped ``vectors`` stays on disk.
+    """
+
+    kind = "exact"
+
+    def __init__(self, vectors, precision="float32", rerank=0):
+        self.vectors = QuantizedVectors(vectors, precision)
+        self.precision = precision
+        self.rerank = rerank
+        self.source = vectors if rerank else None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes
+
+    @timed("vector.search_exact")
+    def search(self, queries, k=5):
+        q = normalize(queries)
+        scores = self.vectors.scores(q)
+        ids = topk(scores, max(k, self.rerank))
+        if self.rerank:
+            return _rerank(self.source, q, ids, k)
+        return ids, np.take_along_axis(scores, ids, axis=-1)
+
+
+def kmeans(x, n_clusters, n_iter=10, sample_size=None, seed=0, chunk=65536):
+    """Spherical k-means (Lloyd) on the (sampled, normalised) rows of ``x``; returns unit centroids."""
+    rng = np.random.default_rng(seed)
+    if sample_size and len(x) > sample_size:
+        x = x[rng.choice(len(x), sample_size, replace=False)]
+    x = normalize(x)
+    n_clusters = min(n_clusters, len(x))
+    centroids = x[rng.choice(len(x), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = assign_clusters(x, centroids, chunk)
+        counts = np.bincount(assign, minlength=n_clusters)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(x[order], starts[nonempty], axis=0)
+        empty = counts == 0
+        if empty.any():  # re-seed empty clusters with random points
+            sums[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_clusters(x, centroids, chunk=65536):
+    """Index of the closest centroid for every row of ``x`` (rows need not be normalised)."""
+    out = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), chunk):
+        out[start:start + chunk] = np.argmax(x[start:start + chunk] @ centroids.T, axis=1)
+    return out
+
+
+class IVFIndex:
+    """Approximate cosine top-k with an inverted-file (IVF) layout.
+
+    ``n_lists`` defaults to ~sqrt(n); ``n_probe`` can be changed after
+    build (``index.n_probe = 16``) to move along the recall/latency curve.
+    ``precision`` and ``rerank`` work as in ``ExactIndex``.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, vectors, n_lists=None, n_probe=8, n_iter=10, sample_size=None, seed=0,
+                 precision="float32", rerank=0):
+        n = len(vectors)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(n)))
+        if sample_size is None:
+            sample_size = max(256 * n_lists, 10000)
+        self.n_probe = n_probe
+        self.centroids = kmeans(vectors, n_lists, n_iter=n_iter, sample_size=sample_size, seed=seed)
+        self.n_lists = len(self.centroids)
+
+        assign = assign_clusters(vectors, self.centroids)  # argmax is unaffected by row norms
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=self.n_lists)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.ids = order                  # position in list layout -> original id
+        self.vectors = QuantizedVectors(vectors, precision, order=order)  # contiguous per list
+        self.precision = precision
+        self.rerank = rerank
+        self.source = vectors if rerank else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + self.centroids.nbytes + self.ids.nbytes
+
+    @timed("vector.search_ivf")
+    def search(self, queries, k=5, n_probe=None):
+        q = normalize(queries)
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        probes = topk(q @ self.centroids.T, n_probe)
+        final_k, k = k, max(k, self.rerank)
+
+        all_ids = np.full((len(q), k), -1, dtype=np.int64)
+        all_scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+        for qi in range(len(q)):
+            # lists are contiguous slices, so no gather copy of the vectors
+            spans = [(self.offsets[l], self.offsets[l + 1]) for l in probes[qi]]
+            spans = [(a, b) for a, b in spans if b > a]
+            if not spans:
+                continue
+            scores = np.concatenate([self.vectors.scores(q[qi:qi + 1], a, b)[0] for a, b in spans])
+            ids = np.concatenate([self.ids[a:b] for a, b in spans])
+            best = topk(scores, k)
+            all_ids[qi, :len(best)] = ids[best]
+            all_scores[qi, :len(best)] = scores[best]
+        if self.rerank:
+            return _rerank(self.source, q, all_ids, final_k)
+        return all_ids, all_scores
+
+
+BACKENDS = {"exact": ExactIndex, "ivf": IVFIndex}
+
+
+@timed("vector.build_index")
+def build_index(vectors, kind="exact", **params):
+    """Build a vector index of the given ``kind`` ("exact" or "ivf")."""
+    try:
+        cls = BACKENDS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown index kind {kind!r}; choose from {sorted(BACKENDS)}")
+    return cls(vectors, **params)
+
+
+def save_index(index, path):
+    """Write an index's structure to ``path`` (``.npz``); vectors are stored separately."""
+    if index.kind == "ivf":
+        np.savez(path, kind="ivf", centroids=index.centroids, offsets=index.offsets,
+                 ids=index.ids, n_probe=index.n_probe, precision=index.precision, rerank=index.rerank)
+    else:
+        np.savez(path, kind=index.kind, precision=index.precision, rerank=index.rerank)
+
+
+def load_index(path, vectors):
+    """Rebuild an index saved with ``save_index`` over the same ``vectors`` (no k-means rerun)."""
+    with np.load(path) as data:
+        kind = str(data["kind"])
+        precision = str(data["precision"])
+        rerank = int(data["rerank"])
+        if kind != "ivf":
+            return build_index(vectors, kind, precision=precision, rerank=rerank)
+        index = IVFIndex.__new__(IVFIndex)
+        index.centroids = data["centroids"]
+        index.offsets = data["offsets"]
+        index.ids = data["ids"]
+        index.n_probe = int(data["n_probe"])
+    index.n_lists = len(index.centroids)
+    index.vectors = QuantizedVectors(vectors, precision, order=index.ids)
+    index.precision = precision
+    index.rerank = rerank
+    index.source = vectors if rerank else None
+    return index
+
+
+def recall_report(vectors, queries, k=10, settings=None):
+    """Compare index settings against exact search.
+
+    ``settings`` is a list of dicts such as ``{"kind": "ivf", "n_lists": 1024,
+    "n_probe": 8}`` or ``{"kind": "exact", "precision": "int8", "rerank": 50}``.
+    Returns one row per setting with recall@k, build time, mean per-query
+    latency in milliseconds and the index memory in MB.
+    """
+    if settings is None:
+        settings = [{"kind": "ivf", "n_probe": p} for p in (1, 4, 8, 16, 32)]
+    exact = ExactIndex(vectors)
+    truth, _ = exact.search(queries, k)
+
+    rows = []
+    built = {}  # settings differing only in n_probe share one build
+    for cfg in [{"kind": "exact"}] + list(settings):
+        cfg = dict(cfg)
+        kind = cfg.pop("kind", "exact")
+        n_probe = cfg.pop("n_probe", None)
+        key = (kind, tuple(sorted(cfg.items())))
+        if key not in built:
+            t0 = time.perf_counter()
+            index = exact if kind == "exact" and not cfg else build_index(vectors, kind, **cfg)
+            built[key] = (index, time.perf_counter() - t0)
+        index, build_s = built[key]
+
+        t0 = time.perf_counter()
+        found = np.vstack([
+            index.search(q, k, n_probe=n_probe)[0] if n_probe else index.search(q, k)[0]
+            for q in np.atleast_2d(queries)
+        ])
+        query_ms = 1000 * (time.perf_counter() - t0) / max(1, len(found))
+
+        hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+        rows.append({
+            "kind": kind, **cfg, "n_probe": n_probe,
+            "recall_at_k": hits / max(1, truth.size),
+            "build_s": round(build_s, 4), "query_ms": round(query_ms, 4),
+            "memory_mb": round(index.nbytes / 2**20, 3),
+        })
+    return rows
+
+
+def quantization_report(vectors, queries, k=10, rerank=(0, 50), kinds=("exact",)):
+    """``recall_report`` over every precision x re-rank depth, plus memory saved vs float32."""
+    settings = [{"kind": kind, "precision": p, "rerank": r}
+                for kind in kinds for p in PRECISIONS for r in rerank if p != "float32" or not r]
+    rows = recall_report(vectors, queries, k, settings)[1:]  # drop the duplicate float32 baseline
+    baseline = {row["kind"]: row["memory_mb"] for row in rows if row["precision"] == "float32"}
+    for row in rows:
+        row["memory_saved"] = round(1 - row["memory_mb"] / baseline[row["kind"]], 3) if baseline.get(row["kind"]) else None
+    return rows
@@ -0,0 +1,86 @@
+import numpy as np
+
+from knowmap.bench import stub_encoder
+from knowmap.embedding_store import EmbeddingStore, triple_key
+
+
+def nul_ending_triples(n):
+    """``n`` distinct triples whose content hash ends in a NUL byte."""
+    out, i = [], 0
+    while len(out) < n:
+        t = (f"s{i}", "rel", f"o{i}")
+        if triple_key(t).endswith(b"\x00"):
+            out.append(t)
+        i += 1
+    return out
+
+
+def counting(encode):
+    calls = []
+
+    def wrapped(sentences):
+        calls.append(len(sentences))
+        return encode(sentences)
+    return wrapped, calls
+
+
+def test_round_trip_reload_and_compact(tmp_path):
+    dim = 8
+    triples = nul_ending_triples(3) + [(f"a{i}", "p", f"b{i}") for i in range(20)]
+    encode, calls = counting(stub_encoder(dim))
+
+    store = EmbeddingStore(str(tmp_path), dim=dim, initial_capacity=4)
+    first = store.sync(triples, encode)
+    assert sum(calls) == len(triples)
+
+    reloaded = EmbeddingStore(str(tmp_path))
+    assert len(reloaded) == len(triples)
+    np.testing.assert_array_equal(reloaded.sync(triples, encode), first)
+    assert sum(calls) == len(triples)  # nothing re-encoded, NUL-ending keys included
+
+    keep = triples[:10]
+    assert reloaded.compact(keep=keep) == len(keep)
+    again = EmbeddingStore(str(tmp_path))
+    np.testing.assert_array_equal(again.sync(keep, encode), first[:10])
+    assert sum(calls) == len(triples)
+
+
+def test_views_survive_sync_and_compact(tmp_path):
+    dim = 8
+    old = [(f"a{i}", "p", f"b{i}") for i in range(10)]
+    new = [(f"c{i}", "p", f"d{i}") for i in range(10)]
+    encode = stub_encoder(dim)
+
+    store = EmbeddingStore(str(tmp_path), dim=dim, initial_capacity=4)
+    view = store.view(old, encode)
+    expected = np.asarray(view).copy()
+
+    store.sync(new, encode)  # another session syncing a different version
+    np.testing.assert_array_equal(np.asarray(view), expected)
+    store.compact(keep=new)
+    store.sync([(f"e{i}", "p", f"f{i}") for i in range(10)], encode)
+    np.testing.assert_array_equal(np.asarray(view), expected)
+
+
+def test_two_handles_on_one_root(tmp_path):
+    dim = 8
+    a_triples = [(f"a{i}", "p", f"b{i}") for i in range(10)]
+    c_triples = [(f"c{i}", "p", f"d{i}") for i in range(10)]
+    encode, calls = counting(stub_encoder(dim))
+
+    # two handles stand in for two processes sharing the root
+    first = EmbeddingStore(str(tmp_path), dim=dim, initial_capacity=4)
+    second = EmbeddingStore(str(tmp_path))
+    a = first.sync(a_triples, encode)
+    c = second.sync(c_triples, encode)  # must not reuse the rows ``first`` filled
+    np.testing.assert_array_equal(second.sync(a_triples, encode), a)
+    assert sum(calls) == 20
+
+    first.compact(keep=c_triples)  # sees ``second``'s rows before rewriting
+    np.testing.assert_array_equal(second.sync(c_triples + [("e", "p", "f")], encode)[:10], c)
+    assert sum(calls) == 21
+
+    reloaded = EmbeddingStore(str(tmp_path))
+    assert len(reloaded) == 11
+    np.testing.assert_array_equal(reloaded.sync(c_triples, encode), c)
+    assert sum(calls) == 21
@@ -0,0 +1,68 @@
+import io
+
+import pytest
+
+from knowmap.crossdomain import EntityDomains
+from knowmap.ingest import iter_chunks, iter_triple_chunks, load_dataframe, sniff_format, triple_columns
+
+
+def csv_file(text):
+    return io.BytesIO(text.encode("utf-8"))
+
+
+def test_sniff_header_and_delimiter():
+    fmt = sniff_format(csv_file("subject\tpredicate\tobject\nEinstein\tfield\tPhysics\n"))
+    assert fmt.sep == "\t" and fmt.has_header
+    assert triple_columns(fmt.columns) == ("subject", "predicate", "object")
+
+
+def test_sniff_headerless_rows_are_named():
+    fmt = sniff_format(csv_file("Albert Einstein,born_in,Ulm\nMarie Curie,won,Nobel Prize in Physics\n"
+                                "Paris,capital_of,France\nAda,wrote,Notes\n"))
+    assert fmt.sep == "," and not fmt.has_header
+    assert fmt.columns[:3] == ["entity_1", "relation", "entity_2"]
+
+
+def test_sniff_nine_column_layout_with_numeric_first_row():
+    fmt = sniff_format(csv_file("1,Einstein,born_in,Ulm,physics,DE,1879,1955,x\n"
+                                "2,Curie,field,Physics,chemistry,PL,1867,1934,y\n"))
+    assert not fmt.has_header
+    assert fmt.columns[:5] == ["id", "entity_1", "relation", "entity_2", "domain"]
+
+
+def test_chunks_and_domains():
+    text = "entity_1,relation,entity_2,domain\n" + "".join(f"a{i},r,b{i},d{i % 2}\n" for i in range(25))
+    domains, seen = EntityDomains(), []
+    chunks = list(iter_triple_chunks(csv_file(text), chunksize=10, domains=domains,
+                                     progress=lambda frac, rows: seen.append(rows)))
+    assert [len(c) for c in chunks] == [10, 10, 5]
+    assert chunks[0][0] == ("a0", "r", "b0")
+    assert seen == [10, 20, 25]
+    assert domains.domains_of("a3") == ["d1"] and domains.domains_of("b4") == ["d0"]
+
+
+def test_values_stay_strings():
+    chunk = next(iter_chunks(csv_file("entity_1,relation,entity_2\n007,is,NA\n")))
+    assert chunk.iloc[0].tolist() == ["007", "is", "NA"]
+
+
+def test_load_dataframe_max_rows_and_reused_format():
+    f = csv_file("subject,relation,object\n" + "".join(f"s{i},r,o{i}\n" for i in range(50)))
+    fmt = sniff_format(f)
+    df = load_dataframe(f, chunksize=7, max_rows=20, fmt=fmt)
+    assert len(df) == 20 and list(df.columns) == ["subject", "relation", "object"]
+    assert list(load_dataframe(csv_file("subject,relation,object\n")).columns) == ["subject", "relation", "object"]
+
+
+def test_no_triple_columns():
+    with pytest.raises(ValueError):
+        next(iter_triple_chunks(csv_file("name,age\nbob,3\n")))
+
+
+def test_ragged_rows_are_reported():
+    text = ("entity_1,relation,entity_2\n" + "a,r,b\n" * 3 + "a,r,b,x\n"
+            + "c,r,d\n" * 4 + "e,r,f,g,h\n")
+    skipped = []
+    chunks = list(iter_triple_chunks(csv_file(text), chunksize=2, skipped=skipped))
+    assert sum(len(c) for c in chunks) == 7
+    assert skipped == [5, 10]  # file line numbers, header included
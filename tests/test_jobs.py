@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from knowmap.jobs import JobQueue
+
+
+def wait(job, timeout=5):
+    deadline = time.time() + timeout
+    while job.finished is None and time.time() < deadline:  # set once the worker is through
+        time.sleep(0.005)
+    assert job.done
+
+
+@pytest.fixture
+def queue():
+    q = JobQueue(threads=2, keep=3)
+    yield q
+    q.shutdown(wait=True)
+
+
+def test_result_and_dedup_by_key(queue):
+    calls = []
+
+    def work(ctx, x):
+        calls.append(x)
+        ctx.progress(0.5, "half")
+        return x * 2
+
+    job = queue.submit("double", work, 21, key=("double", 21))
+    wait(job)
+    assert job.ok and job.result == 42 and job.progress == 1.0
+    assert queue.submit("double", work, 21, key=("double", 21)) is job
+    assert calls == [21]
+    queue.forget(("double", 21))
+    wait(queue.submit("double", work, 21, key=("double", 21)))
+    assert calls == [21, 21]
+
+
+def test_cancel_and_failure(queue):
+    started = threading.Event()
+
+    def slow(ctx):
+        started.set()
+        while True:
+            ctx.progress(None)
+            time.sleep(0.005)
+
+    job = queue.submit("slow", slow, key="slow")
+    started.wait(5)
+    assert queue.cancel(job.id)
+    wait(job)
+    assert job.status == "cancelled"
+    assert queue.submit("slow", lambda ctx: 1, key="slow") is not job  # cancelled jobs are retried
+
+    def boom(ctx):
+        raise RuntimeError("nope")
+
+    failed = queue.submit("boom", boom)
+    wait(failed)
+    assert failed.status == "failed" and "nope" in failed.error
+
+
+def test_eviction_is_least_recently_used(queue):
+    jobs = {}
+    for name in "abcd":
+        jobs[name] = queue.submit(name, lambda ctx, n=name: n, key=name)
+        wait(jobs[name])
+        if name == "a":
+            continue
+        assert queue.find("a") is jobs["a"]  # "a" keeps being read
+    jobs["e"] = queue.submit("e", lambda ctx: "e", key="e")
+    wait(jobs["e"])
+    assert queue.find("a") is jobs["a"]
+    assert queue.find("b") is None  # least recently used finished job went first
+    assert len([j for j in queue.jobs() if j.done]) == 3
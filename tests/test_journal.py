@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from knowmap.graph import KnowledgeGraph
+from knowmap.journal import EditJournal
+from knowmap.triple_store import TripleStore
+
+TRIPLES = [("a", "r", "b"), ("b", "r", "c"), ("c", "r", "d"), ("d", "r", "e")]
+
+
+def edges(kg):
+    return sorted(kg.store)
+
+
+def snapshots(root):
+    return sorted(n for n in os.listdir(root) if n.startswith("snapshot_"))
+
+
+def edit(journal, kg, op, **args):
+    {"rename": lambda: kg.rename_node(args["old"], args["new"]),
+     "delete": lambda: kg.delete_node(args["node"]),
+     "merge": lambda: kg.merge_nodes(args["target"], args["source"])}[op]()
+    return journal.record(op, kg.store, **args)
+
+
+@pytest.fixture
+def kg():
+    return KnowledgeGraph(TripleStore.from_triples(TRIPLES).freeze())
+
+
+def test_undo_redo_and_restore(tmp_path, kg):
+    journal = EditJournal(str(tmp_path), snapshot_every=2)
+    root = journal.begin(kg.store)
+    states = [edges(kg)]
+    for op, args in [("rename", {"old": "a", "new": "A"}), ("delete", {"node": "e"}),
+                     ("merge", {"target": "b", "source": "c"})]:
+        edit(journal, kg, op, **args)
+        states.append(edges(kg))
+    assert len(snapshots(tmp_path)) == 2  # root + every 2nd edit
+
+    assert edges(journal.undo()) == states[2]
+    assert edges(journal.undo()) == states[1]
+    assert edges(journal.redo()) == states[2]
+    assert edges(journal.restore(root)) == states[0]
+    assert not journal.can_undo()
+    # a reopened journal (another session, a restart) rebuilds the same states
+    reopened = EditJournal(str(tmp_path), snapshot_every=2)
+    assert edges(reopened.state_at(root)) == states[0]
+    assert edges(reopened.state_at(max(reopened.entries))) == states[3]
+
+
+def test_compact_keeps_what_head_needs(tmp_path, kg):
+    journal = EditJournal(str(tmp_path), snapshot_every=1)
+    journal.begin(kg.store)
+    for node in ["a", "b", "c"]:
+        edit(journal, kg, "rename", old=node, new=node.upper())
+    before = edges(kg)
+    removed, dropped = journal.compact(keep_snapshots=1)
+    assert removed == 3 and dropped == 3
+    assert len(snapshots(tmp_path)) == 1
+    assert edges(journal.state_at(journal.head)) == before
+    assert not journal.can_undo()
+
+
+def test_head_compacted_by_another_session(tmp_path, kg):
+    mine = EditJournal(str(tmp_path), snapshot_every=100)
+    mine.begin(kg.store)
+    edit(mine, kg, "rename", old="a", new="A")
+    undo_target = mine.head
+
+    other_kg = KnowledgeGraph(TripleStore.from_triples([("x", "r", "y")]))
+    other = EditJournal(str(tmp_path), snapshot_every=100)
+    other.begin(other_kg.store)
+    other.compact(keep_snapshots=1)  # only the other session's snapshot survives
+
+    with pytest.raises(KeyError):
+        mine.restore(undo_target)
+    entry_id = edit(mine, kg, "delete", node="e")  # re-anchors at a fresh snapshot
+    assert mine.entries[entry_id]["parent"] is None
+    assert edges(EditJournal(str(tmp_path)).state_at(entry_id)) == edges(kg)
+
+
+def test_begin_reuses_entry_for_same_store_version(tmp_path, kg):
+    first = EditJournal(str(tmp_path))
+    head = first.begin(kg.store)
+    second = EditJournal(str(tmp_path))
+    assert second.begin(kg.store) == head
+    assert len(snapshots(tmp_path)) == 1
+
+    edit(first, kg, "rename", old="a", new="A")
+    third = EditJournal(str(tmp_path))
+    assert third.begin(kg.store) == first.head  # continues after the edit, still no new snapshot
+    assert len(snapshots(tmp_path)) == 1
+    assert third.begin(TripleStore.from_triples(TRIPLES)) not in (head, first.head)
+    assert len(snapshots(tmp_path)) == 2
@@ -0,0 +1,28 @@
+import json
+
+from knowmap.logs import FeedbackStats, SegmentLog
+
+
+def test_import_indexes_by_entry_time(tmp_path):
+    log = SegmentLog(str(tmp_path), "feedback", index_every=1)
+    old = [{"ts": f"2023-01-0{d}T12:00:00", "rating": d} for d in range(1, 6)]
+    log.import_entries(old)
+    log.append({"rating": 5})  # live entry, stamped now
+
+    assert [e["rating"] for e in log.between("2023-01-02", "2023-01-04T23:00:00")] == [2, 3, 4]
+    assert log.between(until="2023-01-01T13:00:00") == old[:1]
+    assert len(log.between(since="2024-01-01")) == 1
+
+
+def test_stats_skip_bad_ratings(tmp_path):
+    log = SegmentLog(str(tmp_path), "feedback")
+    for rating in (4, None, "n/a", "2"):
+        log.append({"rating": rating, "graph_relevance": 3})
+    with open(log._path(log.segments()[-1]), "a") as f:
+        f.write(json.dumps({"rating": [1]}) + "\n")
+
+    stats = FeedbackStats(log).refresh()
+    assert stats.count == 5
+    assert stats.distribution("rating") == {1: 0, 2: 1, 3: 0, 4: 1, 5: 0}
+    assert stats.mean("graph_relevance") == 3.0
+    assert FeedbackStats(log).refresh().distribution("rating") == stats.distribution("rating")
@@ -0,0 +1,14 @@
+import json
+
+from knowmap.render import edge_id, with_highlights
+
+
+def test_highlight_names_cannot_close_the_script():
+    name = "</script><img src=x onerror=alert(1)>"
+    page = with_highlights("<body></body>", {name}, [(name, "b")])
+    script = page[:page.index("</body>")]
+    assert script.count("</script>") == 1 and script.endswith("</script>")
+    nodes = script[script.index("hitNodes=") + 9:script.index(",hitEdges")]
+    edges = script[script.index("hitEdges=") + 9:script.index(";nodes.update")]
+    assert json.loads(nodes) == [name]
+    assert json.loads(edges) == [edge_id(name, "b"), edge_id("b", name)]
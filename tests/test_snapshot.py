@@ -0,0 +1,71 @@
+import io
+
+import networkx as nx
+import pytest
+
+from knowmap.snapshot import is_snapshot, iter_graphml_triples, read_snapshot, write_graphml, write_snapshot
+from knowmap.triple_store import TripleStore
+
+TRIPLES = [("Einstein", "born_in", "Ulm"), ("Curie", "won", "Nobel <Physics> & \"Chemistry\""),
+           ("Zürich", "located_in", "Schweiz 🇨🇭"), ("Curie", "field", "Physics"), ("x", "", "y")]
+
+
+@pytest.fixture
+def store():
+    store = TripleStore.from_triples(TRIPLES + [("gone", "r", "soon")])
+    store.delete_entity("gone")  # deleted rows are not written
+    return store
+
+
+def test_snapshot_round_trip_path(store, tmp_path):
+    path = str(tmp_path / "g.kmap")
+    write_snapshot(store, path)
+    loaded = read_snapshot(path)
+    assert list(loaded) == TRIPLES
+    assert loaded.frozen and loaded.entities.get("Curie") >= 0
+    with open(path, "rb") as f:
+        assert is_snapshot(f.read(16))
+    edited = loaded.thaw()
+    edited.rename_entity("Curie", "Marie Curie")
+    assert edited[1][0] == "Marie Curie" and list(loaded) == TRIPLES
+
+
+def test_snapshot_round_trip_bytes(store):
+    buf = io.BytesIO()
+    write_snapshot(store, buf)
+    assert list(read_snapshot(buf.getvalue())) == TRIPLES
+    assert list(read_snapshot(io.BytesIO(buf.getvalue()))) == TRIPLES
+    empty = io.BytesIO()
+    write_snapshot(TripleStore(), empty)
+    assert len(read_snapshot(empty.getvalue())) == 0
+
+
+def test_not_a_snapshot():
+    with pytest.raises(ValueError):
+        read_snapshot(b"<graphml/>" + bytes(64))
+
+
+def test_graphml_round_trip(store, tmp_path):
+    path = str(tmp_path / "g.graphml")
+    write_graphml(store, path)
+    with open(path, "rb") as f:
+        parsed = [t for batch in iter_graphml_triples(f, batch_size=2) for t in batch]
+    assert parsed == TRIPLES
+    G = nx.read_graphml(path)  # the output is valid GraphML for other tools too
+    assert G.number_of_edges() == len(TRIPLES)
+    assert G.edges["Curie", "Nobel <Physics> & \"Chemistry\""]["relation"] == "won"
+
+    buf = io.BytesIO()
+    write_graphml(store, buf)
+    buf.seek(0)
+    assert [t for batch in iter_graphml_triples(buf) for t in batch] == TRIPLES
+
+
+def test_graphml_from_networkx_uses_label_keys(tmp_path):
+    G = nx.DiGraph()
+    G.add_edge("a", "b", label="knows")
+    G.add_edge("b", "c", relation="likes", label="ignored")
+    path = str(tmp_path / "nx.graphml")
+    nx.write_graphml(G, path)
+    with open(path, "rb") as f:
+        assert [t for batch in iter_graphml_triples(f) for t in batch] == [("a", "knows", "b"), ("b", "likes", "c")]
@@ -0,0 +1,73 @@
+import pytest
+
+from knowmap.triple_store import ReadOnlyError, TripleStore
+
+TRIPLES = [("Einstein", "born_in", "Ulm"), ("Einstein", "field", "Physics"), ("Curie", "field", "Physics")]
+
+
+def test_extend_iterate_and_delete():
+    store = TripleStore(capacity=1)
+    assert store.extend(iter(TRIPLES)) == 3
+    assert list(store) == TRIPLES and len(store) == 3
+    v = store.version
+    store.delete(store.row_ids()[1])
+    assert store.version != v
+    assert list(store) == [TRIPLES[0], TRIPLES[2]]
+    assert store.delete_entity("Curie") == 1
+    assert list(store) == [TRIPLES[0]]
+    store.compact()
+    assert list(store) == [TRIPLES[0]] and store.row_ids().tolist() == [0]
+
+
+def test_extend_keeps_rows_before_an_error():
+    def rows():
+        yield TRIPLES[0]
+        yield TRIPLES[1]
+        raise OSError("read failed")
+
+    store = TripleStore(capacity=1)
+    with pytest.raises(OSError):
+        store.extend(rows())
+    assert len(store) == 2 and list(store) == TRIPLES[:2]
+    store.extend([TRIPLES[2]])
+    assert list(store) == TRIPLES
+    assert len(store.codes()[0]) == 3
+
+
+def test_freeze_and_thaw():
+    store = TripleStore.from_triples(TRIPLES).freeze()
+    with pytest.raises(ReadOnlyError):
+        store.extend([("a", "b", "c")])
+    with pytest.raises(ReadOnlyError):
+        store.rename_entity("Curie", "Marie Curie")
+    with pytest.raises(ValueError):
+        store._s[0] = 1  # arrays are read-only too
+
+    copy = store.thaw()
+    copy.rename_entity("Curie", "Marie Curie")
+    copy.extend([("a", "b", "c")])
+    assert list(store) == TRIPLES
+    assert copy[2] == ("Marie Curie", "field", "Physics") and len(copy) == 4
+    assert copy.version != store.version
+
+
+def test_snapshot_is_frozen_copy_of_same_version():
+    store = TripleStore.from_triples(TRIPLES)
+    snap = store.snapshot()
+    assert snap.frozen and not store.frozen and snap.version == store.version
+    store.extend([("a", "b", "c")])
+    assert list(snap) == TRIPLES
+    assert snap.snapshot() is snap
+
+
+def test_rename_merge_and_links():
+    store = TripleStore.from_triples(TRIPLES + [("Curie", "field", "Chemistry")])
+    assert store.rename_entity("Curie", "Einstein") == 2
+    assert store.links("Einstein") == {"Ulm": "born_in", "Physics": "field", "Chemistry": "field"}
+    assert store.delete_links("Einstein", ["Physics"]) == 2
+    assert sorted(store) == [("Einstein", "born_in", "Ulm"), ("Einstein", "field", "Chemistry")]
+
+
+def test_dedup_keeps_first_occurrence():
+    store = TripleStore.from_triples(TRIPLES + TRIPLES[:2], dedup=True)
+    assert list(store) == TRIPLES
@@ -0,0 +1,71 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from knowmap.users import UserRepository, hash_iterations, hash_password, verify_password
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = UserRepository(str(tmp_path / "users.db"), pool_size=1, iterations=1000)
+    yield repo
+    repo.close()
+
+
+def write_legacy(tmp_path, users):
+    path = str(tmp_path / "users.json")
+    with open(path, "w") as f:
+        json.dump({email: {"password": pw} for email, pw in users.items()}, f)
+    return path
+
+
+def test_hashing():
+    stored = hash_password("secret", 1000)
+    assert verify_password("secret", stored) and not verify_password("Secret", stored)
+    assert hash_iterations(stored) == 1000
+    assert hash_password("secret", 1000) != stored  # salted
+
+
+def test_register_and_authenticate(repo):
+    assert repo.register("a@x.com", "pw")
+    assert not repo.register("a@x.com", "other")
+    assert repo.authenticate("a@x.com", "pw") == "ok"
+    assert repo.authenticate("a@x.com", "nope") == "wrong_password"
+    assert repo.authenticate("b@x.com", "pw") == "unknown"
+
+
+def test_migrate_from_json(repo, tmp_path):
+    repo.register("kept@x.com", "new")
+    path = write_legacy(tmp_path, {"a@x.com": "pw-a", "kept@x.com": "old", "b_c@x.com": "pw-b"})
+    assert repo.migrate_from_json(path) == 3
+    assert not os.path.exists(path)  # plain-text passwords are gone
+    assert os.listdir(tmp_path) == [n for n in os.listdir(tmp_path) if n.startswith("users.db")]
+    assert repo.authenticate("a@x.com", "pw-a") == "ok"
+    assert repo.authenticate("kept@x.com", "new") == "ok"  # existing users win
+    assert repo.migrate_from_json(path) == 0
+    assert repo.count() == 3
+
+
+def test_failed_migration_rolls_back(repo, tmp_path):
+    with repo._conn() as conn:
+        conn.execute("CREATE TRIGGER fail BEFORE INSERT ON users WHEN NEW.email = 'bad@x.com' "
+                     "BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+    path = write_legacy(tmp_path, {"a@x.com": "pw", "bad@x.com": "pw"})
+    with pytest.raises(sqlite3.DatabaseError):
+        repo.migrate_from_json(path)
+    assert os.path.exists(path)  # kept for another attempt
+    assert repo.count() == 0
+    with repo._conn() as conn:
+        assert not conn.in_transaction  # the pooled connection is usable again
+    assert repo.register("c@x.com", "pw")
+
+
+def test_search_matches_wildcards_literally(repo):
+    for email in ["a_b@x.com", "axb@x.com", "100%@x.com"]:
+        repo.register(email, "pw")
+    assert repo.count("a_b") == 1
+    assert [u["email"] for u in repo.list(search="_")] == ["a_b@x.com"]
+    assert repo.count("%") == 1 and repo.count("x.com") == 3
+    assert [u["email"] for u in repo.list(limit=2)] == ["100%@x.com", "a_b@x.com"]
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from knowmap.vector_index import ExactIndex, IVFIndex, build_index, load_index, normalize, save_index, topk
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((40, 32)).astype(np.float32)
+    vectors = centers[rng.integers(0, 40, 4000)] + 0.3 * rng.standard_normal((4000, 32)).astype(np.float32)
+    queries = centers[rng.integers(0, 40, 25)] + 0.3 * rng.standard_normal((25, 32)).astype(np.float32)
+    truth = np.argsort(-(normalize(queries) @ normalize(vectors).T), axis=1)[:, :10]
+    return vectors, queries, truth
+
+
+def recall(found, truth):
+    return np.mean([len(set(f[f >= 0].tolist()) & set(t.tolist())) / len(t) for f, t in zip(found, truth)])
+
+
+def test_topk_is_sorted_best_first():
+    scores = np.array([[0.1, 0.9, 0.5, 0.7], [3.0, 2.0, 1.0, 0.0]])
+    assert topk(scores, 2).tolist() == [[1, 3], [0, 1]]
+    assert topk(scores, 10).shape == (2, 4)
+
+
+def test_exact_matches_brute_force(data):
+    vectors, queries, truth = data
+    ids, scores = ExactIndex(vectors).search(queries, 10)
+    assert (ids == truth).all()
+    assert np.all(np.diff(scores, axis=1) <= 1e-6)
+    single, _ = ExactIndex(vectors).search(queries[0], 10)
+    assert (single[0] == truth[0]).all()
+
+
+def test_ivf_probing_every_list_is_exact(data):
+    vectors, queries, truth = data
+    index = IVFIndex(vectors, n_lists=16, n_probe=16)
+    ids, _ = index.search(queries, 10)
+    assert (ids == truth).all()
+    assert sorted(index.ids.tolist()) == list(range(len(vectors)))
+
+
+def test_ivf_recall_grows_with_probes(data):
+    vectors, queries, truth = data
+    index = build_index(vectors, "ivf", n_lists=64)
+    few = recall(index.search(queries, 10, n_probe=1)[0], truth)
+    many = recall(index.search(queries, 10, n_probe=16)[0], truth)
+    assert many >= few and many > 0.9
+
+
+def test_save_and_load_ivf(data, tmp_path):
+    vectors, queries, _ = data
+    index = IVFIndex(vectors, n_lists=32, n_probe=4)
+    path = str(tmp_path / "index.npz")
+    save_index(index, path)
+    loaded = load_index(path, vectors)
+    assert loaded.n_probe == 4
+    for a, b in zip(index.search(queries, 10), loaded.search(queries, 10)):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        build_index(np.zeros((2, 2), dtype=np.float32), "hnsw")
+
+
+@pytest.mark.parametrize("precision", ["float16", "int8"])
+def test_quantized_recall_with_rerank(data, precision):
+    vectors, queries, truth = data
+    plain = ExactIndex(vectors, precision=precision)
+    assert plain.nbytes < ExactIndex(vectors).nbytes
+    assert recall(plain.search(queries, 10)[0], truth) > 0.9
+    reranked = ExactIndex(vectors, precision=precision, rerank=50)
+    ids, scores = reranked.search(queries, 10)
+    assert recall(ids, truth) == 1.0
+    np.testing.assert_allclose(scores, np.take_along_axis(normalize(queries) @ normalize(vectors).T, ids, 1),
+                               rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("precision", ["float32", "float16", "int8"])
+def test_quantized_ivf_and_chunked_order(data, tmp_path, precision):
+    vectors, queries, truth = data
+    index = IVFIndex(vectors, n_lists=16, n_probe=16, precision=precision, rerank=50)
+    assert recall(index.search(queries, 10)[0], truth) == 1.0
+    # rows are gathered chunk by chunk in list order; must equal quantizing the reordered matrix
+    whole = ExactIndex(vectors[index.ids], precision=precision).vectors
+    np.testing.assert_array_equal(index.vectors.data, whole.data)
+    path = str(tmp_path / "index.npz")
+    save_index(index, path)
+    loaded = load_index(path, vectors)
+    assert loaded.precision == precision and loaded.rerank == 50
+    np.testing.assert_array_equal(loaded.search(queries, 10)[0], index.search(queries, 10)[0])